@@ -4,6 +4,8 @@ from pydantic import PostgresDsn
 
 class Settings(BaseSettings):
     DATABASE_URI: PostgresDsn
+    # Serve traversals from graph_api/graphql/traversal.py when it is loaded.
+    TRAVERSAL_ENGINE: bool = False
 
 
 settings = Settings()  # type: ignore
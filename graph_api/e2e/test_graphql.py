@@ -1,7 +1,12 @@
+from contextlib import contextmanager
+
+import pytest
 from fastapi.testclient import TestClient
 from fastapi import status
 from time import sleep
 from graph_api.main import app
+from graph_db.session import engine
+from sqlalchemy import text
 
 client = TestClient(
     app,
@@ -17,6 +22,13 @@ client = TestClient(
 )
 
 
+@pytest.fixture(scope="module", autouse=True)
+def client_event_loop():
+    # Keep a single event loop for all requests, the async engine pool is bound to it.
+    with client:
+        yield
+
+
 def test_add_and_delete_unit():
     add_mutation = """
     mutation CreateUnit {
@@ -465,7 +477,7 @@ def test_add_units_connected_by_edge():
     assert data == {
         "u1": {"descendants": unit_ids[1:-1], "ancestors": []},
         "u2": {"descendants": unit_ids[1:-1], "ancestors": unit_ids},
-        "u3": {"descendants": unit_ids[3:4], "ancestors": unit_ids[:2]},
+        "u3": {"descendants": unit_ids[1:-1], "ancestors": unit_ids},
         "u4": {"descendants": unit_ids[1:-1], "ancestors": unit_ids},
         "u5": {"descendants": unit_ids[1:-1], "ancestors": []},
     }
@@ -492,15 +504,20 @@ def test_add_units_connected_by_edge():
     )
     assert response.status_code == status.HTTP_200_OK
 
-    get_edges_query = "query MyQuery { edges { sourceUnitId, targetUnitId } }"
+    get_edges_query = """
+    query MyQuery { edges(first: 1000) { edges { node { sourceUnitId, targetUnitId } } } }
+    """
     response = client.post(url="/v1/graphql", json={"query": get_edges_query})
     assert response.status_code == status.HTTP_200_OK
 
     data = response.json()["data"]
     edges = [
-        edge
-        for edge in data["edges"]
-        if (edge["sourceUnitId"] in unit_ids or edge["targetUnitId"] in unit_ids)
+        edge["node"]
+        for edge in data["edges"]["edges"]
+        if (
+            edge["node"]["sourceUnitId"] in unit_ids
+            or edge["node"]["targetUnitId"] in unit_ids
+        )
     ]
     assert len(edges) == 0
 
@@ -524,4 +541,740 @@ def test_add_units_connected_by_edge():
     assert response.status_code == status.HTTP_200_OK
 
     data = response.json()["data"]
-    assert data is None
+    assert data == {"e1": [], "e2": [], "e3": [], "e4": [], "e5": []}
+
+
+def test_unit_nested_fields():
+    add_units_mutation = """
+    mutation CreateUnit {
+        n1: unit { addUnit(input: {name: "customer"}) { id, nodeId } },
+        n2: unit { addUnit(input: {name: "supplier a"}) { id, nodeId } },
+        n3: unit { addUnit(input: {name: "supplier b"}) { id, nodeId } }
+    }
+    """
+    response = client.post(url="/v1/graphql", json={"query": add_units_mutation})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()["data"]
+    unit_ids = [int(data[node]["addUnit"]["id"]) for node in ["n1", "n2", "n3"]]
+    node_ids = [int(data[node]["addUnit"]["nodeId"]) for node in ["n1", "n2", "n3"]]
+
+    add_edges_and_document_mutation = """
+    mutation CreateEdges {{
+        e1: edge {{
+            addEdge(input: {{sourceUnitId: {u1}, targetUnitId: {u2}}}) {{ id }}
+        }},
+        e2: edge {{
+            addEdge(input: {{sourceUnitId: {u1}, targetUnitId: {u3}}}) {{ id }}
+        }},
+        d1: document {{
+            addDocument(input: {{unitId: {u2}, name: "emissions"}}) {{ id }}
+        }}
+    }}
+    """.format(
+        u1=unit_ids[0], u2=unit_ids[1], u3=unit_ids[2]
+    )
+    response = client.post(
+        url="/v1/graphql", json={"query": add_edges_and_document_mutation}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["data"] is not None
+
+    get_unit_query = """
+    query GetUnit {{
+        unit(id: {u1}) {{
+            outgoingEdges {{ sourceUnitId, targetUnitId }}
+            incomingEdges {{ sourceUnitId }}
+            customers {{ id }}
+            suppliers {{
+                id
+                documents {{ name }}
+                customers {{ id }}
+            }}
+        }}
+    }}
+    """.format(
+        u1=unit_ids[0]
+    )
+    response = client.post(url="/v1/graphql", json={"query": get_unit_query})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()["data"]
+    assert data == {
+        "unit": {
+            "outgoingEdges": [
+                {"sourceUnitId": node_ids[0], "targetUnitId": node_ids[1]},
+                {"sourceUnitId": node_ids[0], "targetUnitId": node_ids[2]},
+            ],
+            "incomingEdges": [],
+            "customers": [],
+            "suppliers": [
+                {
+                    "id": unit_ids[1],
+                    "documents": [{"name": "emissions"}],
+                    "customers": [{"id": unit_ids[0]}],
+                },
+                {
+                    "id": unit_ids[2],
+                    "documents": [],
+                    "customers": [{"id": unit_ids[0]}],
+                },
+            ],
+        }
+    }
+
+    delete_units_mutation = """
+    mutation DeleteUnits {{
+        u1: unit {{ deleteUnit(input: {{ id: {u1} }}) {{ id }} }},
+        u2: unit {{ deleteUnit(input: {{ id: {u2} }}) {{ id }} }},
+        u3: unit {{ deleteUnit(input: {{ id: {u3} }}) {{ id }} }}
+    }}
+    """.format(
+        u1=unit_ids[0], u2=unit_ids[1], u3=unit_ids[2]
+    )
+    response = client.post(url="/v1/graphql", json={"query": delete_units_mutation})
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_units_pagination():
+    add_units_mutation = """
+    mutation CreateUnit {
+        n1: unit { addUnit(input: {name: "zz pagination"}) { id } },
+        n2: unit { addUnit(input: {name: "zz pagination"}) { id } },
+        n3: unit { addUnit(input: {name: "zz pagination"}) { id } }
+    }
+    """
+    response = client.post(url="/v1/graphql", json={"query": add_units_mutation})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()["data"]
+    unit_ids = [int(data[node]["addUnit"]["id"]) for node in ["n1", "n2", "n3"]]
+
+    get_units_query = """
+    query GetUnits($first: Int, $after: String) {
+        units(first: $first, after: $after) {
+            edges { cursor, node { id, name } }
+            pageInfo { hasNextPage, endCursor }
+            totalCount
+        }
+    }
+    """
+    units, after, has_next_page = [], None, True
+    while has_next_page:
+        response = client.post(
+            url="/v1/graphql",
+            json={"query": get_units_query, "variables": {"first": 2, "after": after}},
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        data = response.json()["data"]["units"]
+        assert len(data["edges"]) <= 2
+        assert data["totalCount"] >= 3
+        units += [edge["node"] for edge in data["edges"]]
+        after = data["pageInfo"]["endCursor"]
+        has_next_page = data["pageInfo"]["hasNextPage"]
+
+    assert len(units) == data["totalCount"]
+    assert [unit["id"] for unit in units if unit["id"] in unit_ids] == unit_ids
+    assert units == sorted(units, key=lambda unit: (unit["name"], unit["id"]))
+
+    delete_units_mutation = """
+    mutation DeleteUnits {{
+        u1: unit {{ deleteUnit(input: {{ id: {u1} }}) {{ id }} }},
+        u2: unit {{ deleteUnit(input: {{ id: {u2} }}) {{ id }} }},
+        u3: unit {{ deleteUnit(input: {{ id: {u3} }}) {{ id }} }}
+    }}
+    """.format(
+        u1=unit_ids[0], u2=unit_ids[1], u3=unit_ids[2]
+    )
+    response = client.post(url="/v1/graphql", json={"query": delete_units_mutation})
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_unit_closure_depth():
+    add_units_mutation = """
+    mutation CreateUnit {
+        n1: unit { addUnit(input: {name: "brand"}) { id, nodeId } },
+        n2: unit { addUnit(input: {name: "tier 1"}) { id, nodeId } },
+        n3: unit { addUnit(input: {name: "tier 2"}) { id, nodeId } }
+    }
+    """
+    response = client.post(url="/v1/graphql", json={"query": add_units_mutation})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()["data"]
+    unit_ids = [int(data[node]["addUnit"]["id"]) for node in ["n1", "n2", "n3"]]
+    node_ids = [int(data[node]["addUnit"]["nodeId"]) for node in ["n1", "n2", "n3"]]
+
+    add_edges_mutation = """
+    mutation CreateEdges {{
+        e1: edge {{
+            addEdge(input: {{sourceUnitId: {u1}, targetUnitId: {u2}}}) {{ id }}
+        }},
+        e2: edge {{
+            addEdge(input: {{sourceUnitId: {u2}, targetUnitId: {u3}}}) {{ id }}
+        }}
+    }}
+    """.format(
+        u1=unit_ids[0], u2=unit_ids[1], u3=unit_ids[2]
+    )
+    response = client.post(url="/v1/graphql", json={"query": add_edges_mutation})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["data"] is not None
+
+    add_documents_mutation = """
+    mutation CreateDocuments($c2: JSON, $c3: JSON, $c3Text: JSON) {{
+        d2: document {{
+            addDocument(input: {{unitId: {u2}, name: "d2", content: $c2}}) {{ id }}
+        }},
+        d3: document {{
+            addDocument(input: {{unitId: {u3}, name: "d3", content: $c3}}) {{ id }}
+        }},
+        d3Text: document {{
+            addDocument(input: {{unitId: {u3}, name: "d3", content: $c3Text}}) {{ id }}
+        }}
+    }}
+    """.format(
+        u2=unit_ids[1], u3=unit_ids[2]
+    )
+    variables = {
+        "c2": {"emissions": {"co2": 2.5}},
+        "c3": {"emissions": {"co2": 4}},
+        "c3Text": {"emissions": {"co2": "10 ton"}},
+    }
+    response = client.post(
+        url="/v1/graphql",
+        json={"query": add_documents_mutation, "variables": variables},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["data"] is not None
+
+    rollup_all_mutation = """
+    mutation RollupAll {
+        unit { rollupAll(input: {metricPath: "emissions.co2"}) }
+    }
+    """
+    response = client.post(url="/v1/graphql", json={"query": rollup_all_mutation})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["data"]["unit"]["rollupAll"] >= 3
+
+    get_unit_query = """
+    query GetUnit {{
+        unit(id: {u1}) {{
+            descendants
+            tier1: descendants(maxDepth: 1)
+            tierCounts {{ depth, count }}
+            storedCo2: rollup(metricPath: "emissions.co2")
+            storedCo2Avg: rollup(metricPath: "emissions.co2", aggregate: AVG)
+            storedEnergy: rollup(metricPath: "energy")
+        }}
+        forward: reachable(sourceUnitId: {u1}, targetUnitId: {u3})
+        backward: reachable(sourceUnitId: {u3}, targetUnitId: {u1})
+        pairs: reachablePairs(pairs: [[{u1}, {u2}], [{u2}, {u1}], [{u2}, {u3}], [{u1}, -1]])
+        co2: rollup(unitId: {u1}, metricPath: "emissions.co2")
+        co2Max: rollup(unitId: {u1}, metricPath: "emissions.co2", aggregate: MAX)
+        co2Count: rollup(unitId: {u1}, metricPath: "emissions.co2", aggregate: COUNT)
+        leafCo2: rollup(unitId: {u3}, metricPath: "emissions.co2")
+        tiers: tierBreakdown(unitId: {u1}, metricPath: "emissions.co2") {{
+            depth, units, value
+        }}
+        tier1Max: tierBreakdown(
+            unitId: {u1}, metricPath: "emissions.co2", aggregate: MAX, maxDepth: 1
+        ) {{ depth, units, value }}
+    }}
+    """.format(
+        u1=unit_ids[0], u2=unit_ids[1], u3=unit_ids[2]
+    )
+    response = client.post(url="/v1/graphql", json={"query": get_unit_query})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()["data"]
+    assert data == {
+        "unit": {
+            "descendants": node_ids[1:],
+            "tier1": node_ids[1:2],
+            "tierCounts": [{"depth": 1, "count": 1}, {"depth": 2, "count": 1}],
+            "storedCo2": 6.5,
+            "storedCo2Avg": 3.25,
+            "storedEnergy": None,
+        },
+        "forward": True,
+        "backward": False,
+        "pairs": [True, False, True, False],
+        "co2": 6.5,
+        "co2Max": 4.0,
+        "co2Count": 2.0,
+        "leafCo2": None,
+        "tiers": [
+            {"depth": 1, "units": 1, "value": 2.5},
+            {"depth": 2, "units": 1, "value": 4.0},
+        ],
+        "tier1Max": [{"depth": 1, "units": 1, "value": 2.5}],
+    }
+
+    delete_units_mutation = """
+    mutation DeleteUnits {{
+        u1: unit {{ deleteUnit(input: {{ id: {u1} }}) {{ id }} }},
+        u2: unit {{ deleteUnit(input: {{ id: {u2} }}) {{ id }} }},
+        u3: unit {{ deleteUnit(input: {{ id: {u3} }}) {{ id }} }}
+    }}
+    """.format(
+        u1=unit_ids[0], u2=unit_ids[1], u3=unit_ids[2]
+    )
+    response = client.post(url="/v1/graphql", json={"query": delete_units_mutation})
+    assert response.status_code == status.HTTP_200_OK
+
+
+def _add_graph(names: list[str], pairs: list[tuple[int, int]]):
+    """Adds a unit per name and an edge per (source, target) position pair,
+    returns the unit ids, node ids and edge ids."""
+    add_units_mutation = "mutation CreateUnits {{ {} }}".format(
+        ", ".join(
+            'n{}: unit {{ addUnit(input: {{name: "{}"}}) {{ id, nodeId }} }}'.format(
+                index, name
+            )
+            for index, name in enumerate(names)
+        )
+    )
+    response = client.post(url="/v1/graphql", json={"query": add_units_mutation})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()["data"]
+    units = [data[f"n{index}"]["addUnit"] for index in range(len(names))]
+    unit_ids = [int(unit["id"]) for unit in units]
+    node_ids = [int(unit["nodeId"]) for unit in units]
+
+    add_edges_mutation = "mutation CreateEdges {{ {} }}".format(
+        ", ".join(
+            "e{}: edge {{ addEdge(input: {{sourceUnitId: {}, targetUnitId: {}}}) "
+            "{{ id }} }}".format(index, unit_ids[source], unit_ids[target])
+            for index, (source, target) in enumerate(pairs)
+        )
+    )
+    response = client.post(url="/v1/graphql", json={"query": add_edges_mutation})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()["data"]
+    edge_ids = [int(data[f"e{index}"]["addEdge"]["id"]) for index in range(len(pairs))]
+    return unit_ids, node_ids, edge_ids
+
+
+def _get_closures(unit_ids: list[int]) -> list[dict]:
+    get_units_query = "query GetUnits {{ {} }}".format(
+        ", ".join(
+            f"u{index}: unit(id: {unit_id}) {{ ancestors, descendants }}"
+            for index, unit_id in enumerate(unit_ids)
+        )
+    )
+    response = client.post(url="/v1/graphql", json={"query": get_units_query})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()["data"]
+    return [data[f"u{index}"] for index in range(len(unit_ids))]
+
+
+def _get_cycles(unit_ids: list[int]) -> list[list[int]]:
+    get_units_query = "query GetUnits {{ {} }}".format(
+        ", ".join(
+            f"u{index}: unit(id: {unit_id}) {{ cycle }}"
+            for index, unit_id in enumerate(unit_ids)
+        )
+    )
+    response = client.post(url="/v1/graphql", json={"query": get_units_query})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()["data"]
+    return [data[f"u{index}"]["cycle"] for index in range(len(unit_ids))]
+
+
+def _delete_edge(edge_id: int) -> None:
+    delete_edge_mutation = """
+    mutation DeleteEdge {{
+        edge {{ deleteEdge(input: {{ id: {edge_id} }}) {{ id }} }}
+    }}
+    """.format(
+        edge_id=edge_id
+    )
+    response = client.post(url="/v1/graphql", json={"query": delete_edge_mutation})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["data"] is not None
+
+
+def _delete_units(unit_ids: list[int]) -> None:
+    delete_units_mutation = "mutation DeleteUnits {{ {} }}".format(
+        ", ".join(
+            f"u{index}: unit {{ deleteUnit(input: {{ id: {unit_id} }}) {{ id }} }}"
+            for index, unit_id in enumerate(unit_ids)
+        )
+    )
+    response = client.post(url="/v1/graphql", json={"query": delete_units_mutation})
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_closure_after_deleting_chain_edge():
+    unit_ids, (a, b, c), edge_ids = _add_graph(
+        ["chain a", "chain b", "chain c"], [(0, 1), (1, 2)]
+    )
+    assert _get_closures(unit_ids) == [
+        {"ancestors": [], "descendants": [b, c]},
+        {"ancestors": [a], "descendants": [c]},
+        {"ancestors": [a, b], "descendants": []},
+    ]
+
+    _delete_edge(edge_ids[1])
+    assert _get_closures(unit_ids) == [
+        {"ancestors": [], "descendants": [b]},
+        {"ancestors": [a], "descendants": []},
+        {"ancestors": [], "descendants": []},
+    ]
+    _delete_units(unit_ids)
+
+
+def test_closure_after_deleting_diamond_edge():
+    unit_ids, (a, b, c, d), edge_ids = _add_graph(
+        ["diamond a", "diamond b", "diamond c", "diamond d"],
+        [(0, 1), (0, 2), (1, 3), (2, 3)],
+    )
+    assert _get_closures(unit_ids)[3] == {"ancestors": [a, b, c], "descendants": []}
+
+    # d stays reachable from a through c.
+    _delete_edge(edge_ids[2])
+    assert _get_closures(unit_ids) == [
+        {"ancestors": [], "descendants": [b, c, d]},
+        {"ancestors": [a], "descendants": []},
+        {"ancestors": [a], "descendants": [d]},
+        {"ancestors": [a, c], "descendants": []},
+    ]
+    _delete_units(unit_ids)
+
+
+def test_closure_after_deleting_cycle_edge():
+    unit_ids, (a, b, c), edge_ids = _add_graph(
+        ["cycle a", "cycle b", "cycle c"], [(0, 1), (1, 2), (2, 0)]
+    )
+    # Every node of the cycle reaches itself.
+    assert _get_closures(unit_ids) == [
+        {"ancestors": [a, b, c], "descendants": [a, b, c]},
+        {"ancestors": [a, b, c], "descendants": [a, b, c]},
+        {"ancestors": [a, b, c], "descendants": [a, b, c]},
+    ]
+    assert _get_cycles(unit_ids) == [[a, b, c], [a, b, c], [a, b, c]]
+
+    _delete_edge(edge_ids[2])
+    assert _get_closures(unit_ids) == [
+        {"ancestors": [], "descendants": [b, c]},
+        {"ancestors": [a], "descendants": [c]},
+        {"ancestors": [a, b], "descendants": []},
+    ]
+    assert _get_cycles(unit_ids) == [[], [], []]
+    _delete_units(unit_ids)
+
+
+def test_paths_between_units():
+    # a -> b -> d, a -> c -> d, a -> d and d -> e.
+    unit_ids, _, edge_ids = _add_graph(
+        ["path a", "path b", "path c", "path d", "path e"],
+        [(0, 1), (0, 2), (1, 3), (2, 3), (0, 3), (3, 4)],
+    )
+    a, b, c, d, e = unit_ids
+    get_paths_query = """
+    query GetPaths {{
+        shortest: shortestPath(fromUnitId: {a}, toUnitId: {e}) {{ unitIds, edgeIds }}
+        none: shortestPath(fromUnitId: {e}, toUnitId: {a}) {{ unitIds }}
+        paths: paths(fromUnitId: {a}, toUnitId: {e}, maxDepth: 3) {{ unitIds, edgeIds }}
+        short: paths(fromUnitId: {a}, toUnitId: {e}, maxDepth: 2) {{ unitIds }}
+        first: paths(fromUnitId: {a}, toUnitId: {e}, maxDepth: 3, limit: 1) {{ unitIds }}
+    }}
+    """.format(
+        a=a, e=e
+    )
+    response = client.post(url="/v1/graphql", json={"query": get_paths_query})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()["data"]
+    assert data["shortest"] == {"unitIds": [a, d, e], "edgeIds": edge_ids[4:6]}
+    assert data["none"] is None
+    assert sorted(
+        (path["unitIds"], path["edgeIds"]) for path in data["paths"]
+    ) == sorted(
+        [
+            ([a, b, d, e], [edge_ids[0], edge_ids[2], edge_ids[5]]),
+            ([a, c, d, e], [edge_ids[1], edge_ids[3], edge_ids[5]]),
+            ([a, d, e], [edge_ids[4], edge_ids[5]]),
+        ]
+    )
+    assert data["short"] == [{"unitIds": [a, d, e]}]
+    assert data["first"] == [{"unitIds": [a, d, e]}]
+    _delete_units(unit_ids)
+
+
+@contextmanager
+def _shifted_node_ids():
+    """Gives the units added within node ids away from their unit ids. Both
+    sequences end at the same value, so later units are not affected."""
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                """
+                SELECT setval(
+                    'public.node_id_seq',
+                    GREATEST(
+                        (SELECT last_value FROM public.node_id_seq),
+                        (SELECT last_value FROM public.unit_id_seq)
+                    ) + 1000
+                )
+                """
+            )
+        )
+    yield
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                """
+                SELECT setval('public.unit_id_seq', last_value),
+                    setval('public.node_id_seq', last_value)
+                FROM (
+                    SELECT GREATEST(
+                        (SELECT last_value FROM public.node_id_seq),
+                        (SELECT last_value FROM public.unit_id_seq)
+                    ) AS last_value
+                ) AS sequences
+                """
+            )
+        )
+
+
+def test_subgraph_around_unit():
+    # a -> b -> c -> d and e -> b.
+    with _shifted_node_ids():
+        unit_ids, node_ids, edge_ids = _add_graph(
+            ["subgraph a", "subgraph b", "subgraph c", "subgraph d", "subgraph e"],
+            [(0, 1), (1, 2), (2, 3), (4, 1)],
+        )
+    assert not set(unit_ids) & set(node_ids)
+    a, b, c, d, e = unit_ids
+    get_subgraph_query = """
+    query GetSubgraph {{
+        near: subgraph(unitId: {b}) {{ unitIds, edges {{ id }}, truncated }}
+        down: subgraph(unitId: {b}, upDepth: 0, downDepth: 2, relations: ["links"]) {{
+            unitIds, edges {{ id, sourceUnitId, targetUnitId }}, truncated
+        }}
+        none: subgraph(unitId: {b}, relations: []) {{ unitIds, edges {{ id }} }}
+        limited: subgraph(unitId: {b}, downDepth: 2, limit: 3) {{
+            unitIds, edges {{ id }}, truncated
+        }}
+    }}
+    """.format(
+        b=b
+    )
+    response = client.post(url="/v1/graphql", json={"query": get_subgraph_query})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()["data"]
+    assert sorted(data["near"]["unitIds"]) == sorted([a, b, c, e])
+    assert data["near"]["unitIds"][0] == b
+    assert sorted(edge["id"] for edge in data["near"]["edges"]) == sorted(
+        [edge_ids[0], edge_ids[1], edge_ids[3]]
+    )
+    assert data["near"]["truncated"] is False
+    assert data["down"] == {
+        "unitIds": [b, c, d],
+        "edges": [
+            {"id": edge_ids[1], "sourceUnitId": b, "targetUnitId": c},
+            {"id": edge_ids[2], "sourceUnitId": c, "targetUnitId": d},
+        ],
+        "truncated": False,
+    }
+    assert data["none"] == {"unitIds": [b], "edges": []}
+    assert data["limited"]["unitIds"] == [b, a, c]
+    assert sorted(edge["id"] for edge in data["limited"]["edges"]) == edge_ids[:2]
+    assert data["limited"]["truncated"] is True
+
+    get_subgraph_query = """
+    query GetSubgraph {{
+        subgraph(unitId: {b}, relations: ["links", "unknown"]) {{ unitIds }}
+    }}
+    """.format(
+        b=b
+    )
+    response = client.post(url="/v1/graphql", json={"query": get_subgraph_query})
+    assert response.json()["errors"][0]["message"] == "Relation not found."
+    _delete_units(unit_ids)
+
+
+def test_closure_over_relations():
+    # a -> b -> c over links, b -> d -> e over supplies.
+    unit_ids, node_ids, _ = _add_graph(
+        ["relation a", "relation b", "relation c", "relation d", "relation e"],
+        [(0, 1), (1, 2)],
+    )
+    a, b, c, d, e = unit_ids
+    add_edges_mutation = """
+    mutation CreateEdges {{
+        bd: edge {{
+            addEdge(input: {{sourceUnitId: {b}, targetUnitId: {d}, relation: "supplies"}})
+            {{ relation }}
+        }}
+        de: edge {{
+            addEdge(input: {{sourceUnitId: {d}, targetUnitId: {e}, relation: "supplies"}})
+            {{ relation }}
+        }}
+    }}
+    """.format(
+        b=b, d=d, e=e
+    )
+    response = client.post(url="/v1/graphql", json={"query": add_edges_mutation})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["data"]["bd"]["addEdge"] == {"relation": "supplies"}
+
+    get_closures_query = """
+    query GetClosures {{
+        a: unit(id: {a}) {{
+            all: descendants
+            links: descendants(relations: ["links"])
+            supplies: descendants(relations: ["supplies"])
+            both: descendants(relations: ["links", "supplies"])
+            near: descendants(relations: ["links", "supplies"], maxDepth: 2)
+        }}
+        e: unit(id: {e}) {{
+            links: ancestors(relations: ["links"])
+            supplies: ancestors(relations: ["supplies"])
+        }}
+        linked: reachable(sourceUnitId: {a}, targetUnitId: {c}, relations: ["links"])
+        supplied: reachable(sourceUnitId: {a}, targetUnitId: {e}, relations: ["supplies"])
+    }}
+    """.format(
+        a=a, c=c, e=e
+    )
+    response = client.post(url="/v1/graphql", json={"query": get_closures_query})
+    assert response.status_code == status.HTTP_200_OK
+
+    data = response.json()["data"]
+    na, nb, nc, nd, ne = node_ids
+    assert data["a"] == {
+        "all": [nb, nc, nd, ne],
+        "links": [nb, nc],
+        "supplies": [],
+        "both": [nb, nc, nd, ne],
+        "near": [nb, nc, nd],
+    }
+    assert data["e"] == {"links": [], "supplies": [nb, nd]}
+    assert data["linked"] is True
+    assert data["supplied"] is False
+
+    for unknown_relation_query in [
+        f'query {{ unit(id: {a}) {{ descendants(relations: ["unknown"]) }} }}',
+        f'query {{ reachable(sourceUnitId: {a}, targetUnitId: {c}, relations: ["unknown"]) }}',
+    ]:
+        response = client.post(
+            url="/v1/graphql", json={"query": unknown_relation_query}
+        )
+        assert response.json()["errors"][0]["message"] == "Relation not found."
+    _delete_units(unit_ids)
+
+
+def test_bulk_mutations():
+    add_units_mutation = """
+    mutation AddUnits($units: [UnitInput!]!) {
+        unit { addUnits(input: { units: $units }) { index, error, result { id, nodeId, name } } }
+    }
+    """
+    units = [{"name": "bulk a"}, {"name": "b" * 101}, {"name": "bulk c"}]
+    response = client.post(
+        url="/v1/graphql",
+        json={"query": add_units_mutation, "variables": {"units": units}},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    results = response.json()["data"]["unit"]["addUnits"]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert results[1]["result"] is None and "name" in results[1]["error"]
+    a, c = results[0]["result"], results[2]["result"]
+    assert (a["name"], c["name"]) == ("bulk a", "bulk c")
+    a, c, c_node = int(a["id"]), int(c["id"]), int(c["nodeId"])
+
+    add_edges_mutation = """
+    mutation AddEdges($edges: [EdgeInput!]!) {
+        edge { addEdges(input: { edges: $edges }) { index, error, result { id, relation } } }
+    }
+    """
+    edges = [
+        {"sourceUnitId": a, "targetUnitId": c, "quantity": 2},
+        {"sourceUnitId": a, "targetUnitId": c, "relation": "supplies"},
+        {"sourceUnitId": a, "targetUnitId": c},
+        {"sourceUnitId": a, "targetUnitId": -1},
+        {"sourceUnitId": c, "targetUnitId": a, "relation": "unknown"},
+    ]
+    response = client.post(
+        url="/v1/graphql",
+        json={"query": add_edges_mutation, "variables": {"edges": edges}},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    results = response.json()["data"]["edge"]["addEdges"]
+    assert [result["error"] for result in results] == [
+        None,
+        None,
+        "Same edge as another input",
+        "Source or target not found",
+        "Relation not found",
+    ]
+    assert [result["result"]["relation"] for result in results[:2]] == [
+        "links",
+        "supplies",
+    ]
+    edge_ids = [int(result["result"]["id"]) for result in results[:2]]
+    assert _get_closures([a]) == [{"ancestors": [], "descendants": [c_node]}]
+
+    response = client.post(
+        url="/v1/graphql",
+        json={"query": add_edges_mutation, "variables": {"edges": edges[:1]}},
+    )
+    assert response.json()["data"]["edge"]["addEdges"][0]["error"] == (
+        "Edge already exists"
+    )
+
+    add_documents_mutation = """
+    mutation AddDocuments($documents: [DocumentInput!]!) {
+        document {
+            addDocuments(input: { documents: $documents }) {
+                index, error, result { unitId, name, content }
+            }
+        }
+    }
+    """
+    documents = [
+        {"unitId": a, "name": "bulk doc", "content": {"key": "value"}},
+        {"unitId": -1, "name": "orphan doc"},
+        {"unitId": c, "name": "empty doc"},
+    ]
+    response = client.post(
+        url="/v1/graphql",
+        json={"query": add_documents_mutation, "variables": {"documents": documents}},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    results = response.json()["data"]["document"]["addDocuments"]
+    assert results[0]["result"] == {
+        "unitId": a,
+        "name": "bulk doc",
+        "content": {"key": "value"},
+    }
+    assert results[1] == {"index": 1, "error": "Unit not found", "result": None}
+    assert results[2]["result"]["content"] == {}
+
+    delete_edges_mutation = """
+    mutation DeleteEdges($ids: [Int!]!) {
+        edge { deleteEdges(input: { ids: $ids }) { index, error, result { id } } }
+    }
+    """
+    response = client.post(
+        url="/v1/graphql",
+        json={"query": delete_edges_mutation, "variables": {"ids": edge_ids + [-1]}},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    results = response.json()["data"]["edge"]["deleteEdges"]
+    assert [result["error"] for result in results] == [None, None, "Edge not found"]
+    assert _get_closures([a]) == [{"ancestors": [], "descendants": []}]
+    _delete_units([a, c])
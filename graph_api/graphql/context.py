@@ -0,0 +1,65 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import strawberry
+from fastapi import Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from graph_api.authentication import InvalidCredentials, identity_provider
+from graph_api.graphql.loaders import create_loaders
+from graph_db.models import graph
+from graph_db.session import AsyncDBSession, set_current_user
+
+
+async def get_request_user(
+    request: Request, session: AsyncSession
+) -> tuple[int, list[int]] | None:
+    """Id and nodes of the user of the bearer token, None for anonymous requests."""
+    authorization = request.headers.get("Authorization")
+    if authorization is None:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise InvalidCredentials()
+
+    payload = await identity_provider.verify_token(
+        token, {"WWW-Authenticate": "Bearer"}
+    )
+    sql = select(graph.User.id, graph.User.nodes).where(
+        graph.User.name == payload.get("sub")
+    )
+    user = (await session.execute(sql)).one_or_none()
+    # Ends the lookup transaction, the next one begins with the user set.
+    await session.rollback()
+    if user is None:
+        raise InvalidCredentials()
+    return user.id, list(user.nodes)
+
+
+async def get_context(request: Request, session: AsyncDBSession) -> dict:
+    """Strawberry context getter: one AsyncSession per GraphQL request.
+
+    The session is closed by the `AsyncDBSession` dependency once the request
+    is finished. Sibling fields are resolved concurrently, so access to the
+    session is serialized through `session_lock`.
+    """
+    user_id, nodes = await get_request_user(request, session) or (None, None)
+    if user_id is not None:
+        set_current_user(session, user_id)
+    session_lock = asyncio.Lock()
+    return {
+        "session": session,
+        "session_lock": session_lock,
+        "loaders": create_loaders(session, session_lock),
+        "user_id": user_id,
+        "nodes": nodes,
+    }
+
+
+@asynccontextmanager
+async def get_session(info: strawberry.Info) -> AsyncIterator[AsyncSession]:
+    """Borrows the request session, waiting for other resolvers to release it."""
+    async with info.context["session_lock"]:
+        yield info.context["session"]
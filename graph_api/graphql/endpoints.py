@@ -1,9 +1,10 @@
 import strawberry
 from strawberry.fastapi import GraphQLRouter
 
+from graph_api.graphql.context import get_context
 from graph_api.graphql.schemas.query import Query
 from graph_api.graphql.schemas.mutation import Mutation
 
 schema = strawberry.Schema(query=Query, mutation=Mutation)
 
-graphql_router = GraphQLRouter(schema)
+graphql_router = GraphQLRouter(schema, context_getter=get_context)
@@ -0,0 +1,349 @@
+import asyncio
+from collections import defaultdict
+from functools import partial
+
+from sqlalchemy import Select, func, literal, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from strawberry.dataloader import DataLoader
+
+from graph_db.models import graph
+from graph_api.graphql.names import relation_names
+from graph_api.graphql.traversal import traversal_engine
+from graph_api.graphql.types import Aggregate, Document, Edge, TierCount, Unit
+
+
+# Every loader receives all the keys collected while resolving one level of the
+# selection set and answers them with a single `WHERE ... IN (...)` query.
+
+
+async def load_documents_by_unit_id(
+    session: AsyncSession, lock: asyncio.Lock, unit_ids: list[int]
+) -> list[list[Document]]:
+    async with lock:
+        sql = (
+            select(graph.Document)
+            .where(graph.Document.unit_id.in_(unit_ids))
+            .order_by(graph.Document.name, graph.Document.id)
+        )
+        db_documents = (await session.execute(sql)).scalars().all()
+
+    documents: dict[int, list[Document]] = defaultdict(list)
+    for document in db_documents:
+        documents[document.unit_id].append(Document(**document.as_dict()))
+    return [documents[unit_id] for unit_id in unit_ids]
+
+
+async def load_edges_by_node_id(
+    session: AsyncSession, lock: asyncio.Lock, outgoing: bool, node_ids: list[int]
+) -> list[list[Edge]]:
+    key_column = graph.Edge.source_id if outgoing else graph.Edge.target_id
+    async with lock:
+        sql = (
+            select(graph.Edge)
+            .where(key_column.in_(node_ids))
+            .order_by(graph.Edge.source_id, graph.Edge.target_id)
+        )
+        db_edges = (await session.execute(sql)).scalars().all()
+        names = await relation_names.get_names(
+            session, {edge.relation_id for edge in db_edges}
+        )
+
+    edges: dict[int, list[Edge]] = defaultdict(list)
+    for edge in db_edges:
+        key = edge.source_id if outgoing else edge.target_id
+        edges[key].append(
+            Edge(
+                id=edge.id,
+                source_unit_id=edge.source_id,
+                target_unit_id=edge.target_id,
+                quantity=edge.quantity,
+                relation=names[edge.relation_id],
+            )
+        )
+    return [edges[node_id] for node_id in node_ids]
+
+
+async def load_neighbours_by_node_id(
+    session: AsyncSession, lock: asyncio.Lock, outgoing: bool, node_ids: list[int]
+) -> list[list[Unit]]:
+    """Units at the other end of the outgoing (suppliers) or incoming edges."""
+    if outgoing:
+        key_column, neighbour_column = graph.Edge.source_id, graph.Edge.target_id
+    else:
+        key_column, neighbour_column = graph.Edge.target_id, graph.Edge.source_id
+
+    async with lock:
+        sql = (
+            select(key_column, graph.Unit)
+            .join(graph.Unit, graph.Unit.node_id == neighbour_column)
+            .where(key_column.in_(node_ids))
+            .order_by(graph.Unit.name, graph.Unit.id)
+        )
+        rows = (await session.execute(sql)).all()
+
+    # Parallel edges with different relations point to the same unit only once.
+    neighbours: dict[int, dict[int, Unit]] = defaultdict(dict)
+    for node_id, unit in rows:
+        neighbours[node_id].setdefault(unit.id, Unit(**unit.as_dict()))
+    return [list(neighbours[node_id].values()) for node_id in node_ids]
+
+
+async def is_materialized(session: AsyncSession, relation_ids: list[int]) -> bool:
+    """Whether relation_closure holds the reachability over exactly `relation_ids`."""
+    if len(relation_ids) != 1:
+        return False
+    sql = select(graph.Relation.materialized).where(
+        graph.Relation.id == relation_ids[0]
+    )
+    return bool((await session.execute(sql)).scalar())
+
+
+async def select_relation_closure(
+    session: AsyncSession,
+    node_ids: list[int],
+    relations: tuple[str, ...],
+    ancestors: bool,
+    max_depth: int | None,
+) -> Select:
+    """(node_id, related_id) pairs connected by paths of edges of `relations`.
+
+    A single materialized relation is read from relation_closure, other sets of
+    relations are traversed over their edges only.
+    """
+    relation_ids = await relation_names.get_ids(session, relations)
+    if await is_materialized(session, relation_ids):
+        closure = graph.relation_closure.c
+        if ancestors:
+            key_column, related_column = closure.descendant_id, closure.ancestor_id
+        else:
+            key_column, related_column = closure.ancestor_id, closure.descendant_id
+        sql = select(
+            key_column.label("node_id"), related_column.label("related_id")
+        ).where(closure.relation_id == relation_ids[0], key_column.in_(node_ids))
+        if max_depth is not None:
+            sql = sql.where(closure.min_depth <= max_depth)
+        return sql
+
+    near, far = graph.Edge.source_id, graph.Edge.target_id
+    if ancestors:
+        near, far = far, near
+    in_relations = graph.Edge.relation_id.in_(relation_ids)
+    if max_depth is None:
+        # UNION drops the pairs already reached, which ends the recursion on cycles.
+        reach = (
+            select(near.label("node_id"), far.label("related_id"))
+            .where(near.in_(node_ids), in_relations)
+            .cte(recursive=True)
+        )
+        reach = reach.union(
+            select(reach.c.node_id, far)
+            .join(graph.Edge, near == reach.c.related_id)
+            .where(in_relations)
+        )
+    else:
+        reach = (
+            select(
+                near.label("node_id"),
+                far.label("related_id"),
+                literal(1).label("depth"),
+            )
+            .where(near.in_(node_ids), in_relations)
+            .cte(recursive=True)
+        )
+        reach = reach.union(
+            select(reach.c.node_id, far, reach.c.depth + 1)
+            .join(graph.Edge, near == reach.c.related_id)
+            .where(in_relations, reach.c.depth < max_depth)
+        )
+    return select(reach.c.node_id, reach.c.related_id).distinct()
+
+
+async def load_closure_by_node_id(
+    session: AsyncSession,
+    lock: asyncio.Lock,
+    ancestors: bool,
+    keys: list[tuple[int, int | None, tuple[str, ...] | None]],
+) -> list[list[int]]:
+    """Ancestor or descendant node ids, keyed by (node id, max depth, relations)."""
+    csr_graph = traversal_engine.graph
+    closure = graph.node_closure.c
+    if ancestors:
+        key_column, related_column = closure.descendant_id, closure.ancestor_id
+    else:
+        key_column, related_column = closure.ancestor_id, closure.descendant_id
+
+    node_ids_by_filter: dict[tuple[int | None, tuple[str, ...] | None], list[int]] = (
+        defaultdict(list)
+    )
+    for node_id, max_depth, relations in keys:
+        node_ids_by_filter[(max_depth, relations)].append(node_id)
+
+    related: dict[tuple[int, int | None, tuple[str, ...] | None], list[int]] = (
+        defaultdict(list)
+    )
+    async with lock:
+        for (max_depth, relations), node_ids in node_ids_by_filter.items():
+            if relations is not None:
+                sql = await select_relation_closure(
+                    session, node_ids, relations, ancestors, max_depth
+                )
+                rows = sorted((await session.execute(sql)).all())
+            elif csr_graph is not None:
+                rows = [
+                    (node_id, related_id)
+                    for node_id in node_ids
+                    for related_id in csr_graph.closure(node_id, ancestors, max_depth)
+                ]
+            else:
+                sql = (
+                    select(key_column, related_column)
+                    .where(key_column.in_(node_ids))
+                    .order_by(key_column, related_column)
+                )
+                if max_depth is not None:
+                    sql = sql.where(closure.min_depth <= max_depth)
+                rows = (await session.execute(sql)).all()
+            for node_id, related_id in rows:
+                related[(node_id, max_depth, relations)].append(related_id)
+    return [related[key] for key in keys]
+
+
+async def load_tier_counts_by_node_id(
+    session: AsyncSession, lock: asyncio.Lock, node_ids: list[int]
+) -> list[list[TierCount]]:
+    if (csr_graph := traversal_engine.graph) is not None:
+        return [
+            [
+                TierCount(depth=depth, count=count)
+                for depth, count in csr_graph.tier_counts(node_id)
+            ]
+            for node_id in node_ids
+        ]
+
+    closure = graph.node_closure.c
+    async with lock:
+        sql = (
+            select(closure.ancestor_id, closure.min_depth, func.count())
+            .where(closure.ancestor_id.in_(node_ids))
+            .group_by(closure.ancestor_id, closure.min_depth)
+            .order_by(closure.ancestor_id, closure.min_depth)
+        )
+        rows = (await session.execute(sql)).all()
+
+    tiers: dict[int, list[TierCount]] = defaultdict(list)
+    for node_id, depth, count in rows:
+        tiers[node_id].append(TierCount(depth=depth, count=count))
+    return [tiers[node_id] for node_id in node_ids]
+
+
+async def load_cycle_by_node_id(
+    session: AsyncSession, lock: asyncio.Lock, node_ids: list[int]
+) -> list[list[int]]:
+    """Node ids of the strongly connected component, empty if on no cycle."""
+    member = aliased(graph.Node)
+    async with lock:
+        sql = (
+            select(graph.Node.id, member.id)
+            .join(member, member.scc_id == graph.Node.scc_id)
+            .where(graph.Node.id.in_(node_ids))
+            .order_by(graph.Node.id, member.id)
+        )
+        rows = (await session.execute(sql)).all()
+
+    cycles: dict[int, list[int]] = defaultdict(list)
+    for node_id, member_id in rows:
+        cycles[node_id].append(member_id)
+    return [cycles[node_id] for node_id in node_ids]
+
+
+async def load_footprint_by_unit_id(
+    session: AsyncSession, lock: asyncio.Lock, keys: list[tuple[int, str]]
+) -> list[float | None]:
+    """Total of the unit_footprint rows, keyed by (unit id, metric path)."""
+    footprint = graph.UnitFootprint
+    async with lock:
+        sql = select(footprint.unit_id, footprint.metric_path, footprint.total).where(
+            tuple_(footprint.unit_id, footprint.metric_path).in_(set(keys))
+        )
+        totals = {
+            (unit_id, metric_path): total
+            for unit_id, metric_path, total in (await session.execute(sql)).all()
+        }
+    return [totals.get(key) for key in keys]
+
+
+async def load_rollup_by_unit_id(
+    session: AsyncSession,
+    lock: asyncio.Lock,
+    keys: list[tuple[int, str, Aggregate]],
+) -> list[float | None]:
+    """Stored rollups, keyed by (unit id, metric path, aggregate)."""
+    rollup = graph.UnitRollup
+    async with lock:
+        sql = select(rollup).where(
+            tuple_(rollup.unit_id, rollup.metric_path).in_(
+                {(unit_id, metric_path) for unit_id, metric_path, _ in keys}
+            )
+        )
+        rows = {
+            (row.unit_id, row.metric_path): row
+            for row in (await session.execute(sql)).scalars().all()
+        }
+
+    values: list[float | None] = []
+    for unit_id, metric_path, aggregate in keys:
+        row = rows.get((unit_id, metric_path))
+        if row is None:
+            values.append(None)
+        elif aggregate == Aggregate.AVG:
+            values.append(row.total / row.count if row.count else None)
+        else:
+            values.append(
+                {
+                    Aggregate.SUM: row.total,
+                    Aggregate.MIN: row.minimum,
+                    Aggregate.MAX: row.maximum,
+                    Aggregate.COUNT: row.count,
+                }[aggregate]
+            )
+    return values
+
+
+def create_loaders(session: AsyncSession, lock: asyncio.Lock) -> dict[str, DataLoader]:
+    """Request-scoped loaders, so cached results never outlive the request."""
+    return {
+        "documents_by_unit_id": DataLoader(
+            load_fn=partial(load_documents_by_unit_id, session, lock)
+        ),
+        "outgoing_edges_by_node_id": DataLoader(
+            load_fn=partial(load_edges_by_node_id, session, lock, True)
+        ),
+        "incoming_edges_by_node_id": DataLoader(
+            load_fn=partial(load_edges_by_node_id, session, lock, False)
+        ),
+        "suppliers_by_node_id": DataLoader(
+            load_fn=partial(load_neighbours_by_node_id, session, lock, True)
+        ),
+        "customers_by_node_id": DataLoader(
+            load_fn=partial(load_neighbours_by_node_id, session, lock, False)
+        ),
+        "ancestors_by_node_id": DataLoader(
+            load_fn=partial(load_closure_by_node_id, session, lock, True)
+        ),
+        "descendants_by_node_id": DataLoader(
+            load_fn=partial(load_closure_by_node_id, session, lock, False)
+        ),
+        "tier_counts_by_node_id": DataLoader(
+            load_fn=partial(load_tier_counts_by_node_id, session, lock)
+        ),
+        "cycle_by_node_id": DataLoader(
+            load_fn=partial(load_cycle_by_node_id, session, lock)
+        ),
+        "footprint_by_unit_id": DataLoader(
+            load_fn=partial(load_footprint_by_unit_id, session, lock)
+        ),
+        "rollup_by_unit_id": DataLoader(
+            load_fn=partial(load_rollup_by_unit_id, session, lock)
+        ),
+    }
@@ -31,3 +31,5 @@ class UpdateUnitInput(BaseModel):
 class AddEdgeInput(BaseModel):
     target_unit_id: int
     source_unit_id: int
+    quantity: float | None = None
+    relation: str = "links"
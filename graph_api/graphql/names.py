@@ -0,0 +1,61 @@
+"""In-process cache of the label and relation names by id.
+
+Nodes and edges reference their label and relation by smallint id, the API
+speaks in names. Both lookup tables are tiny and their rows are never renamed,
+so each cache is loaded whole and only reloaded on a miss. The names come from
+clients, a miss on them reloads at most once per MISS_RELOAD_INTERVAL seconds.
+"""
+
+import time
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from graph_db.models import graph
+
+MISS_RELOAD_INTERVAL = 10.0
+
+
+class NameCache:
+    def __init__(self, model: type[graph.Label] | type[graph.Relation]) -> None:
+        self.model = model
+        self.ids: dict[str, int] = {}
+        self.names: dict[int, str] = {}
+        self.loaded_at = float("-inf")
+
+    async def load(self, session: AsyncSession) -> None:
+        sql = select(self.model.id, self.model.name)
+        rows = (await session.execute(sql)).all()
+        self.ids = {name: id for id, name in rows}
+        self.names = {id: name for id, name in rows}
+        self.loaded_at = time.monotonic()
+
+    async def _load_on_name_miss(self, session: AsyncSession) -> None:
+        if time.monotonic() - self.loaded_at >= MISS_RELOAD_INTERVAL:
+            await self.load(session)
+
+    async def get_id(self, session: AsyncSession, name: str) -> int | None:
+        if name not in self.ids:
+            await self._load_on_name_miss(session)
+        return self.ids.get(name)
+
+    async def get_ids(self, session: AsyncSession, names: Iterable[str]) -> list[int]:
+        names = list(names)
+        if any(name not in self.ids for name in names):
+            await self._load_on_name_miss(session)
+        if any(name not in self.ids for name in names):
+            raise ValueError(f"{self.model.__name__} not found.")
+        return [self.ids[name] for name in names]
+
+    async def get_names(
+        self, session: AsyncSession, ids: Iterable[int]
+    ) -> dict[int, str]:
+        ids = set(ids)
+        if not ids <= self.names.keys():
+            await self.load(session)
+        return {id: self.names[id] for id in ids}
+
+
+label_names = NameCache(graph.Label)
+relation_names = NameCache(graph.Relation)
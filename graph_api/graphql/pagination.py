@@ -0,0 +1,84 @@
+import base64
+import json
+from typing import Any, Callable, Sequence, TypeVar
+
+import strawberry
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from graph_api.graphql.types import Connection, ConnectionEdge, PageInfo
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+T = TypeVar("T")
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode()
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def is_total_count_selected(info: strawberry.Info) -> bool:
+    return any(
+        selection.name == "totalCount"
+        for field in info.selected_fields
+        for selection in field.selections
+        if hasattr(selection, "name")
+    )
+
+
+async def paginate(
+    session: AsyncSession,
+    sql: Select,
+    key_columns: Sequence[InstrumentedAttribute],
+    parse: Callable[[Any], T],
+    first: int | None = None,
+    after: str | None = None,
+    with_total_count: bool = False,
+) -> Connection[T]:
+    """Keyset pagination over `key_columns`, which must be unique and indexed.
+
+    The cursor holds the key of the last row of the page, so every page is a
+    single index range scan `(key) > (cursor)` regardless of its offset.
+    """
+    first = DEFAULT_PAGE_SIZE if first is None else first
+    if first < 0 or first > MAX_PAGE_SIZE:
+        raise ValueError(f"first must be between 0 and {MAX_PAGE_SIZE}")
+
+    total_count = None
+    if with_total_count:
+        count_sql = select(func.count()).select_from(sql.order_by(None).subquery())
+        total_count = (await session.execute(count_sql)).scalar_one()
+
+    page_sql = sql.order_by(*key_columns).limit(first + 1)
+    if after is not None:
+        values = decode_cursor(after, len(key_columns))
+        page_sql = page_sql.where(tuple_(*key_columns) > tuple_(*values))
+    rows = (await session.execute(page_sql)).scalars().unique().all()
+
+    edges = [
+        ConnectionEdge(
+            cursor=encode_cursor([getattr(row, column.key) for column in key_columns]),
+            node=parse(row),
+        )
+        for row in rows[:first]
+    ]
+    return Connection(
+        edges=edges,
+        page_info=PageInfo(
+            has_next_page=len(rows) > first,
+            end_cursor=edges[-1].cursor if edges else None,
+        ),
+        total_count=total_count,
+    )
@@ -1,8 +1,44 @@
+import asyncio
+from collections import defaultdict
 from graph_db.models import graph
-from graph_db.session import get_sync_session, get_async_session
-from sqlalchemy import select, delete, update, insert, text
-from sqlalchemy.orm.session import Session
-from graph_api.graphql.types import Document, Edge, Unit
+from graph_db.models.base import DESCRIPTION_MAX_LENGTH, NAME_MAX_LENGTH
+import numpy as np
+from sqlalchemy import (
+    CTE,
+    Select,
+    Float,
+    Integer,
+    Numeric,
+    SmallInteger,
+    String,
+    exists,
+    func,
+    literal,
+    select,
+    delete,
+    tuple_,
+    true,
+    union_all,
+    update,
+    insert,
+    and_,
+)
+from graph_api.graphql.context import get_session
+from graph_api.graphql.loaders import select_relation_closure
+from graph_api.graphql.names import label_names, relation_names
+from graph_api.graphql.pagination import is_total_count_selected, paginate
+from graph_api.graphql.traversal import traversal_engine
+from graph_api.graphql.types import (
+    Aggregate,
+    BulkResult,
+    Connection,
+    Document,
+    Edge,
+    Path,
+    Subgraph,
+    TierValue,
+    Unit,
+)
 from graph_api.graphql.models import (
     AddDocumentInput,
     UpdateDocumentInput,
@@ -10,181 +46,1025 @@ from graph_api.graphql.models import (
     AddEdgeInput,
     UpdateUnitInput,
 )
+from sqlalchemy.dialects.postgresql import (
+    ARRAY,
+    JSONB,
+    aggregate_order_by,
+    insert as pg_insert,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from sqlalchemy.types import TypeEngine
 from typing import Sequence
 import strawberry
 
+CLOSURE_WAIT_TIMEOUT = 10.0
+CLOSURE_POLL_INTERVAL = 0.1
+MAX_REACHABLE_PAIRS = 10_000
+MAX_PATH_DEPTH = 50
+MAX_PATHS = 1000
+MAX_SUBGRAPH_UNITS = 10_000
+MAX_BULK_ITEMS = 10_000
 
-def set_user_context(session: Session, user_id: str | None):
-    if user_id:
-        session.execute(text(f"SET app.current_user_id = '{user_id}'"))
 
+async def wait_for_closure(info: strawberry.Info) -> None:
+    """Waits until the closure worker has applied every write committed so far."""
+    async with get_session(info) as session:
+        sql = select(func.max(graph.ClosureQueue.id))
+        mark = (await session.execute(sql)).scalar()
+    if mark is None:
+        return
 
-async def get_units(info: strawberry.types.Info) -> list[Unit]:
-    session = get_sync_session()
-    user_id = info.context.get("user_id")
-    set_user_context(session, user_id)
-    sql = select(graph.Unit).order_by(graph.Unit.name)
-    db_units = session.execute(sql).scalars().unique().all()
-    return [Unit(**unit.as_dict()) for unit in db_units]
+    pending_sql = select(exists().where(graph.ClosureQueue.id <= mark))
+    deadline = asyncio.get_running_loop().time() + CLOSURE_WAIT_TIMEOUT
+    while True:
+        async with get_session(info) as session:
+            if not (await session.execute(pending_sql)).scalar():
+                return
+        if asyncio.get_running_loop().time() > deadline:
+            raise ValueError("Timed out waiting for the unit trees to be updated.")
+        await asyncio.sleep(CLOSURE_POLL_INTERVAL)
 
 
-async def get_unit_by_id(id: int) -> Unit:
-    session = get_sync_session()
-    sql = select(graph.Unit).where(graph.Unit.id == id)
-    db_units = session.execute(sql).scalars().unique().all()
+async def get_units(
+    info: strawberry.Info,
+    first: int | None = None,
+    after: str | None = None,
+    fresh: bool = False,
+) -> Connection[Unit]:
+    if fresh:
+        await wait_for_closure(info)
+    async with get_session(info) as session:
+        return await paginate(
+            session,
+            select(graph.Unit),
+            key_columns=[graph.Unit.name, graph.Unit.id],
+            parse=lambda unit: Unit(**unit.as_dict()),
+            first=first,
+            after=after,
+            with_total_count=is_total_count_selected(info),
+        )
+
+
+async def get_unit_by_id(info: strawberry.Info, id: int, fresh: bool = False) -> Unit:
+    if fresh:
+        await wait_for_closure(info)
+    async with get_session(info) as session:
+        sql = select(graph.Unit).where(graph.Unit.id == id)
+        db_units = (await session.execute(sql)).scalars().unique().all()
     return Unit(**db_units[0].as_dict())
 
 
-async def add_unit(input: AddUnitInput) -> Unit:
-    session = get_sync_session()
-    node = graph.Node(label="Unit", properties={"unit_name": input.name})
-    session.add(node)
-    session.flush()
+async def is_reachable(
+    info: strawberry.Info,
+    source_unit_id: int,
+    target_unit_id: int,
+    relations: list[str] | None = None,
+) -> bool:
+    source, target = aliased(graph.Unit), aliased(graph.Unit)
+    async with get_session(info) as session:
+        if relations is None:
+            # A primary key probe, cheaper than any traversal even in memory.
+            closure = graph.node_closure.c
+            sql = select(
+                exists().where(
+                    source.id == source_unit_id,
+                    target.id == target_unit_id,
+                    closure.ancestor_id == source.node_id,
+                    closure.descendant_id == target.node_id,
+                )
+            )
+            return (await session.execute(sql)).scalar()
+
+        sql = select(source.node_id, target.node_id).where(
+            source.id == source_unit_id, target.id == target_unit_id
+        )
+        node_ids = (await session.execute(sql)).first()
+        if node_ids is None:
+            return False
+        source_node_id, target_node_id = node_ids
+        pairs = (
+            await select_relation_closure(
+                session, [source_node_id], tuple(relations), False, None
+            )
+        ).subquery()
+        sql = select(exists().where(pairs.c.related_id == target_node_id))
+        return (await session.execute(sql)).scalar()
+
+
+async def are_reachable(info: strawberry.Info, pairs: list[list[int]]) -> list[bool]:
+    if any(len(pair) != 2 for pair in pairs):
+        raise ValueError("Each pair must be [sourceUnitId, targetUnitId].")
+    if len(pairs) > MAX_REACHABLE_PAIRS:
+        raise ValueError(f"At most {MAX_REACHABLE_PAIRS} pairs can be checked at once.")
+
+    async with get_session(info) as session:
+        unit_ids = {unit_id for pair in pairs for unit_id in pair}
+        sql = select(graph.Unit.id, graph.Unit.node_id).where(
+            graph.Unit.id.in_(unit_ids)
+        )
+        node_ids = dict((await session.execute(sql)).all())
+        # Units that don't exist or aren't visible reach nothing.
+        node_pairs = {
+            (node_ids[source_id], node_ids[target_id])
+            for source_id, target_id in pairs
+            if source_id in node_ids and target_id in node_ids
+        }
+
+        reached: set[tuple[int, int]] = set()
+        if node_pairs:
+            # One primary key probe per pair.
+            closure = graph.node_closure.c
+            sql = select(closure.ancestor_id, closure.descendant_id).where(
+                tuple_(closure.ancestor_id, closure.descendant_id).in_(node_pairs)
+            )
+            reached = set((await session.execute(sql)).tuples().all())
+
+    return [
+        (node_ids.get(source_id), node_ids.get(target_id)) in reached
+        for source_id, target_id in pairs
+    ]
+
+
+def _simple_paths(
+    successors: dict[int, list[tuple[int, int]]],
+    distances: dict[int, int],
+    source: int,
+    target: int,
+    max_depth: int,
+    limit: int,
+) -> list[tuple[list[int], list[int]]]:
+    """The first `limit` simple paths as (node ids, edge ids), depth first in
+    the order of `successors`, skipping the nodes too far from the target."""
+    # Iterative, the shortest paths have no depth cap. Each entry of `stack`
+    # iterates the successors of the node at the same position in `nodes`.
+    node_paths: list[tuple[list[int], list[int]]] = []
+    nodes, edge_ids, on_path = [source], [], {source}
+    stack = [iter(successors[source])]
+    while stack and len(node_paths) < limit:
+        for successor, edge_id in stack[-1]:
+            if successor == target:
+                node_paths.append((nodes + [target], edge_ids + [edge_id]))
+                if len(node_paths) == limit:
+                    break
+            elif (
+                successor not in on_path
+                and len(edge_ids) + 1 + distances[successor] <= max_depth
+            ):
+                nodes.append(successor)
+                edge_ids.append(edge_id)
+                on_path.add(successor)
+                stack.append(iter(successors[successor]))
+                break
+        else:
+            stack.pop()
+            if stack:
+                on_path.remove(nodes.pop())
+                edge_ids.pop()
+    return node_paths
+
+
+async def _find_paths(
+    session: AsyncSession,
+    from_unit_id: int,
+    to_unit_id: int,
+    max_depth: int | None,
+    limit: int,
+) -> list[Path]:
+    """Simple paths of at most `max_depth` edges, the shortest ones when None.
+
+    node_closure gives the exact distance of every node to the target, so the
+    search only loads the nodes on some path short enough. The shortest paths
+    never backtrack, longer ones can when the distance of a node goes through
+    the nodes already on the path.
+    """
+    sql = select(graph.Unit.id, graph.Unit.node_id).where(
+        graph.Unit.id.in_([from_unit_id, to_unit_id])
+    )
+    node_ids = dict((await session.execute(sql)).all())
+    if from_unit_id not in node_ids or to_unit_id not in node_ids:
+        raise ValueError("Unit not found.")
+    source, target = node_ids[from_unit_id], node_ids[to_unit_id]
+
+    closure = graph.node_closure.c
+    sql = select(closure.min_depth).where(
+        closure.ancestor_id == source, closure.descendant_id == target
+    )
+    distance = (await session.execute(sql)).scalar()
+    if distance is None or (max_depth is not None and distance > max_depth):
+        return []
+    max_depth = distance if max_depth is None else max_depth
+
+    # Distance to the target of every node reachable from the source on a path
+    # of at most max_depth edges.
+    from_source, to_target = aliased(graph.node_closure), aliased(graph.node_closure)
+    sql = (
+        select(to_target.c.ancestor_id, to_target.c.min_depth)
+        .join(from_source, from_source.c.descendant_id == to_target.c.ancestor_id)
+        .where(
+            from_source.c.ancestor_id == source,
+            to_target.c.descendant_id == target,
+            from_source.c.min_depth + to_target.c.min_depth <= max_depth,
+        )
+    )
+    distances = dict((await session.execute(sql)).all())
+    distances[source] = distance
+    distances[target] = 0
 
     sql = (
-        insert(graph.Unit)
-        .values(node_id=node.id, **input.model_dump(exclude_none=True))
-        .returning(graph.Unit)
+        select(graph.Edge.source_id, graph.Edge.target_id, func.min(graph.Edge.id))
+        .where(graph.Edge.source_id.in_(distances), graph.Edge.target_id.in_(distances))
+        .group_by(graph.Edge.source_id, graph.Edge.target_id)
+    )
+    successors: dict[int, list[tuple[int, int]]] = defaultdict(list)
+    for source_id, target_id, edge_id in (await session.execute(sql)).all():
+        successors[source_id].append((target_id, edge_id))
+    for edges in successors.values():
+        edges.sort(key=lambda edge: (distances[edge[0]], edge[0]))
+
+    node_paths = _simple_paths(successors, distances, source, target, max_depth, limit)
+
+    sql = select(graph.Unit.node_id, graph.Unit.id).where(
+        graph.Unit.node_id.in_({node for path, _ in node_paths for node in path})
+    )
+    unit_ids = dict((await session.execute(sql)).all())
+    return [
+        Path(unit_ids=[unit_ids[node] for node in path], edge_ids=path_edge_ids)
+        for path, path_edge_ids in node_paths
+    ]
+
+
+async def get_shortest_path(
+    info: strawberry.Info, from_unit_id: int, to_unit_id: int
+) -> Path | None:
+    async with get_session(info) as session:
+        paths = await _find_paths(session, from_unit_id, to_unit_id, None, 1)
+    return paths[0] if paths else None
+
+
+async def get_paths(
+    info: strawberry.Info,
+    from_unit_id: int,
+    to_unit_id: int,
+    max_depth: int,
+    limit: int,
+) -> list[Path]:
+    if not 1 <= max_depth <= MAX_PATH_DEPTH:
+        raise ValueError(f"maxDepth must be between 1 and {MAX_PATH_DEPTH}.")
+    if not 1 <= limit <= MAX_PATHS:
+        raise ValueError(f"limit must be between 1 and {MAX_PATHS}.")
+    async with get_session(info) as session:
+        return await _find_paths(session, from_unit_id, to_unit_id, max_depth, limit)
+
+
+def _relation_reach(
+    start: Select, max_depth: int, relation_ids: list[int], forward: bool
+) -> CTE:
+    """(node id, depth) of the nodes within `max_depth` edges of the relations
+    from the (node id, 0) rows of `start`."""
+    near, far = graph.Edge.source_id, graph.Edge.target_id
+    if not forward:
+        near, far = far, near
+    reach = start.cte(recursive=True)
+    node_column, depth_column = reach.c
+    return reach.union(
+        select(far, depth_column + 1)
+        .join(graph.Edge, near == node_column)
+        .where(graph.Edge.relation_id.in_(relation_ids), depth_column < max_depth)
+    )
+
+
+async def get_subgraph(
+    info: strawberry.Info,
+    unit_id: int,
+    up_depth: int,
+    down_depth: int,
+    relations: list[str] | None,
+    limit: int,
+) -> Subgraph:
+    """The units within `up_depth` tiers of customers and `down_depth` tiers of
+    suppliers of a unit and the edges between them, in one statement."""
+    if not (0 <= up_depth <= MAX_PATH_DEPTH and 0 <= down_depth <= MAX_PATH_DEPTH):
+        raise ValueError(f"Depths must be between 0 and {MAX_PATH_DEPTH}.")
+    if not 1 <= limit <= MAX_SUBGRAPH_UNITS:
+        raise ValueError(f"limit must be between 1 and {MAX_SUBGRAPH_UNITS}.")
+
+    async with get_session(info) as session:
+        node_id = (
+            select(graph.Unit.node_id).where(graph.Unit.id == unit_id).scalar_subquery()
+        )
+        start = select(
+            graph.Unit.node_id.label("node_id"), literal(0).label("depth")
+        ).where(graph.Unit.id == unit_id)
+
+        if relations is None:
+            # Without a relation filter the tiers are read from node_closure.
+            closure = graph.node_closure.c
+            reached = union_all(
+                start,
+                select(closure.descendant_id, closure.min_depth).where(
+                    closure.ancestor_id == node_id, closure.min_depth <= down_depth
+                ),
+                select(closure.ancestor_id, closure.min_depth).where(
+                    closure.descendant_id == node_id, closure.min_depth <= up_depth
+                ),
+            ).subquery()
+            edge_filter = true()
+        else:
+            relation_ids = await relation_names.get_ids(session, relations)
+            reaches = [
+                select(_relation_reach(start, down_depth, relation_ids, True)),
+                select(_relation_reach(start, up_depth, relation_ids, False)),
+            ]
+            if len(relation_ids) == 1:
+                # A materialized relation is read from relation_closure instead,
+                # the traversals only run when it is not.
+                materialized = (
+                    select(graph.Relation.materialized)
+                    .where(graph.Relation.id == relation_ids[0])
+                    .scalar_subquery()
+                )
+                closure = graph.relation_closure.c
+                reaches = [reach.where(~materialized) for reach in reaches] + [
+                    start.where(materialized),
+                    select(closure.descendant_id, closure.min_depth).where(
+                        materialized,
+                        closure.relation_id == relation_ids[0],
+                        closure.ancestor_id == node_id,
+                        closure.min_depth <= down_depth,
+                    ),
+                    select(closure.ancestor_id, closure.min_depth).where(
+                        materialized,
+                        closure.relation_id == relation_ids[0],
+                        closure.descendant_id == node_id,
+                        closure.min_depth <= up_depth,
+                    ),
+                ]
+            reached = union_all(*reaches).subquery()
+            edge_filter = graph.Edge.relation_id.in_(relation_ids)
+        node_column, depth_column = reached.c
+        # One row more than the limit tells whether it was hit.
+        kept = (
+            select(node_column.label("node_id"), func.min(depth_column).label("depth"))
+            .group_by(node_column)
+            .order_by(func.min(depth_column), node_column)
+            .limit(limit + 1)
+            .cte("kept")
+        )
+        edges_within = graph.Edge.target_id.in_(select(kept.c.node_id))
+        sql = (
+            select(
+                graph.Unit.id,
+                kept.c.node_id,
+                func.array_agg(aggregate_order_by(graph.Edge.id, graph.Edge.id)),
+                func.array_agg(aggregate_order_by(graph.Edge.target_id, graph.Edge.id)),
+                func.array_agg(aggregate_order_by(graph.Edge.quantity, graph.Edge.id)),
+                func.array_agg(
+                    aggregate_order_by(graph.Edge.relation_id, graph.Edge.id)
+                ),
+            )
+            .select_from(kept)
+            .join(graph.Unit, graph.Unit.node_id == kept.c.node_id)
+            .outerjoin(
+                graph.Edge,
+                and_(graph.Edge.source_id == kept.c.node_id, edges_within, edge_filter),
+            )
+            .group_by(graph.Unit.id, kept.c.node_id, kept.c.depth)
+            .order_by(kept.c.depth, kept.c.node_id)
+        )
+        rows = (await session.execute(sql)).all()
+        if not rows:
+            raise ValueError("Unit not found.")
+
+        truncated = len(rows) > limit
+        rows = rows[:limit]
+        names = await relation_names.get_names(
+            session,
+            {
+                relation_id
+                for *_, relation_ids in rows
+                for relation_id in relation_ids
+                if relation_id is not None
+            },
+        )
+
+    # The edges go between nodes, reported by the units of the nodes.
+    unit_ids = {node_id: unit_id for unit_id, node_id, *_ in rows}
+    return Subgraph(
+        unit_ids=list(unit_ids.values()),
+        edges=[
+            Edge(
+                id=edge_id,
+                source_unit_id=unit_ids[node_id],
+                target_unit_id=unit_ids[target_id],
+                quantity=quantity,
+                relation=names[relation_id],
+            )
+            for _, node_id, edge_ids, target_ids, quantities, relation_ids in rows
+            for edge_id, target_id, quantity, relation_id in zip(
+                edge_ids, target_ids, quantities, relation_ids
+            )
+            if edge_id is not None and target_id in unit_ids
+        ],
+        truncated=truncated,
+    )
+
+
+def _metric_value(metric_path: str):
+    """The JSON value at the dot separated path of the document contents."""
+    path = tuple(metric_path.split("."))
+    if not all(path):
+        raise ValueError('metricPath must be dot separated keys, like "emissions.co2".')
+    return graph.Document.content[path]
+
+
+def _aggregated(value, aggregate: Aggregate):
+    return getattr(func, aggregate.value)(value.astext.cast(Numeric)).filter(
+        func.jsonb_typeof(value) == "number"
+    )
+
+
+async def get_rollup(
+    info: strawberry.Info, unit_id: int, metric_path: str, aggregate: Aggregate
+) -> float | None:
+    """Aggregates a numeric document value over all the descendants of a unit."""
+    value = _metric_value(metric_path)
+    closure = graph.node_closure.c
+    async with get_session(info) as session:
+        sql = select(graph.Unit.node_id).where(graph.Unit.id == unit_id)
+        node_id = (await session.execute(sql)).scalar()
+        if node_id is None:
+            return None
+
+        # The node id is inlined and the type check kept out of the WHERE clause,
+        # so the plan is made for the actual size of the supply chain: hash joins
+        # for large ones, index lookups for small ones.
+        sql = (
+            select(_aggregated(value, aggregate))
+            .select_from(graph.node_closure)
+            .join(graph.Unit, graph.Unit.node_id == closure.descendant_id)
+            .join(graph.Document, graph.Document.unit_id == graph.Unit.id)
+            .where(closure.ancestor_id == literal(node_id, literal_execute=True))
+        )
+        result = (await session.execute(sql)).scalar()
+    return None if result is None else float(result)
+
+
+async def get_tier_breakdown(
+    info: strawberry.Info,
+    unit_id: int,
+    metric_path: str,
+    aggregate: Aggregate,
+    max_depth: int | None,
+) -> list[TierValue]:
+    """Aggregates a numeric document value per tier of the supply chain of a unit,
+    a tier being the shortest depth at which a unit is reached."""
+    value = _metric_value(metric_path)
+    if max_depth is not None and max_depth < 1:
+        raise ValueError("maxDepth must be at least 1.")
+
+    async with get_session(info) as session:
+        sql = select(graph.Unit.node_id).where(graph.Unit.id == unit_id)
+        node_id = (await session.execute(sql)).scalar()
+        if node_id is None:
+            return []
+
+        if (csr_graph := traversal_engine.graph) is not None:
+            # The levels of the in-memory BFS are sent as (node id, depth) arrays.
+            levels = csr_graph.cached_levels(node_id, True, max_depth)
+            if not levels:
+                return []
+            node_ids = np.concatenate(levels).tolist()
+            depths = np.repeat(
+                np.arange(1, len(levels) + 1), [len(level) for level in levels]
+            ).tolist()
+            tiers = (
+                func.unnest(
+                    literal(node_ids, ARRAY(Integer)), literal(depths, ARRAY(Integer))
+                )
+                .table_valued("node_id", "depth")
+                .render_derived()
+            )
+        else:
+            closure = graph.node_closure.c
+            tiers = select(
+                closure.descendant_id.label("node_id"),
+                closure.min_depth.label("depth"),
+            ).where(closure.ancestor_id == literal(node_id, literal_execute=True))
+            if max_depth is not None:
+                tiers = tiers.where(closure.min_depth <= max_depth)
+            tiers = tiers.subquery()
+
+        sql = (
+            select(
+                tiers.c.depth,
+                func.count(graph.Unit.id.distinct()),
+                _aggregated(value, aggregate),
+            )
+            .select_from(tiers)
+            .join(graph.Unit, graph.Unit.node_id == tiers.c.node_id)
+            .outerjoin(graph.Document, graph.Document.unit_id == graph.Unit.id)
+            .group_by(tiers.c.depth)
+            .order_by(tiers.c.depth)
+        )
+        rows = (await session.execute(sql)).all()
+    return [
+        TierValue(
+            depth=depth, units=units, value=None if result is None else float(result)
+        )
+        for depth, units, result in rows
+    ]
+
+
+async def rollup_all(info: strawberry.Info, metric_path: str) -> int:
+    """Stores the supply chain aggregates of a numeric document value for every
+    visible unit, returns the number of units written."""
+    value = _metric_value(metric_path)
+    number = value.astext.cast(Numeric)
+    closure = graph.node_closure.c
+    rollup = graph.UnitRollup
+
+    # Each node's values are aggregated once, then combined over the closure
+    # pairs, so shared sub-chains aren't read again for every unit above them.
+    node_values = (
+        select(
+            graph.Unit.node_id,
+            func.sum(number).label("total"),
+            func.count().label("count"),
+            func.min(number).label("minimum"),
+            func.max(number).label("maximum"),
+        )
+        .join(graph.Document, graph.Document.unit_id == graph.Unit.id)
+        .where(func.jsonb_typeof(value) == "number")
+        .group_by(graph.Unit.node_id)
+        .cte("node_values")
     )
-    db_units = session.execute(sql).scalars().unique().all()
-    session.commit()
+    chain_values = (
+        select(
+            closure.ancestor_id.label("node_id"),
+            func.sum(node_values.c.total).label("total"),
+            func.sum(node_values.c.count).label("count"),
+            func.min(node_values.c.minimum).label("minimum"),
+            func.max(node_values.c.maximum).label("maximum"),
+        )
+        .join(node_values, node_values.c.node_id == closure.descendant_id)
+        .group_by(closure.ancestor_id)
+        .subquery()
+    )
+    rows = select(
+        graph.Unit.id,
+        literal(metric_path),
+        chain_values.c.total,
+        func.coalesce(chain_values.c.count, 0),
+        chain_values.c.minimum,
+        chain_values.c.maximum,
+    ).outerjoin(chain_values, chain_values.c.node_id == graph.Unit.node_id)
+    columns = ["unit_id", "metric_path", "total", "count", "minimum", "maximum"]
+    sql = pg_insert(rollup).from_select(columns, rows)
+    sql = sql.on_conflict_do_update(
+        constraint="uq_unit_rollup",
+        set_={
+            **{column: sql.excluded[column] for column in columns[2:]},
+            "modified": func.now(),
+        },
+    )
+    async with get_session(info) as session:
+        written = (await session.execute(sql)).rowcount
+        await session.commit()
+    return written
+
+
+async def add_unit(info: strawberry.Info, input: AddUnitInput) -> Unit:
+    async with get_session(info) as session:
+        node = graph.Node(
+            label_id=await label_names.get_id(session, "Unit"),
+            properties={"unit_name": input.name},
+        )
+        session.add(node)
+        await session.flush()
+
+        sql = (
+            insert(graph.Unit)
+            .values(node_id=node.id, **input.model_dump(exclude_none=True))
+            .returning(graph.Unit)
+        )
+        db_units = (await session.execute(sql)).scalars().unique().all()
+        await session.commit()
     return Unit(**db_units[0].as_dict())
 
 
-async def update_unit(input: UpdateUnitInput) -> Unit:
-    session = get_sync_session()
-    sql = (
-        update(graph.Unit)
-        .where(graph.Unit.id == input.id)
-        .values(**input.model_dump(exclude_none=True, exclude={"id"}))
-        .returning(graph.Unit)
+def _check_bulk_size(items: Sequence) -> None:
+    if len(items) > MAX_BULK_ITEMS:
+        raise ValueError(f"At most {MAX_BULK_ITEMS} items can be written at once.")
+
+
+def _length_error(name: str | None, description: str | None) -> str | None:
+    if name is not None and len(name) > NAME_MAX_LENGTH:
+        return f"The name is longer than {NAME_MAX_LENGTH} characters."
+    if description is not None and len(description) > DESCRIPTION_MAX_LENGTH:
+        return f"The description is longer than {DESCRIPTION_MAX_LENGTH} characters."
+    return None
+
+
+def _unnest(**arrays: tuple[list, TypeEngine]):
+    """The arrays as the columns of one table, bound as one parameter each."""
+    return (
+        func.unnest(*(literal(values, ARRAY(type)) for values, type in arrays.values()))
+        .table_valued(*arrays)
+        .render_derived()
     )
-    db_units = session.execute(sql).scalars().unique().all()
-    session.commit()
+
+
+async def add_units(
+    info: strawberry.Info, inputs: list[AddUnitInput]
+) -> list[BulkResult[Unit]]:
+    """Inserts the nodes then the units of all the valid inputs, one statement
+    each, whatever their number."""
+    _check_bulk_size(inputs)
+    results = [
+        BulkResult(index=index, error=_length_error(input.name, input.description))
+        for index, input in enumerate(inputs)
+    ]
+    valid = [input for input, result in zip(inputs, results) if result.error is None]
+    if not valid:
+        return results
+
+    async with get_session(info) as session:
+        # The ids are drawn beforehand to match the rows to the inputs.
+        sql = select(
+            func.nextval("public.node_id_seq"), func.nextval("public.unit_id_seq")
+        ).select_from(func.generate_series(1, len(valid)))
+        node_ids, unit_ids = zip(*(await session.execute(sql)).all())
+        names = [input.name for input in valid]
+
+        nodes = _unnest(id=(node_ids, Integer), name=(names, String))
+        await session.execute(
+            insert(graph.Node).from_select(
+                ["id", "label_id", "properties"],
+                select(
+                    nodes.c.id,
+                    literal(await label_names.get_id(session, "Unit")),
+                    func.jsonb_build_object("unit_name", nodes.c.name),
+                ),
+            )
+        )
+        units = _unnest(
+            id=(unit_ids, Integer),
+            node_id=(node_ids, Integer),
+            name=(names, String),
+            description=([input.description for input in valid], String),
+        )
+        sql = (
+            insert(graph.Unit)
+            .from_select(
+                ["id", "node_id", "name", "description"],
+                select(units.c.id, units.c.node_id, units.c.name, units.c.description),
+            )
+            .returning(graph.Unit)
+        )
+        db_units = {unit.id: unit for unit in (await session.execute(sql)).scalars()}
+        await session.commit()
+
+    valid_results = (result for result in results if result.error is None)
+    for result, unit_id in zip(valid_results, unit_ids):
+        result.result = Unit(**db_units[unit_id].as_dict())
+    return results
+
+
+async def update_unit(info: strawberry.Info, input: UpdateUnitInput) -> Unit:
+    async with get_session(info) as session:
+        sql = (
+            update(graph.Unit)
+            .where(graph.Unit.id == input.id)
+            .values(**input.model_dump(exclude_none=True, exclude={"id"}))
+            .returning(graph.Unit)
+        )
+        db_units = (await session.execute(sql)).scalars().unique().all()
+        await session.commit()
     return Unit(**db_units[0].as_dict())
 
 
-async def delete_unit(id: int) -> Unit:
+async def delete_unit(info: strawberry.Info, id: int) -> Unit:
     # TODO: add comment and/or change resolver name
-    session = get_sync_session()
-    unit_sql = select(graph.Unit).where(graph.Unit.id == id)
-    db_unit = session.execute(unit_sql).scalars().unique().all()
-    if not db_unit:
-        raise ValueError(f"Unit with id {id} not found.")
-    unit = Unit(**db_unit[0].as_dict())
+    async with get_session(info) as session:
+        unit_sql = select(graph.Unit).where(graph.Unit.id == id)
+        db_unit = (await session.execute(unit_sql)).scalars().unique().all()
+        if not db_unit:
+            raise ValueError(f"Unit with id {id} not found.")
+        unit = Unit(**db_unit[0].as_dict())
 
-    delete_sql = delete(graph.Node).where(graph.Node.id == unit.node_id)
-    session.execute(delete_sql)
-    session.commit()
+        # The cascaded edges are left to the node delta of the node_closure table.
+        delete_sql = delete(graph.Node).where(graph.Node.id == unit.node_id)
+        await session.execute(delete_sql)
+        await session.commit()
 
     return unit
 
 
-def _parse_edges_from_db(db_edges: Sequence[graph.Edge]) -> list[Edge]:
+async def _parse_edges_from_db(
+    session: AsyncSession, db_edges: Sequence[graph.Edge]
+) -> list[Edge]:
+    names = await relation_names.get_names(
+        session, {edge.relation_id for edge in db_edges}
+    )
     return [
         Edge(
             id=edge.id,
             source_unit_id=edge.source_id,
             target_unit_id=edge.target_id,
+            quantity=edge.quantity,
+            relation=names[edge.relation_id],
         )
         for edge in db_edges
     ]
 
 
 async def _get_edges(
-    target_id: int | None = None, source_id: int | None = None
-) -> Sequence[graph.Edge]:
-    async with get_async_session() as session:
+    info: strawberry.Info, target_id: int | None = None, source_id: int | None = None
+) -> list[Edge]:
+    async with get_session(info) as session:
         sql = select(graph.Edge).order_by(graph.Edge.source_id, graph.Edge.target_id)
         if target_id is not None:
             sql = sql.where(graph.Edge.target_id == target_id)
         if source_id is not None:
             sql = sql.where(graph.Edge.source_id == source_id)
         result = await session.execute(sql)
-        return result.scalars().unique().all()
+        return await _parse_edges_from_db(session, result.scalars().unique().all())
 
 
-async def get_all_edges() -> list[Edge]:
-    db_edges = await _get_edges()
-    return _parse_edges_from_db(db_edges)
+async def get_all_edges(
+    info: strawberry.Info, first: int | None = None, after: str | None = None
+) -> Connection[Edge]:
+    async with get_session(info) as session:
+        connection = await paginate(
+            session,
+            select(graph.Edge),
+            key_columns=[graph.Edge.source_id, graph.Edge.target_id, graph.Edge.id],
+            parse=lambda edge: edge,
+            first=first,
+            after=after,
+            with_total_count=is_total_count_selected(info),
+        )
+        # The relation names of the whole page are resolved at once.
+        edges = await _parse_edges_from_db(
+            session, [edge.node for edge in connection.edges]
+        )
+    for connection_edge, edge in zip(connection.edges, edges):
+        connection_edge.node = edge
+    return connection
 
 
 async def get_edges_by_unit_id(
-    target_id=int | None, source_id=int | None
+    info: strawberry.Info, target_id: int | None, source_id: int | None
 ) -> list[Edge]:
-    db_edges = await _get_edges(target_id=target_id, source_id=source_id)
-    return _parse_edges_from_db(db_edges)
+    return await _get_edges(info, target_id=target_id, source_id=source_id)
 
 
-async def add_edge(input: AddEdgeInput) -> Edge:
-    session = get_sync_session()
-    sql = select(graph.Unit.id, graph.Unit.node_id).where(
-        graph.Unit.id.in_([input.source_unit_id, input.target_unit_id])
-    )
-    units = {id: node_id for id, node_id in session.execute(sql).all()}
-    if len(units) != 2:
-        raise ValueError("Source or target not found")
+async def add_edge(info: strawberry.Info, input: AddEdgeInput) -> Edge:
+    async with get_session(info) as session:
+        sql = select(graph.Unit.id, graph.Unit.node_id).where(
+            graph.Unit.id.in_([input.source_unit_id, input.target_unit_id])
+        )
+        units = {id: node_id for id, node_id in (await session.execute(sql)).all()}
+        if len(units) != 2:
+            raise ValueError("Source or target not found")
+        relation_id = await relation_names.get_id(session, input.relation)
+        if relation_id is None:
+            raise ValueError("Relation not found")
 
-    edge = graph.Edge(
-        source_id=units[input.source_unit_id], target_id=input.target_unit_id
-    )
-    session.add(edge)
-    session.commit()
-    return _parse_edges_from_db([edge])[0]
+        edge = graph.Edge(
+            source_id=units[input.source_unit_id],
+            target_id=units[input.target_unit_id],
+            quantity=input.quantity,
+            relation_id=relation_id,
+        )
+        session.add(edge)
+        await session.commit()
+        return (await _parse_edges_from_db(session, [edge]))[0]
+
+
+async def delete_edge(info: strawberry.Info, id: int) -> Edge:
+    async with get_session(info) as session:
+        sql = delete(graph.Edge).where(graph.Edge.id == id).returning(graph.Edge)
+        db_edges = (await session.execute(sql)).scalars().unique().all()
+        await session.commit()
+        return (await _parse_edges_from_db(session, db_edges))[0]
+
+
+async def add_edges(
+    info: strawberry.Info, inputs: list[AddEdgeInput]
+) -> list[BulkResult[Edge]]:
+    """Inserts the valid edges in one statement, so the closure triggers run
+    once for the whole batch. Edges that already exist are skipped."""
+    _check_bulk_size(inputs)
+    results = [BulkResult(index=index) for index in range(len(inputs))]
+    async with get_session(info) as session:
+        unit_ids = {
+            unit_id
+            for input in inputs
+            for unit_id in (input.source_unit_id, input.target_unit_id)
+        }
+        sql = select(graph.Unit.id, graph.Unit.node_id).where(
+            graph.Unit.id.in_(unit_ids)
+        )
+        node_ids = dict((await session.execute(sql)).all())
+        relation_ids = {
+            name: await relation_names.get_id(session, name)
+            for name in {input.relation for input in inputs}
+        }
+
+        # (source id, target id, relation id) of each edge to insert.
+        pending: dict[tuple[int, int, int], tuple[BulkResult[Edge], float | None]] = {}
+        for input, result in zip(inputs, results):
+            if (
+                input.source_unit_id not in node_ids
+                or input.target_unit_id not in node_ids
+            ):
+                result.error = "Source or target not found"
+            elif relation_ids[input.relation] is None:
+                result.error = "Relation not found"
+            else:
+                key = (
+                    node_ids[input.source_unit_id],
+                    node_ids[input.target_unit_id],
+                    relation_ids[input.relation],
+                )
+                if key in pending:
+                    result.error = "Same edge as another input"
+                else:
+                    pending[key] = (result, input.quantity)
+        if not pending:
+            return results
 
+        sources, targets, relations = zip(*pending)
+        edges = _unnest(
+            source_id=(sources, Integer),
+            target_id=(targets, Integer),
+            relation_id=(relations, SmallInteger),
+            quantity=([quantity for _, quantity in pending.values()], Float),
+        )
+        sql = (
+            pg_insert(graph.Edge)
+            .from_select(
+                ["source_id", "target_id", "relation_id", "quantity"],
+                select(
+                    edges.c.source_id,
+                    edges.c.target_id,
+                    edges.c.relation_id,
+                    edges.c.quantity,
+                ),
+            )
+            .on_conflict_do_nothing(constraint="uq_edge")
+            .returning(graph.Edge)
+        )
+        db_edges = (await session.execute(sql)).scalars().all()
+        await session.commit()
+        parsed = await _parse_edges_from_db(session, db_edges)
 
-async def delete_edge(id: int) -> Edge:
-    session = get_sync_session()
-    sql = delete(graph.Edge).where(graph.Edge.id == id).returning(graph.Edge)
-    db_edges = session.execute(sql).scalars().unique().all()
-    session.commit()
-    return Edge(**db_edges[0].as_dict())
+    for db_edge, edge in zip(db_edges, parsed):
+        pending[(db_edge.source_id, db_edge.target_id, db_edge.relation_id)][
+            0
+        ].result = edge
+    for result, _ in pending.values():
+        if result.result is None:
+            result.error = "Edge already exists"
+    return results
 
 
-async def get_documents() -> list[Document]:
-    session = get_sync_session()
-    sql = select(graph.Document).order_by(graph.Document.name)
-    db_documents = session.execute(sql).scalars().unique().all()
-    return [Document(**unit.as_dict()) for unit in db_documents]
+async def delete_edges(info: strawberry.Info, ids: list[int]) -> list[BulkResult[Edge]]:
+    _check_bulk_size(ids)
+    async with get_session(info) as session:
+        sql = delete(graph.Edge).where(graph.Edge.id.in_(ids)).returning(graph.Edge)
+        db_edges = (await session.execute(sql)).scalars().all()
+        await session.commit()
+        edges = {
+            edge.id: edge for edge in await _parse_edges_from_db(session, db_edges)
+        }
+    return [
+        BulkResult(
+            index=index,
+            result=edges.get(id),
+            error=None if id in edges else "Edge not found",
+        )
+        for index, id in enumerate(ids)
+    ]
 
 
-async def get_document_by_id(id: int) -> Document:
-    session = get_sync_session()
-    sql = select(graph.Document).where(graph.Document.id == id)
-    db_documents = session.execute(sql).scalars().unique().all()
+async def get_documents(
+    info: strawberry.Info, first: int | None = None, after: str | None = None
+) -> Connection[Document]:
+    async with get_session(info) as session:
+        return await paginate(
+            session,
+            select(graph.Document),
+            key_columns=[graph.Document.name, graph.Document.id],
+            parse=lambda document: Document(**document.as_dict()),
+            first=first,
+            after=after,
+            with_total_count=is_total_count_selected(info),
+        )
+
+
+async def get_document_by_id(info: strawberry.Info, id: int) -> Document:
+    async with get_session(info) as session:
+        sql = select(graph.Document).where(graph.Document.id == id)
+        db_documents = (await session.execute(sql)).scalars().unique().all()
     return Document(**db_documents[0].as_dict())
 
 
-async def add_document(input: AddDocumentInput) -> Document:
-    session = get_sync_session()
-    sql = (
-        insert(graph.Document)
-        .values(**input.model_dump(exclude_none=True))
-        .returning(graph.Document)
-    )
-    db_documents = session.execute(sql).scalars().unique().all()
-    session.commit()
+async def add_document(info: strawberry.Info, input: AddDocumentInput) -> Document:
+    async with get_session(info) as session:
+        sql = (
+            insert(graph.Document)
+            .values(**input.model_dump(exclude_none=True))
+            .returning(graph.Document)
+        )
+        db_documents = (await session.execute(sql)).scalars().unique().all()
+        await session.commit()
     return Document(**db_documents[0].as_dict())
 
 
-async def update_document(input: UpdateDocumentInput) -> Document:
-    session = get_sync_session()
-    sql = (
-        update(graph.Document)
-        .where(graph.Document.id == input.id)
-        .values(**input.model_dump(exclude_none=True, exclude={"id"}))
-        .returning(graph.Document)
-    )
-    db_documents = session.execute(sql).scalars().unique().all()
-    session.commit()
+async def add_documents(
+    info: strawberry.Info, inputs: list[AddDocumentInput]
+) -> list[BulkResult[Document]]:
+    _check_bulk_size(inputs)
+    results = [
+        BulkResult(index=index, error=_length_error(input.name, input.description))
+        for index, input in enumerate(inputs)
+    ]
+    async with get_session(info) as session:
+        sql = select(graph.Unit.id).where(
+            graph.Unit.id.in_({input.unit_id for input in inputs})
+        )
+        unit_ids = set((await session.execute(sql)).scalars())
+        for input, result in zip(inputs, results):
+            if result.error is None and input.unit_id not in unit_ids:
+                result.error = "Unit not found"
+        valid = [
+            input for input, result in zip(inputs, results) if result.error is None
+        ]
+        if not valid:
+            return results
+
+        # The ids are drawn beforehand to match the rows to the inputs.
+        sql = select(func.nextval("public.document_id_seq")).select_from(
+            func.generate_series(1, len(valid))
+        )
+        document_ids = (await session.execute(sql)).scalars().all()
+        documents = _unnest(
+            id=(document_ids, Integer),
+            unit_id=([input.unit_id for input in valid], Integer),
+            name=([input.name for input in valid], String),
+            description=([input.description for input in valid], String),
+            content=([input.content or {} for input in valid], JSONB),
+        )
+        sql = (
+            insert(graph.Document)
+            .from_select(
+                ["id", "unit_id", "name", "description", "content"],
+                select(
+                    documents.c.id,
+                    documents.c.unit_id,
+                    documents.c.name,
+                    documents.c.description,
+                    documents.c.content,
+                ),
+            )
+            .returning(graph.Document)
+        )
+        db_documents = {
+            document.id: document for document in (await session.execute(sql)).scalars()
+        }
+        await session.commit()
+
+    valid_results = (result for result in results if result.error is None)
+    for result, document_id in zip(valid_results, document_ids):
+        result.result = Document(**db_documents[document_id].as_dict())
+    return results
+
+
+async def update_document(
+    info: strawberry.Info, input: UpdateDocumentInput
+) -> Document:
+    async with get_session(info) as session:
+        sql = (
+            update(graph.Document)
+            .where(graph.Document.id == input.id)
+            .values(**input.model_dump(exclude_none=True, exclude={"id"}))
+            .returning(graph.Document)
+        )
+        db_documents = (await session.execute(sql)).scalars().unique().all()
+        await session.commit()
     return Document(**db_documents[0].as_dict())
 
 
-async def delete_document(id: int) -> Document:
-    session = get_sync_session()
-    sql = (
-        delete(graph.Document).where(graph.Document.id == id).returning(graph.Document)
-    )
-    db_documents = session.execute(sql).scalars().unique().all()
-    session.commit()
+async def delete_document(info: strawberry.Info, id: int) -> Document:
+    async with get_session(info) as session:
+        sql = (
+            delete(graph.Document)
+            .where(graph.Document.id == id)
+            .returning(graph.Document)
+        )
+        db_documents = (await session.execute(sql)).scalars().unique().all()
+        await session.commit()
     return Document(**db_documents[0].as_dict())
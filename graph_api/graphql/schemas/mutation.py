@@ -2,15 +2,29 @@ import strawberry
 import json
 from graph_api.graphql.resolvers import (
     add_unit,
+    add_units,
     update_unit,
     delete_unit,
     add_document,
+    add_documents,
     update_document,
     delete_document,
     add_edge,
+    add_edges,
     delete_edge,
+    delete_edges,
+    rollup_all,
+)
+from graph_api.graphql.types import (
+    BulkResult,
+    Document,
+    DocumentInput,
+    Edge,
+    EdgeInput,
+    JSON,
+    Unit,
+    UnitInput,
 )
-from graph_api.graphql.types import Unit, Document, Edge, JSON
 from graph_api.graphql.models import (
     AddDocumentInput,
     UpdateDocumentInput,
@@ -25,34 +39,109 @@ from strawberry.field_extensions import InputMutationExtension
 class UnitMutations:
     @strawberry.mutation(extensions=[InputMutationExtension()])
     async def addUnit(
-        self, name: str | None = None, description: str | None = None
+        self,
+        info: strawberry.Info,
+        name: str | None = None,
+        description: str | None = None,
     ) -> Unit:
-        return await add_unit(AddUnitInput(name=name, description=description))
+        return await add_unit(info, AddUnitInput(name=name, description=description))
+
+    @strawberry.mutation(
+        extensions=[InputMutationExtension()],
+        description="Adds the units in one transaction, an invalid item is reported "
+        "in its result and the others are still added.",
+    )
+    async def addUnits(
+        self, info: strawberry.Info, units: list[UnitInput]
+    ) -> list[BulkResult[Unit]]:
+        return await add_units(
+            info,
+            [
+                AddUnitInput(name=unit.name, description=unit.description)
+                for unit in units
+            ],
+        )
 
     @strawberry.mutation(extensions=[InputMutationExtension()])
     async def updateUnit(
-        self, id: int, name: str | None = None, description: str | None = None
+        self,
+        info: strawberry.Info,
+        id: int,
+        name: str | None = None,
+        description: str | None = None,
     ) -> Unit:
         return await update_unit(
-            UpdateUnitInput(id=id, name=name, description=description)
+            info, UpdateUnitInput(id=id, name=name, description=description)
         )
 
     @strawberry.mutation(extensions=[InputMutationExtension()])
-    async def deleteUnit(self, id: int) -> Unit:
-        return await delete_unit(id)
+    async def deleteUnit(self, info: strawberry.Info, id: int) -> Unit:
+        return await delete_unit(info, id)
+
+    @strawberry.mutation(
+        extensions=[InputMutationExtension()],
+        description="Stores the aggregates of the numeric value at `metricPath` over "
+        "the supply chain of every unit, returns the number of units written.",
+    )
+    async def rollupAll(self, info: strawberry.Info, metric_path: str) -> int:
+        return await rollup_all(info, metric_path)
 
 
 @strawberry.type
 class EdgeMutations:
     @strawberry.mutation(extensions=[InputMutationExtension()])
-    async def addEdge(self, target_unit_id: int, source_unit_id: int) -> Edge:
+    async def addEdge(
+        self,
+        info: strawberry.Info,
+        target_unit_id: int,
+        source_unit_id: int,
+        quantity: float | None = None,
+        relation: str = "links",
+    ) -> Edge:
         return await add_edge(
-            AddEdgeInput(target_unit_id=target_unit_id, source_unit_id=source_unit_id)
+            info,
+            AddEdgeInput(
+                target_unit_id=target_unit_id,
+                source_unit_id=source_unit_id,
+                quantity=quantity,
+                relation=relation,
+            ),
+        )
+
+    @strawberry.mutation(
+        extensions=[InputMutationExtension()],
+        description="Adds the edges in one transaction, an invalid or existing edge "
+        "is reported in its result and the others are still added.",
+    )
+    async def addEdges(
+        self, info: strawberry.Info, edges: list[EdgeInput]
+    ) -> list[BulkResult[Edge]]:
+        return await add_edges(
+            info,
+            [
+                AddEdgeInput(
+                    target_unit_id=edge.target_unit_id,
+                    source_unit_id=edge.source_unit_id,
+                    quantity=edge.quantity,
+                    relation=edge.relation,
+                )
+                for edge in edges
+            ],
         )
 
     @strawberry.mutation(extensions=[InputMutationExtension()])
-    async def deleteEdge(self, id: int) -> Edge:
-        return await delete_edge(id)
+    async def deleteEdge(self, info: strawberry.Info, id: int) -> Edge:
+        return await delete_edge(info, id)
+
+    @strawberry.mutation(
+        extensions=[InputMutationExtension()],
+        description="Deletes the edges in one transaction, an unknown id is reported "
+        "in its result.",
+    )
+    async def deleteEdges(
+        self, info: strawberry.Info, ids: list[int]
+    ) -> list[BulkResult[Edge]]:
+        return await delete_edges(info, ids)
 
 
 def transform_json_to_dict(value: JSON | None) -> dict | None:
@@ -67,40 +156,65 @@ class DocumentMutations:
     @strawberry.mutation(extensions=[InputMutationExtension()])
     async def addDocument(
         self,
+        info: strawberry.Info,
         unit_id: int,
         name: str,
         description: str | None = None,
         content: JSON | None = None,
     ) -> Document:
         return await add_document(
+            info,
             AddDocumentInput(
                 unit_id=unit_id,
                 name=name,
                 description=description,
                 content=transform_json_to_dict(content),
-            )
+            ),
+        )
+
+    @strawberry.mutation(
+        extensions=[InputMutationExtension()],
+        description="Adds the documents in one transaction, an invalid item is "
+        "reported in its result and the others are still added.",
+    )
+    async def addDocuments(
+        self, info: strawberry.Info, documents: list[DocumentInput]
+    ) -> list[BulkResult[Document]]:
+        return await add_documents(
+            info,
+            [
+                AddDocumentInput(
+                    unit_id=document.unit_id,
+                    name=document.name,
+                    description=document.description,
+                    content=transform_json_to_dict(document.content),
+                )
+                for document in documents
+            ],
         )
 
     @strawberry.mutation(extensions=[InputMutationExtension()])
     async def updateDocument(
         self,
+        info: strawberry.Info,
         id: int,
         name: str | None = None,
         description: str | None = None,
         content: JSON | None = None,
     ) -> Document:
         return await update_document(
+            info,
             UpdateDocumentInput(
                 id=id,
                 name=name,
                 description=description,
                 content=transform_json_to_dict(content),
-            )
+            ),
         )
 
     @strawberry.mutation(extensions=[InputMutationExtension()])
-    async def deleteDocument(self, id: int) -> Document:
-        return await delete_document(id)
+    async def deleteDocument(self, info: strawberry.Info, id: int) -> Document:
+        return await delete_document(info, id)
 
 
 @strawberry.type
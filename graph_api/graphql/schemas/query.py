@@ -1,5 +1,14 @@
 import strawberry
-from graph_api.graphql.types import Document, Edge, Unit
+from graph_api.graphql.types import (
+    Aggregate,
+    Connection,
+    Document,
+    Edge,
+    Path,
+    Subgraph,
+    TierValue,
+    Unit,
+)
 from graph_api.graphql.resolvers import (
     get_units,
     get_documents,
@@ -7,6 +16,13 @@ from graph_api.graphql.resolvers import (
     get_unit_by_id,
     get_document_by_id,
     get_edges_by_unit_id,
+    is_reachable,
+    are_reachable,
+    get_rollup,
+    get_tier_breakdown,
+    get_shortest_path,
+    get_paths,
+    get_subgraph,
 )
 from graph_api.graphql.auth import IsAuthenticated
 
@@ -19,28 +35,127 @@ from graph_api.graphql.auth import IsAuthenticated
 @strawberry.type
 class Query:
     @strawberry.field(permission_classes=[IsAuthenticated])
-    async def unit(self, id: int) -> Unit:
-        nodes = IsAuthenticated.get_nodes()
-        return await get_unit_by_id(id, nodes)
+    async def unit(self, info: strawberry.Info, id: int, fresh: bool = False) -> Unit:
+        return await get_unit_by_id(info, id, fresh)
 
     @strawberry.field
-    async def units(self) -> list[Unit]:
-        return await get_units()
+    async def units(
+        self,
+        info: strawberry.Info,
+        first: int | None = None,
+        after: str | None = None,
+        fresh: bool = False,
+    ) -> Connection[Unit]:
+        return await get_units(info, first, after, fresh)
 
     @strawberry.field
-    async def document(self, id: int) -> Document:
-        return await get_document_by_id(id)
+    async def document(self, info: strawberry.Info, id: int) -> Document:
+        return await get_document_by_id(info, id)
 
     @strawberry.field
-    async def documents(self) -> list[Document]:
-        return await get_documents()
+    async def documents(
+        self, info: strawberry.Info, first: int | None = None, after: str | None = None
+    ) -> Connection[Document]:
+        return await get_documents(info, first, after)
 
     @strawberry.field
-    async def edges(self) -> list[Edge]:
-        return await get_all_edges()
+    async def edges(
+        self, info: strawberry.Info, first: int | None = None, after: str | None = None
+    ) -> Connection[Edge]:
+        return await get_all_edges(info, first, after)
 
     @strawberry.field
     async def edgesByUnitId(
-        self, target_id: int | None, source_id: int | None
+        self, info: strawberry.Info, target_id: int | None, source_id: int | None
     ) -> list[Edge]:
-        return await get_edges_by_unit_id(target_id, source_id)
+        return await get_edges_by_unit_id(info, target_id, source_id)
+
+    @strawberry.field(
+        description="Whether the target is in the supply chain of the source, over "
+        "edges of `relations` when given."
+    )
+    async def reachable(
+        self,
+        info: strawberry.Info,
+        source_unit_id: int,
+        target_unit_id: int,
+        relations: list[str] | None = None,
+    ) -> bool:
+        return await is_reachable(info, source_unit_id, target_unit_id, relations)
+
+    @strawberry.field(
+        description="For each [sourceUnitId, targetUnitId] pair, whether the target "
+        "is in the supply chain of the source."
+    )
+    async def reachable_pairs(
+        self, info: strawberry.Info, pairs: list[list[int]]
+    ) -> list[bool]:
+        return await are_reachable(info, pairs)
+
+    @strawberry.field(
+        description="Aggregate of the numeric value at the dot separated "
+        "`metricPath` of the document contents over the supply chain of the unit."
+    )
+    async def rollup(
+        self,
+        info: strawberry.Info,
+        unit_id: int,
+        metric_path: str,
+        aggregate: Aggregate = Aggregate.SUM,
+    ) -> float | None:
+        return await get_rollup(info, unit_id, metric_path, aggregate)
+
+    @strawberry.field(
+        description="Aggregate of the numeric value at `metricPath` per tier of the "
+        "supply chain of the unit, within `maxDepth` tiers."
+    )
+    async def tier_breakdown(
+        self,
+        info: strawberry.Info,
+        unit_id: int,
+        metric_path: str,
+        aggregate: Aggregate = Aggregate.SUM,
+        max_depth: int | None = None,
+    ) -> list[TierValue]:
+        return await get_tier_breakdown(
+            info, unit_id, metric_path, aggregate, max_depth
+        )
+
+    @strawberry.field(
+        description="A path with the fewest edges from the first unit to the second, "
+        "null if it isn't in its supply chain."
+    )
+    async def shortest_path(
+        self, info: strawberry.Info, from_unit_id: int, to_unit_id: int
+    ) -> Path | None:
+        return await get_shortest_path(info, from_unit_id, to_unit_id)
+
+    @strawberry.field(
+        description="Up to `limit` paths from the first unit to the second with at "
+        "most `maxDepth` edges, none visiting a unit twice."
+    )
+    async def paths(
+        self,
+        info: strawberry.Info,
+        from_unit_id: int,
+        to_unit_id: int,
+        max_depth: int,
+        limit: int = 10,
+    ) -> list[Path]:
+        return await get_paths(info, from_unit_id, to_unit_id, max_depth, limit)
+
+    @strawberry.field(
+        description="The units within `upDepth` tiers of customers and `downDepth` "
+        "tiers of suppliers of the unit, following only edges of `relations` when "
+        "given, and the edges between them."
+    )
+    async def subgraph(
+        self,
+        info: strawberry.Info,
+        unit_id: int,
+        up_depth: int = 1,
+        down_depth: int = 1,
+        relations: list[str] | None = None,
+        limit: int = 1000,
+    ) -> Subgraph:
+        return await get_subgraph(info, unit_id, up_depth, down_depth, relations, limit)
@@ -0,0 +1,270 @@
+"""In-memory copy of public.edge for traversals inside the API process.
+
+The distinct (source, target) pairs are loaded into compressed sparse row arrays,
+forward and reverse, and kept current through the `edge_changes` notifications
+sent for every edge write statement once committed. Changes to known pairs only adjust their
+multiplicity in place; new pairs go to an overlay until OVERLAY_LIMIT changes
+have been applied and the arrays are reloaded.
+
+It is started with the app when the TRAVERSAL_ENGINE setting is enabled. While
+`traversal_engine.graph` is None (loading, reconnecting, or after a change too
+large to be announced) the resolvers fall back to SQL.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Iterator
+
+import numpy as np
+from asyncpg import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from graph_db.session import async_engine
+
+CHANNEL = "edge_changes"
+OVERLAY_LIMIT = 10_000
+RECONNECT_INTERVAL = 5.0
+LEVELS_CACHE_SIZE = 1024
+
+logger = logging.getLogger(__name__)
+
+
+class CSRGraph:
+    def __init__(
+        self, sources: np.ndarray, targets: np.ndarray, counts: np.ndarray
+    ) -> None:
+        """`sources` and `targets` are the distinct pairs ordered by source and
+        target, `counts` the number of edges of each pair."""
+        self.node_ids, inverse = np.unique(
+            np.concatenate([sources, targets]), return_inverse=True
+        )
+        source_index, target_index = inverse[: len(sources)], inverse[len(sources) :]
+        size = len(self.node_ids)
+
+        # The pairs are ordered by source, so the forward arrays index them directly.
+        self.forward_indptr = np.zeros(size + 1, np.int64)
+        np.cumsum(
+            np.bincount(source_index, minlength=size), out=self.forward_indptr[1:]
+        )
+        self.forward_indices = target_index
+        order = np.lexsort((source_index, target_index))
+        self.reverse_indptr = np.zeros(size + 1, np.int64)
+        np.cumsum(
+            np.bincount(target_index, minlength=size), out=self.reverse_indptr[1:]
+        )
+        self.reverse_indices = source_index[order]
+        self.reverse_pairs = order
+
+        self.counts = counts.astype(np.int64)
+        self.alive = self.counts > 0
+        self.extra_counts: dict[tuple[int, int], int] = {}
+        self.extra_successors: dict[int, set[int]] = defaultdict(set)
+        self.extra_predecessors: dict[int, set[int]] = defaultdict(set)
+        self.changes = 0
+        # Levels per (node id, forward, max depth), dropped on every change.
+        self.levels_cache: dict[tuple[int, bool, int | None], list[np.ndarray]] = {}
+
+    def _index(self, node_id: int) -> int | None:
+        index = int(np.searchsorted(self.node_ids, node_id))
+        if index < len(self.node_ids) and self.node_ids[index] == node_id:
+            return index
+        return None
+
+    def _pair(self, source_id: int, target_id: int) -> int | None:
+        source, target = self._index(source_id), self._index(target_id)
+        if source is None or target is None:
+            return None
+        start, end = self.forward_indptr[source], self.forward_indptr[source + 1]
+        position = start + int(np.searchsorted(self.forward_indices[start:end], target))
+        if position < end and self.forward_indices[position] == target:
+            return position
+        return None
+
+    def apply(self, delta: int, pairs: list[tuple[int, int]]) -> None:
+        """Adds (1) or removes (-1) one edge for each of the pairs."""
+        for source_id, target_id in pairs:
+            pair = self._pair(source_id, target_id)
+            if pair is not None:
+                self.counts[pair] += delta
+                self.alive[pair] = self.counts[pair] > 0
+                continue
+            count = self.extra_counts.get((source_id, target_id), 0) + delta
+            if count > 0:
+                self.extra_counts[(source_id, target_id)] = count
+                self.extra_successors[source_id].add(target_id)
+                self.extra_predecessors[target_id].add(source_id)
+            else:
+                self.extra_counts.pop((source_id, target_id), None)
+                self.extra_successors[source_id].discard(target_id)
+                self.extra_predecessors[target_id].discard(source_id)
+        self.changes += len(pairs)
+        self.levels_cache.clear()
+
+    def _expand(self, frontier: np.ndarray, forward: bool) -> np.ndarray:
+        if forward:
+            indptr, indices = self.forward_indptr, self.forward_indices
+            extra = self.extra_successors
+        else:
+            indptr, indices = self.reverse_indptr, self.reverse_indices
+            extra = self.extra_predecessors
+
+        neighbours = [np.empty(0, np.int64)]
+        if len(self.node_ids):
+            rows = np.minimum(
+                np.searchsorted(self.node_ids, frontier), len(self.node_ids) - 1
+            )
+            rows = rows[self.node_ids[rows] == frontier]
+            starts, lengths = indptr[rows], indptr[rows + 1] - indptr[rows]
+            offsets = np.cumsum(lengths) - lengths
+            positions = np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths)
+            pairs = positions if forward else self.reverse_pairs[positions]
+            neighbours.append(self.node_ids[indices[positions[self.alive[pairs]]]])
+        if self.extra_counts:
+            neighbours.append(
+                np.array(
+                    [
+                        neighbour
+                        for node_id in frontier.tolist()
+                        for neighbour in extra.get(node_id, ())
+                    ],
+                    np.int64,
+                )
+            )
+        return np.unique(np.concatenate(neighbours))
+
+    def levels(
+        self, node_id: int, forward: bool, max_depth: int | None = None
+    ) -> Iterator[np.ndarray]:
+        """Yields the node ids first reached at each depth, like min_depth in
+        node_closure the node itself is only reached through a cycle."""
+        visited = np.empty(0, np.int64)
+        frontier = np.array([node_id], np.int64)
+        depth = 0
+        while frontier.size and (max_depth is None or depth < max_depth):
+            frontier = self._expand(frontier, forward)
+            frontier = frontier[~np.isin(frontier, visited, assume_unique=True)]
+            visited = np.union1d(visited, frontier)
+            depth += 1
+            if frontier.size:
+                yield frontier
+
+    def cached_levels(
+        self, node_id: int, forward: bool, max_depth: int | None = None
+    ) -> list[np.ndarray]:
+        key = (node_id, forward, max_depth)
+        if key not in self.levels_cache:
+            if len(self.levels_cache) >= LEVELS_CACHE_SIZE:
+                del self.levels_cache[next(iter(self.levels_cache))]
+            self.levels_cache[key] = list(self.levels(node_id, forward, max_depth))
+        return self.levels_cache[key]
+
+    def closure(
+        self, node_id: int, ancestors: bool, max_depth: int | None = None
+    ) -> list[int]:
+        levels = list(self.levels(node_id, not ancestors, max_depth))
+        if not levels:
+            return []
+        return np.sort(np.concatenate(levels)).tolist()
+
+    def tier_counts(self, node_id: int) -> list[tuple[int, int]]:
+        return [
+            (depth, len(level))
+            for depth, level in enumerate(self.levels(node_id, True), start=1)
+        ]
+
+    def reached(self, source_id: int, target_ids: set[int]) -> set[int]:
+        """The target ids reachable from the source, stops once all are found."""
+        targets = np.array(sorted(target_ids), np.int64)
+        found = np.empty(0, np.int64)
+        for level in self.levels(source_id, True):
+            found = np.union1d(found, targets[np.isin(targets, level)])
+            if len(found) == len(targets):
+                break
+        return set(found.tolist())
+
+    def is_reachable(self, source_id: int, target_id: int) -> bool:
+        return bool(self.reached(source_id, {target_id}))
+
+
+def _parse_snapshot(snapshot: str) -> tuple[int, int, set[int]]:
+    xmin, xmax, xip = snapshot.split(":")
+    return int(xmin), int(xmax), {int(xid) for xid in xip.split(",") if xid}
+
+
+def _is_visible(xid: int, snapshot: tuple[int, int, set[int]]) -> bool:
+    xmin, xmax, xip = snapshot
+    return xid < xmin or (xid < xmax and xid not in xip)
+
+
+class TraversalEngine:
+    def __init__(self) -> None:
+        self.graph: CSRGraph | None = None
+
+    async def _load(self, connection: Connection) -> tuple[CSRGraph, str]:
+        async with connection.transaction(isolation="repeatable_read", readonly=True):
+            snapshot = await connection.fetchval("SELECT pg_current_snapshot()::text")
+            rows = await connection.fetch(
+                """
+                SELECT source_id, target_id, count(*) FROM public.edge
+                GROUP BY source_id, target_id
+                ORDER BY source_id, target_id
+                """
+            )
+        pairs = np.array([tuple(row) for row in rows], np.int64).reshape(-1, 3)
+        return CSRGraph(pairs[:, 0], pairs[:, 1], pairs[:, 2]), snapshot
+
+    async def _follow(self, engine: AsyncEngine) -> None:
+        changes: asyncio.Queue[str] = asyncio.Queue()
+        async with engine.connect() as listener:
+            raw_connection = await listener.get_raw_connection()
+            connection = raw_connection.driver_connection
+            # Listening first, the writes committed while loading are both in the
+            # queue and possibly in the snapshot, the snapshot tells them apart.
+            await connection.add_listener(
+                CHANNEL, lambda *args: changes.put_nowait(args[3])
+            )
+            while True:
+                graph, snapshot_text = await self._load(connection)
+                snapshot = _parse_snapshot(snapshot_text)
+                self.graph = graph
+                logger.info("Loaded %d edge pairs", len(graph.counts))
+
+                while graph.changes <= OVERLAY_LIMIT:
+                    try:
+                        payload = await asyncio.wait_for(
+                            changes.get(), RECONNECT_INTERVAL
+                        )
+                    except asyncio.TimeoutError:
+                        if connection.is_closed():
+                            raise ConnectionError("Lost the edge_changes listener.")
+                        continue
+
+                    # `<xid>.<n>`, the number only keeps the payloads distinct.
+                    xid, _, change = payload.partition(":")
+                    if _is_visible(int(xid.partition(".")[0]), snapshot):
+                        continue
+                    operation, _, pairs = change.partition(":")
+                    if operation == "*":
+                        break
+                    graph.apply(
+                        1 if operation == "+" else -1,
+                        [
+                            tuple(int(node_id) for node_id in pair.split(","))
+                            for pair in pairs.split(";")
+                        ],
+                    )
+                # Reloading, meanwhile the resolvers use SQL.
+                self.graph = None
+
+    async def run(self, engine: AsyncEngine = async_engine) -> None:
+        while True:
+            try:
+                await self._follow(engine)
+            except Exception:
+                logger.exception("Traversal engine stopped, reconnecting")
+            self.graph = None
+            await asyncio.sleep(RECONNECT_INTERVAL)
+
+
+traversal_engine = TraversalEngine()
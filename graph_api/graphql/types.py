@@ -1,5 +1,6 @@
 import strawberry
-from typing import Optional, NewType
+from enum import Enum
+from typing import Generic, Optional, NewType, TypeVar
 
 
 JSON = strawberry.scalar(
@@ -10,14 +11,148 @@ JSON = strawberry.scalar(
 )
 
 
+@strawberry.enum
+class Aggregate(Enum):
+    SUM = "sum"
+    AVG = "avg"
+    MIN = "min"
+    MAX = "max"
+    COUNT = "count"
+
+
 @strawberry.type
 class Unit:
     id: int
     node_id: int
     name: str | None = None
     description: str | None = None
-    ancestors: list[int] = strawberry.field(default_factory=list)
-    descendants: list[int] = strawberry.field(default_factory=list)
+    closure_version: int = strawberry.field(
+        default=0,
+        description="Last queued closure write applied to the trees. Writes in "
+        "async closure mode may not be reflected yet, query with `fresh` to wait.",
+    )
+
+    @strawberry.field(
+        description="Node ids of the units reaching this one, within `maxDepth` tiers "
+        "and over edges of `relations` when given."
+    )
+    async def ancestors(
+        self,
+        info: strawberry.Info,
+        max_depth: int | None = None,
+        relations: list[str] | None = None,
+    ) -> list[int]:
+        return await info.context["loaders"]["ancestors_by_node_id"].load(
+            (self.node_id, max_depth, None if relations is None else tuple(relations))
+        )
+
+    @strawberry.field(
+        description="Node ids of the supply chain of this unit, within `maxDepth` "
+        "tiers and over edges of `relations` when given."
+    )
+    async def descendants(
+        self,
+        info: strawberry.Info,
+        max_depth: int | None = None,
+        relations: list[str] | None = None,
+    ) -> list[int]:
+        return await info.context["loaders"]["descendants_by_node_id"].load(
+            (self.node_id, max_depth, None if relations is None else tuple(relations))
+        )
+
+    @strawberry.field(description="Number of descendants per tier of the supply chain.")
+    async def tier_counts(self, info: strawberry.Info) -> list["TierCount"]:
+        return await info.context["loaders"]["tier_counts_by_node_id"].load(
+            self.node_id
+        )
+
+    @strawberry.field(
+        description="Node ids of the units on a cycle with this one, including it."
+    )
+    async def cycle(self, info: strawberry.Info) -> list[int]:
+        return await info.context["loaders"]["cycle_by_node_id"].load(self.node_id)
+
+    @strawberry.field(
+        description="Embodied value of the metric over the whole supply network, "
+        "from the last footprint computation."
+    )
+    async def footprint(self, info: strawberry.Info, metric_path: str) -> float | None:
+        return await info.context["loaders"]["footprint_by_unit_id"].load(
+            (self.id, metric_path)
+        )
+
+    @strawberry.field(
+        description="Aggregate of `metricPath` over the supply chain as stored by "
+        "the last `rollupAll` of the metric."
+    )
+    async def rollup(
+        self,
+        info: strawberry.Info,
+        metric_path: str,
+        aggregate: Aggregate = Aggregate.SUM,
+    ) -> float | None:
+        return await info.context["loaders"]["rollup_by_unit_id"].load(
+            (self.id, metric_path, aggregate)
+        )
+
+    @strawberry.field
+    async def documents(self, info: strawberry.Info) -> list["Document"]:
+        return await info.context["loaders"]["documents_by_unit_id"].load(self.id)
+
+    @strawberry.field(description="Units at the target of the outgoing edges.")
+    async def suppliers(self, info: strawberry.Info) -> list["Unit"]:
+        return await info.context["loaders"]["suppliers_by_node_id"].load(self.node_id)
+
+    @strawberry.field(description="Units at the source of the incoming edges.")
+    async def customers(self, info: strawberry.Info) -> list["Unit"]:
+        return await info.context["loaders"]["customers_by_node_id"].load(self.node_id)
+
+    @strawberry.field
+    async def incoming_edges(self, info: strawberry.Info) -> list["Edge"]:
+        return await info.context["loaders"]["incoming_edges_by_node_id"].load(
+            self.node_id
+        )
+
+    @strawberry.field
+    async def outgoing_edges(self, info: strawberry.Info) -> list["Edge"]:
+        return await info.context["loaders"]["outgoing_edges_by_node_id"].load(
+            self.node_id
+        )
+
+
+@strawberry.type
+class TierCount:
+    depth: int
+    count: int
+
+
+@strawberry.type
+class TierValue:
+    depth: int
+    units: int = strawberry.field(description="Units first reached at this depth.")
+    value: float | None = strawberry.field(
+        description="Aggregate of the numeric document values of these units."
+    )
+
+
+@strawberry.type
+class Path:
+    unit_ids: list[int]
+    edge_ids: list[int] = strawberry.field(
+        description="An edge between each pair of consecutive units, the one with "
+        "the lowest id when several relations connect them."
+    )
+
+
+@strawberry.type
+class Subgraph:
+    unit_ids: list[int] = strawberry.field(description="Closest units first.")
+    edges: list["Edge"] = strawberry.field(
+        description="Edges between the units, of the requested relations."
+    )
+    truncated: bool = strawberry.field(
+        description="Whether more units were within reach than `limit`."
+    )
 
 
 @strawberry.type
@@ -25,6 +160,11 @@ class Edge:
     id: int
     target_unit_id: int
     source_unit_id: int
+    quantity: float | None = strawberry.field(
+        default=None,
+        description="Units of the target used per unit of the source, 1 when unset.",
+    )
+    relation: str = "links"
 
 
 @strawberry.type
@@ -34,3 +174,58 @@ class Document:
     name: str | None = None
     description: str | None = None
     content: JSON
+
+
+T = TypeVar("T")
+
+
+@strawberry.type
+class PageInfo:
+    has_next_page: bool
+    end_cursor: str | None = None
+
+
+@strawberry.type
+class ConnectionEdge(Generic[T]):
+    cursor: str
+    node: T
+
+
+@strawberry.type
+class Connection(Generic[T]):
+    edges: list[ConnectionEdge[T]]
+    page_info: PageInfo
+    total_count: int | None = strawberry.field(
+        default=None, description="Only computed when selected."
+    )
+
+
+@strawberry.type
+class BulkResult(Generic[T]):
+    index: int = strawberry.field(description="Position of the item in the input.")
+    result: T | None = None
+    error: str | None = strawberry.field(
+        default=None, description="Why the item was skipped, the others still apply."
+    )
+
+
+@strawberry.input
+class UnitInput:
+    name: str | None = None
+    description: str | None = None
+
+
+@strawberry.input
+class EdgeInput:
+    source_unit_id: int
+    target_unit_id: int
+    quantity: float | None = None
+    relation: str = "links"
+
+
+@strawberry.input
+class DocumentInput:
+    unit_id: int
+    name: str
+    description: str | None = None
+    content: JSON | None = None
@@ -1,10 +1,30 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from common.config import settings
+from graph_api.graphql.traversal import traversal_engine
 from graph_api.routes import route as api_v1_route
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not settings.TRAVERSAL_ENGINE:
+        yield
+        return
+
+    task = asyncio.create_task(traversal_engine.run())
+    try:
+        yield
+    finally:
+        task.cancel()
+        traversal_engine.graph = None
+
+
 app = FastAPI(
+    lifespan=lifespan,
     title="Network App API",
     docs_url="/docs",
     openapi_url="/docs/openapi.json",
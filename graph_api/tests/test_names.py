@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from graph_api.graphql import names
+from graph_api.graphql.names import NameCache
+from graph_db.models import graph
+
+
+class _Session:
+    """Answers the load query with `rows`, counting the queries."""
+
+    def __init__(self, rows: list[tuple[int, str]]) -> None:
+        self.rows = rows
+        self.queries = 0
+
+    async def execute(self, sql):
+        self.queries += 1
+        rows = self.rows
+
+        class Result:
+            def all(self):
+                return rows
+
+        return Result()
+
+
+def test_unknown_names_are_rejected():
+    cache, session = NameCache(graph.Relation), _Session([(1, "links")])
+
+    assert asyncio.run(cache.get_ids(session, ["links"])) == [1]
+    with pytest.raises(ValueError, match="Relation not found."):
+        asyncio.run(cache.get_ids(session, ["links", "unknown"]))
+    assert asyncio.run(cache.get_id(session, "unknown")) is None
+
+
+def test_misses_reload_once_per_interval(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr(names.time, "monotonic", lambda: now)
+    cache, session = NameCache(graph.Relation), _Session([(1, "links")])
+
+    for _ in range(3):
+        assert asyncio.run(cache.get_id(session, "supplies")) is None
+    assert session.queries == 1
+
+    session.rows = [(1, "links"), (2, "supplies")]
+    now += names.MISS_RELOAD_INTERVAL
+    assert asyncio.run(cache.get_id(session, "supplies")) == 2
+    assert session.queries == 2
+
+    # Ids come from stored rows, a miss on them always reloads.
+    session.rows.append((3, "owns"))
+    assert asyncio.run(cache.get_names(session, [3])) == {3: "owns"}
+    assert session.queries == 3
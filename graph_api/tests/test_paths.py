@@ -0,0 +1,45 @@
+from collections import defaultdict
+
+from graph_api.graphql.resolvers import _simple_paths
+
+
+def _successors(edges: list[tuple[int, int]]) -> dict[int, list[tuple[int, int]]]:
+    """Successors of {source: [(target, edge id)]}, edge ids by position."""
+    successors = defaultdict(list)
+    for edge_id, (source, target) in enumerate(edges):
+        successors[source].append((target, edge_id))
+    return successors
+
+
+def test_paths_of_a_diamond():
+    # 1 -> 2 -> 4, 1 -> 3 -> 4 and 1 -> 4.
+    successors = _successors([(1, 4), (1, 2), (1, 3), (2, 4), (3, 4)])
+    distances = {1: 1, 2: 1, 3: 1, 4: 0}
+
+    assert _simple_paths(successors, distances, 1, 4, 2, 10) == [
+        ([1, 4], [0]),
+        ([1, 2, 4], [1, 3]),
+        ([1, 3, 4], [2, 4]),
+    ]
+    assert _simple_paths(successors, distances, 1, 4, 1, 10) == [([1, 4], [0])]
+    assert _simple_paths(successors, distances, 1, 4, 2, 2) == [
+        ([1, 4], [0]),
+        ([1, 2, 4], [1, 3]),
+    ]
+
+
+def test_backtracks_out_of_a_cycle():
+    # The distance of 2 goes back through 1, which is already on the path.
+    successors = _successors([(1, 2), (2, 1), (1, 3), (3, 4)])
+    distances = {1: 2, 2: 3, 3: 1, 4: 0}
+
+    assert _simple_paths(successors, distances, 1, 4, 4, 10) == [([1, 3, 4], [2, 3])]
+
+
+def test_path_deeper_than_the_recursion_limit():
+    length = 5000
+    successors = _successors([(node, node + 1) for node in range(length)])
+    distances = {node: length - node for node in range(length + 1)}
+
+    (path,) = _simple_paths(successors, distances, 0, length, length, 1)
+    assert path == (list(range(length + 1)), list(range(length)))
@@ -0,0 +1,233 @@
+import random
+
+import numpy as np
+import pytest
+
+from graph_api.graphql.traversal import CSRGraph, _is_visible, _parse_snapshot
+from graph_db.session import engine
+
+
+def _graph(pairs: dict[tuple[int, int], int]) -> CSRGraph:
+    """CSRGraph of {(source, target): edge count}, loaded like TraversalEngine."""
+    rows = np.array(
+        [(*pair, count) for pair, count in sorted(pairs.items())], np.int64
+    ).reshape(-1, 3)
+    return CSRGraph(rows[:, 0], rows[:, 1], rows[:, 2])
+
+
+def test_is_visible():
+    snapshot = _parse_snapshot("10:20:12,15")
+    assert snapshot == (10, 20, {12, 15})
+
+    assert _is_visible(9, snapshot)
+    assert _is_visible(13, snapshot)
+    assert not _is_visible(12, snapshot)
+    assert not _is_visible(15, snapshot)
+    assert not _is_visible(20, snapshot)
+    assert not _is_visible(25, snapshot)
+    assert _parse_snapshot("7:7:") == (7, 7, set())
+    assert not _is_visible(7, _parse_snapshot("7:7:"))
+
+
+def test_reverse_pairs_point_to_the_forward_pairs():
+    pairs = {(1, 2): 1, (1, 3): 2, (2, 3): 1, (3, 1): 1, (4, 3): 1, (5, 5): 1}
+    graph = _graph(pairs)
+
+    forward_sources = np.repeat(
+        np.arange(len(graph.node_ids)), np.diff(graph.forward_indptr)
+    )
+    for target in range(len(graph.node_ids)):
+        start, end = graph.reverse_indptr[target], graph.reverse_indptr[target + 1]
+        for position in range(start, end):
+            pair = graph.reverse_pairs[position]
+            assert graph.forward_indices[pair] == target
+            assert forward_sources[pair] == graph.reverse_indices[position]
+    assert sorted(graph.reverse_pairs.tolist()) == list(range(len(pairs)))
+
+
+def test_expand():
+    graph = _graph({(1, 2): 1, (1, 3): 1, (2, 3): 1, (3, 1): 1, (4, 3): 0})
+    frontier = np.array([1, 4, 99], np.int64)
+
+    assert graph._expand(frontier, True).tolist() == [2, 3]
+    assert graph._expand(np.array([3], np.int64), False).tolist() == [1, 2]
+    assert graph._expand(np.array([99], np.int64), True).tolist() == []
+
+    # Removed pairs are skipped, overlay pairs are followed in both directions.
+    graph.apply(-1, [(1, 3)])
+    graph.apply(1, [(4, 5), (99, 1)])
+    assert graph._expand(frontier, True).tolist() == [1, 2, 5]
+    assert graph._expand(np.array([1, 5], np.int64), False).tolist() == [3, 4, 99]
+
+
+def test_apply_with_overlay():
+    graph = _graph({(1, 2): 1, (2, 3): 2})
+
+    graph.apply(-1, [(2, 3)])
+    assert graph.is_reachable(1, 3)
+    graph.apply(-1, [(2, 3)])
+    assert not graph.is_reachable(1, 3)
+    graph.apply(1, [(2, 3)])
+    assert graph.is_reachable(1, 3)
+    assert graph.extra_counts == {}
+
+    # New pairs go to the overlay, counted like the loaded ones.
+    graph.apply(1, [(3, 4), (3, 4), (4, 1)])
+    assert graph.extra_counts == {(3, 4): 2, (4, 1): 1}
+    assert graph.closure(1, False) == [1, 2, 3, 4]
+    assert graph.closure(4, True) == [1, 2, 3, 4]
+    graph.apply(-1, [(3, 4)])
+    assert graph.closure(1, False) == [1, 2, 3, 4]
+    graph.apply(-1, [(3, 4)])
+    assert graph.extra_counts == {(4, 1): 1}
+    assert graph.closure(1, False) == [2, 3]
+    assert graph.closure(4, False) == [1, 2, 3]
+    assert graph.changes == 8
+
+
+def test_cached_levels_dropped_on_change():
+    graph = _graph({(1, 2): 1, (2, 3): 1})
+
+    levels = graph.cached_levels(1, True)
+    assert [level.tolist() for level in levels] == [[2], [3]]
+    assert graph.cached_levels(1, True) is levels
+    assert [level.tolist() for level in graph.cached_levels(1, True, 1)] == [[2]]
+
+    graph.apply(1, [(1, 3)])
+    assert graph.levels_cache == {}
+    assert [level.tolist() for level in graph.cached_levels(1, True)] == [[2, 3]]
+
+
+def test_empty_graph():
+    graph = _graph({})
+    graph.apply(1, [(1, 2)])
+
+    assert graph.closure(1, False) == [2]
+    assert graph.tier_counts(2) == []
+    assert graph.reached(1, {2, 3}) == {2}
+
+
+@pytest.fixture
+def nodes():
+    """Nodes with units like add_unit creates them, so node and unit ids stay
+    aligned, deleted with their edges and closure rows afterwards."""
+    connection = engine.raw_connection()
+    cursor = connection.cursor()
+    cursor.execute(
+        """
+        INSERT INTO public.node (label_id, properties)
+        SELECT label.id, '{}' FROM public.label, generate_series(1, 40)
+        WHERE label.name = 'Unit'
+        RETURNING id
+        """
+    )
+    ids = sorted(row[0] for row in cursor.fetchall())
+    cursor.execute(
+        """
+        INSERT INTO public.unit (node_id, name)
+        SELECT node_id, 'traversal' FROM unnest(%s) AS node_id
+        """,
+        (ids,),
+    )
+    connection.commit()
+    yield connection, ids
+
+    cursor.execute("DELETE FROM public.node WHERE id = ANY(%s)", (ids,))
+    connection.commit()
+    connection.close()
+
+
+def _assert_matches_node_closure(graph: CSRGraph, cursor, ids: list[int]) -> None:
+    cursor.execute(
+        """
+        SELECT ancestor_id, descendant_id, min_depth FROM public.node_closure
+        WHERE ancestor_id = ANY(%s)
+        """,
+        (ids,),
+    )
+    descendants: dict[int, dict[int, int]] = {node_id: {} for node_id in ids}
+    ancestors: dict[int, list[int]] = {node_id: [] for node_id in ids}
+    for ancestor, descendant, depth in cursor.fetchall():
+        descendants[ancestor][descendant] = depth
+        ancestors[descendant].append(ancestor)
+
+    for node_id in ids:
+        closure = descendants[node_id]
+        assert graph.closure(node_id, False) == sorted(closure)
+        assert graph.closure(node_id, True) == sorted(ancestors[node_id])
+        assert graph.closure(node_id, False, 2) == sorted(
+            descendant for descendant, depth in closure.items() if depth <= 2
+        )
+        tiers: dict[int, int] = {}
+        for depth in closure.values():
+            tiers[depth] = tiers.get(depth, 0) + 1
+        assert graph.tier_counts(node_id) == sorted(tiers.items())
+        targets = set(ids[::3])
+        assert graph.reached(node_id, targets) == targets & closure.keys()
+
+
+def test_matches_node_closure_after_inserts_and_deletes(nodes):
+    connection, ids = nodes
+    cursor = connection.cursor()
+    rnd = random.Random(4)
+
+    def insert(pairs: list[tuple[int, int]], relation: str) -> None:
+        cursor.execute(
+            """
+            INSERT INTO public.edge (source_id, target_id, relation_id)
+            SELECT source_id, target_id, relation.id
+            FROM unnest(%s::int[], %s::int[]) AS pairs(source_id, target_id)
+            JOIN public.relation ON relation.name = %s
+            ON CONFLICT DO NOTHING
+            RETURNING source_id, target_id
+            """,
+            ([pair[0] for pair in pairs], [pair[1] for pair in pairs], relation),
+        )
+        inserted = cursor.fetchall()
+        connection.commit()
+        graph.apply(1, inserted)
+
+    def delete(count: int) -> None:
+        cursor.execute(
+            """
+            DELETE FROM public.edge WHERE id IN (
+                SELECT id FROM public.edge WHERE source_id = ANY(%s)
+                ORDER BY random() LIMIT %s
+            )
+            RETURNING source_id, target_id
+            """,
+            (ids, count),
+        )
+        deleted = cursor.fetchall()
+        connection.commit()
+        graph.apply(-1, deleted)
+
+    def random_pairs(count: int) -> list[tuple[int, int]]:
+        return [(rnd.choice(ids), rnd.choice(ids)) for _ in range(count)]
+
+    cursor.execute(
+        """
+        INSERT INTO public.edge (source_id, target_id)
+        SELECT * FROM unnest(%s::int[], %s::int[])
+        """,
+        tuple(map(list, zip(*set(random_pairs(50))))),
+    )
+    cursor.execute(
+        """
+        SELECT source_id, target_id, count(*) FROM public.edge
+        WHERE source_id = ANY(%s)
+        GROUP BY source_id, target_id
+        """,
+        (ids,),
+    )
+    graph = _graph({(source, target): count for source, target, count in cursor})
+    connection.commit()
+    _assert_matches_node_closure(graph, cursor, ids)
+
+    for step in range(6):
+        # Parallel edges of another relation, new pairs for the overlay, deletes.
+        insert(random_pairs(8), ["links", "supplies"][step % 2])
+        _assert_matches_node_closure(graph, cursor, ids)
+        delete(6)
+        _assert_matches_node_closure(graph, cursor, ids)
+    assert graph.extra_counts
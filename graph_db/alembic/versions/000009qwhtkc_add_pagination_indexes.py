@@ -0,0 +1,51 @@
+"""Add pagination indexes
+
+Revision ID: 000009qwhtkc
+Revises: 000008xknril
+Create Date: 2026-01-06 10:12:44.507213
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000009qwhtkc"
+down_revision: Union[str, None] = "000008xknril"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keyset cursors of the units, documents and edges connections.
+    op.create_index(
+        "ix_public_unit_name_id",
+        "unit",
+        ["name", "id"],
+        unique=False,
+        schema="public",
+    )
+    op.create_index(
+        "ix_public_document_name_id",
+        "document",
+        ["name", "id"],
+        unique=False,
+        schema="public",
+    )
+    op.create_index(
+        "ix_public_edge_source_id_target_id_id",
+        "edge",
+        ["source_id", "target_id", "id"],
+        unique=False,
+        schema="public",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_public_edge_source_id_target_id_id", table_name="edge", schema="public"
+    )
+    op.drop_index("ix_public_document_name_id", table_name="document", schema="public")
+    op.drop_index("ix_public_unit_name_id", table_name="unit", schema="public")
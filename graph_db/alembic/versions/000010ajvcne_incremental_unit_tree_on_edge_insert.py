@@ -0,0 +1,175 @@
+"""Incremental unit tree on edge insert
+
+Revision ID: 000010ajvcne
+Revises: 000009qwhtkc
+Create Date: 2026-01-12 18:31:05.114093
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000010ajvcne"
+down_revision: Union[str, None] = "000009qwhtkc"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION array_union (a INTEGER[], b INTEGER[]) RETURNS INTEGER[] AS $$
+            SELECT ARRAY(SELECT DISTINCT id FROM unnest(a || b) AS id ORDER BY id);
+        $$ LANGUAGE sql IMMUTABLE
+        """
+    )
+
+    # Adding the edge source -> target only adds reachability from {source} and its
+    # ancestors to {target} and its descendants, so the delta is applied with one
+    # set union per affected unit instead of recomputing the recursive CTEs.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_insert() RETURNS TRIGGER AS $$
+            DECLARE
+                source_ancestors INTEGER[];
+                target_descendants INTEGER[];
+            BEGIN
+                IF EXISTS (
+                    SELECT 1 FROM unit
+                    WHERE unit.node_id = NEW.source_id
+                        AND unit.descendants @> ARRAY[NEW.target_id]
+                ) THEN
+                    RETURN NEW;
+                END IF;
+
+                source_ancestors := array_union(
+                    COALESCE(
+                        (SELECT ancestors FROM unit WHERE unit.node_id = NEW.source_id),
+                        calculate_ancestors(NEW.source_id)
+                    ),
+                    ARRAY[NEW.source_id]
+                );
+                target_descendants := array_union(
+                    COALESCE(
+                        (SELECT descendants FROM unit WHERE unit.node_id = NEW.target_id),
+                        calculate_descendants(NEW.target_id)
+                    ),
+                    ARRAY[NEW.target_id]
+                );
+
+                UPDATE unit
+                SET
+                    ancestors = CASE
+                        WHEN unit.node_id = ANY(target_descendants)
+                        THEN array_union(unit.ancestors, source_ancestors)
+                        ELSE unit.ancestors
+                    END,
+                    descendants = CASE
+                        WHEN unit.node_id = ANY(source_ancestors)
+                        THEN array_union(unit.descendants, target_descendants)
+                        ELSE unit.descendants
+                    END
+                    WHERE unit.node_id = ANY(target_descendants || source_ancestors);
+
+                RETURN NEW;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    # Moving an edge is rare, it recomputes every unit related to either version.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_upsert() RETURNS TRIGGER AS $$
+            BEGIN
+                UPDATE unit
+                SET
+                    ancestors = calculate_ancestors(unit.node_id),
+                    descendants = calculate_descendants(unit.node_id)
+                WHERE unit.node_id IN (
+                        OLD.source_id, OLD.target_id, NEW.source_id, NEW.target_id
+                    )
+                    OR unit.descendants && ARRAY[OLD.source_id, NEW.source_id]
+                    OR unit.ancestors && ARRAY[OLD.target_id, NEW.target_id];
+
+                RETURN NEW;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute("DROP TRIGGER IF EXISTS update_unit_tree_on_edge_upsert ON public.edge;")
+    op.execute(
+        """
+        CREATE OR REPLACE TRIGGER update_unit_tree_on_edge_insert
+        AFTER INSERT ON public.edge
+        FOR EACH ROW
+        EXECUTE FUNCTION update_unit_tree_on_edge_insert();
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE TRIGGER update_unit_tree_on_edge_upsert
+        AFTER UPDATE OF source_id, target_id ON public.edge
+        FOR EACH ROW
+        EXECUTE FUNCTION update_unit_tree_on_edge_upsert();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS update_unit_tree_on_edge_upsert ON public.edge;")
+    op.execute("DROP TRIGGER IF EXISTS update_unit_tree_on_edge_insert ON public.edge;")
+    op.execute("DROP FUNCTION IF EXISTS update_unit_tree_on_edge_insert;")
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_upsert() RETURNS TRIGGER AS $$
+            BEGIN
+                UPDATE unit
+                SET
+                    ancestors = COALESCE(
+                        (
+                            WITH RECURSIVE ancestors(id) AS (
+                                SELECT edge.source_id AS id FROM edge WHERE edge.target_id = unit.node_id
+                                UNION ALL
+                                SELECT edge.source_id AS id FROM ancestors
+                                    JOIN edge ON ancestors.id = edge.target_id
+                            ) SEARCH DEPTH FIRST BY id SET order_col CYCLE id SET is_cycle USING path
+                            SELECT ARRAY_AGG(DISTINCT id) FROM ancestors
+                        ),
+                        ARRAY[]::INTEGER[]
+                    ),
+                    descendants = COALESCE(
+                        (
+                            WITH RECURSIVE descendants(id) AS (
+                                SELECT edge.target_id AS id FROM edge WHERE edge.source_id = unit.node_id
+                                UNION ALL
+                                SELECT edge.target_id AS id FROM descendants
+                                    JOIN edge ON descendants.id = edge.source_id
+                            ) SEARCH DEPTH FIRST BY id SET order_col CYCLE id SET is_cycle USING PATH
+                            SELECT ARRAY_AGG(DISTINCT id) FROM descendants
+                        ),
+                        ARRAY[]::INTEGER[]
+                    )
+                    WHERE unit.node_id IN (NEW.source_id, NEW.target_id)
+                        OR NEW.source_id = ANY(unit.ancestors)
+                        OR NEW.target_id = ANY(unit.descendants);
+
+                RETURN NEW;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE TRIGGER update_unit_tree_on_edge_upsert
+        AFTER INSERT OR UPDATE ON public.edge
+        FOR EACH ROW
+        EXECUTE FUNCTION update_unit_tree_on_edge_upsert();
+        """
+    )
+    op.execute("DROP FUNCTION IF EXISTS array_union;")
@@ -0,0 +1,162 @@
+"""Deletion aware unit tree on edge delete
+
+Revision ID: 000011pbzrxq
+Revises: 000010ajvcne
+Create Date: 2026-01-19 08:47:29.630188
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000011pbzrxq"
+down_revision: Union[str, None] = "000010ajvcne"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Removing the edge source -> target can only break reachability from
+    # {source} and its ancestors (A) to {target} and its descendants (D).
+    # When the edge is not on a cycle, A and D are disjoint and the arrays of the
+    # other side stay valid, so each unit of A keeps its descendants outside D and
+    # rederives the ones inside D from the remaining edges entering D (and the
+    # symmetric for D). Units outside A and D are not touched.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_delete() RETURNS TRIGGER AS $$
+            DECLARE
+                source_ancestors INTEGER[];
+                target_descendants INTEGER[];
+            BEGIN
+                -- Another relation between the same units keeps the reachability.
+                IF EXISTS (
+                    SELECT 1 FROM edge
+                    WHERE edge.source_id = OLD.source_id AND edge.target_id = OLD.target_id
+                ) THEN
+                    RETURN OLD;
+                END IF;
+
+                -- Read from the other units, the endpoint's own row may be gone when
+                -- the edge is deleted by the cascade of a unit deletion.
+                source_ancestors := array_union(
+                    ARRAY(SELECT unit.node_id FROM unit WHERE unit.descendants @> ARRAY[OLD.source_id]),
+                    ARRAY[OLD.source_id]
+                );
+                target_descendants := array_union(
+                    ARRAY(SELECT unit.node_id FROM unit WHERE unit.ancestors @> ARRAY[OLD.target_id]),
+                    ARRAY[OLD.target_id]
+                );
+
+                IF source_ancestors && target_descendants THEN
+                    -- The edge was on a cycle: only the affected side is recomputed.
+                    UPDATE unit
+                    SET
+                        ancestors = CASE
+                            WHEN unit.node_id = ANY(target_descendants)
+                            THEN calculate_ancestors(unit.node_id)
+                            ELSE unit.ancestors
+                        END,
+                        descendants = CASE
+                            WHEN unit.node_id = ANY(source_ancestors)
+                            THEN calculate_descendants(unit.node_id)
+                            ELSE unit.descendants
+                        END
+                        WHERE unit.node_id = ANY(target_descendants || source_ancestors);
+
+                    RETURN OLD;
+                END IF;
+
+                WITH affected AS (
+                    SELECT
+                        unit.node_id,
+                        ARRAY(
+                            SELECT id FROM unnest(unit.descendants) AS id
+                            WHERE NOT id = ANY(target_descendants)
+                        ) AS kept
+                    FROM unit
+                    WHERE unit.node_id = ANY(source_ancestors)
+                ), entering AS (
+                    SELECT edge.source_id, edge.target_id
+                    FROM edge
+                    WHERE edge.target_id = ANY(target_descendants)
+                        AND NOT edge.source_id = ANY(target_descendants)
+                ), reached AS (
+                    SELECT DISTINCT affected.node_id, reached.id
+                    FROM affected
+                    CROSS JOIN LATERAL unnest(affected.kept || affected.node_id) AS through(id)
+                    JOIN entering ON entering.source_id = through.id
+                    LEFT JOIN unit entered ON entered.node_id = entering.target_id
+                    CROSS JOIN LATERAL unnest(
+                        COALESCE(entered.descendants, ARRAY[]::INTEGER[]) || entering.target_id
+                    ) AS reached(id)
+                )
+                UPDATE unit
+                SET descendants = array_union(
+                    affected.kept,
+                    ARRAY(SELECT reached.id FROM reached WHERE reached.node_id = affected.node_id)
+                )
+                FROM affected
+                WHERE unit.node_id = affected.node_id;
+
+                WITH affected AS (
+                    SELECT
+                        unit.node_id,
+                        ARRAY(
+                            SELECT id FROM unnest(unit.ancestors) AS id
+                            WHERE NOT id = ANY(source_ancestors)
+                        ) AS kept
+                    FROM unit
+                    WHERE unit.node_id = ANY(target_descendants)
+                ), leaving AS (
+                    SELECT edge.source_id, edge.target_id
+                    FROM edge
+                    WHERE edge.source_id = ANY(source_ancestors)
+                        AND NOT edge.target_id = ANY(source_ancestors)
+                ), reached AS (
+                    SELECT DISTINCT affected.node_id, reached.id
+                    FROM affected
+                    CROSS JOIN LATERAL unnest(affected.kept || affected.node_id) AS through(id)
+                    JOIN leaving ON leaving.target_id = through.id
+                    LEFT JOIN unit exited ON exited.node_id = leaving.source_id
+                    CROSS JOIN LATERAL unnest(
+                        COALESCE(exited.ancestors, ARRAY[]::INTEGER[]) || leaving.source_id
+                    ) AS reached(id)
+                )
+                UPDATE unit
+                SET ancestors = array_union(
+                    affected.kept,
+                    ARRAY(SELECT reached.id FROM reached WHERE reached.node_id = affected.node_id)
+                )
+                FROM affected
+                WHERE unit.node_id = affected.node_id;
+
+                RETURN OLD;
+            END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_delete() RETURNS TRIGGER AS $$
+            BEGIN
+                UPDATE unit
+                SET
+                    ancestors = calculate_ancestors(unit.node_id),
+                    descendants = calculate_descendants(unit.node_id)
+                WHERE OLD.source_id = ANY(unit.ancestors)
+                    OR OLD.source_id = ANY(unit.descendants)
+                    OR OLD.target_id = ANY(unit.ancestors)
+                    OR OLD.target_id = ANY(unit.descendants);
+
+                RETURN OLD;
+            END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
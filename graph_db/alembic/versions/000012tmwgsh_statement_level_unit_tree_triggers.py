@@ -0,0 +1,506 @@
+"""Statement level unit tree triggers
+
+Revision ID: 000012tmwgsh
+Revises: 000011pbzrxq
+Create Date: 2026-01-26 14:05:52.871420
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000012tmwgsh"
+down_revision: Union[str, None] = "000011pbzrxq"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Single edge deltas, previously the bodies of the FOR EACH ROW triggers.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION apply_edge_insert (source_node_id INT, target_node_id INT) RETURNS VOID AS $$
+            DECLARE
+                source_ancestors INTEGER[];
+                target_descendants INTEGER[];
+            BEGIN
+                IF EXISTS (
+                    SELECT 1 FROM unit
+                    WHERE unit.node_id = source_node_id
+                        AND unit.descendants @> ARRAY[target_node_id]
+                ) THEN
+                    RETURN;
+                END IF;
+
+                source_ancestors := array_union(
+                    COALESCE(
+                        (SELECT ancestors FROM unit WHERE unit.node_id = source_node_id),
+                        calculate_ancestors(source_node_id)
+                    ),
+                    ARRAY[source_node_id]
+                );
+                target_descendants := array_union(
+                    COALESCE(
+                        (SELECT descendants FROM unit WHERE unit.node_id = target_node_id),
+                        calculate_descendants(target_node_id)
+                    ),
+                    ARRAY[target_node_id]
+                );
+
+                UPDATE unit
+                SET
+                    ancestors = CASE
+                        WHEN unit.node_id = ANY(target_descendants)
+                        THEN array_union(unit.ancestors, source_ancestors)
+                        ELSE unit.ancestors
+                    END,
+                    descendants = CASE
+                        WHEN unit.node_id = ANY(source_ancestors)
+                        THEN array_union(unit.descendants, target_descendants)
+                        ELSE unit.descendants
+                    END
+                    WHERE unit.node_id = ANY(target_descendants || source_ancestors);
+
+                RETURN;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION apply_edge_delete (source_node_id INT, target_node_id INT) RETURNS VOID AS $$
+            DECLARE
+                source_ancestors INTEGER[];
+                target_descendants INTEGER[];
+            BEGIN
+                -- Another relation between the same units keeps the reachability.
+                IF EXISTS (
+                    SELECT 1 FROM edge
+                    WHERE edge.source_id = source_node_id AND edge.target_id = target_node_id
+                ) THEN
+                    RETURN;
+                END IF;
+
+                -- Read from the other units, the endpoint's own row may be gone when
+                -- the edge is deleted by the cascade of a unit deletion.
+                source_ancestors := array_union(
+                    ARRAY(SELECT unit.node_id FROM unit WHERE unit.descendants @> ARRAY[source_node_id]),
+                    ARRAY[source_node_id]
+                );
+                target_descendants := array_union(
+                    ARRAY(SELECT unit.node_id FROM unit WHERE unit.ancestors @> ARRAY[target_node_id]),
+                    ARRAY[target_node_id]
+                );
+
+                IF source_ancestors && target_descendants THEN
+                    -- The edge was on a cycle: only the affected side is recomputed.
+                    PERFORM recalculate_unit_trees(source_ancestors, target_descendants);
+                    RETURN;
+                END IF;
+
+                WITH affected AS (
+                    SELECT
+                        unit.node_id,
+                        ARRAY(
+                            SELECT id FROM unnest(unit.descendants) AS id
+                            WHERE NOT id = ANY(target_descendants)
+                        ) AS kept
+                    FROM unit
+                    WHERE unit.node_id = ANY(source_ancestors)
+                ), entering AS (
+                    SELECT edge.source_id, edge.target_id
+                    FROM edge
+                    WHERE edge.target_id = ANY(target_descendants)
+                        AND NOT edge.source_id = ANY(target_descendants)
+                ), reached AS (
+                    SELECT DISTINCT affected.node_id, reached.id
+                    FROM affected
+                    CROSS JOIN LATERAL unnest(affected.kept || affected.node_id) AS through(id)
+                    JOIN entering ON entering.source_id = through.id
+                    LEFT JOIN unit entered ON entered.node_id = entering.target_id
+                    CROSS JOIN LATERAL unnest(
+                        COALESCE(entered.descendants, ARRAY[]::INTEGER[]) || entering.target_id
+                    ) AS reached(id)
+                )
+                UPDATE unit
+                SET descendants = array_union(
+                    affected.kept,
+                    ARRAY(SELECT reached.id FROM reached WHERE reached.node_id = affected.node_id)
+                )
+                FROM affected
+                WHERE unit.node_id = affected.node_id;
+
+                WITH affected AS (
+                    SELECT
+                        unit.node_id,
+                        ARRAY(
+                            SELECT id FROM unnest(unit.ancestors) AS id
+                            WHERE NOT id = ANY(source_ancestors)
+                        ) AS kept
+                    FROM unit
+                    WHERE unit.node_id = ANY(target_descendants)
+                ), leaving AS (
+                    SELECT edge.source_id, edge.target_id
+                    FROM edge
+                    WHERE edge.source_id = ANY(source_ancestors)
+                        AND NOT edge.target_id = ANY(source_ancestors)
+                ), reached AS (
+                    SELECT DISTINCT affected.node_id, reached.id
+                    FROM affected
+                    CROSS JOIN LATERAL unnest(affected.kept || affected.node_id) AS through(id)
+                    JOIN leaving ON leaving.target_id = through.id
+                    LEFT JOIN unit exited ON exited.node_id = leaving.source_id
+                    CROSS JOIN LATERAL unnest(
+                        COALESCE(exited.ancestors, ARRAY[]::INTEGER[]) || leaving.source_id
+                    ) AS reached(id)
+                )
+                UPDATE unit
+                SET ancestors = array_union(
+                    affected.kept,
+                    ARRAY(SELECT reached.id FROM reached WHERE reached.node_id = affected.node_id)
+                )
+                FROM affected
+                WHERE unit.node_id = affected.node_id;
+
+                RETURN;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    # Recomputes the descendants of the units in `descendants_of` and the ancestors
+    # of the units in `ancestors_of` with one traversal from all of them, and
+    # rewrites each affected unit row once.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION recalculate_unit_trees (
+            descendants_of INTEGER[], ancestors_of INTEGER[]
+        ) RETURNS VOID AS $$
+            WITH RECURSIVE reached_descendants(root, id) AS (
+                SELECT edge.source_id, edge.target_id FROM edge
+                WHERE edge.source_id = ANY(descendants_of)
+                UNION
+                SELECT reached_descendants.root, edge.target_id FROM reached_descendants
+                    JOIN edge ON reached_descendants.id = edge.source_id
+            ), reached_ancestors(root, id) AS (
+                SELECT edge.target_id, edge.source_id FROM edge
+                WHERE edge.target_id = ANY(ancestors_of)
+                UNION
+                SELECT reached_ancestors.root, edge.source_id FROM reached_ancestors
+                    JOIN edge ON reached_ancestors.id = edge.target_id
+            ), descendant_arrays AS (
+                SELECT root, ARRAY_AGG(DISTINCT id ORDER BY id) AS ids
+                FROM reached_descendants GROUP BY root
+            ), ancestor_arrays AS (
+                SELECT root, ARRAY_AGG(DISTINCT id ORDER BY id) AS ids
+                FROM reached_ancestors GROUP BY root
+            )
+            UPDATE unit
+            SET
+                descendants = CASE
+                    WHEN unit.node_id = ANY(descendants_of)
+                    THEN COALESCE(trees.descendants, ARRAY[]::INTEGER[])
+                    ELSE unit.descendants
+                END,
+                ancestors = CASE
+                    WHEN unit.node_id = ANY(ancestors_of)
+                    THEN COALESCE(trees.ancestors, ARRAY[]::INTEGER[])
+                    ELSE unit.ancestors
+                END
+            FROM (
+                SELECT affected.node_id, descendant_arrays.ids AS descendants,
+                    ancestor_arrays.ids AS ancestors
+                FROM (SELECT DISTINCT unnest(descendants_of || ancestors_of) AS node_id) AS affected
+                LEFT JOIN descendant_arrays ON descendant_arrays.root = affected.node_id
+                LEFT JOIN ancestor_arrays ON ancestor_arrays.root = affected.node_id
+            ) AS trees
+            WHERE unit.node_id = trees.node_id;
+        $$ LANGUAGE sql
+        """
+    )
+
+    # A multi-row insert can chain its own edges, so the single edge delta is only
+    # used for one row. Otherwise every unit that may gain reachability, i.e. the
+    # old {source} + ancestors and {target} + descendants of any new edge, is
+    # recomputed once.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_insert() RETURNS TRIGGER AS $$
+            DECLARE
+                descendants_of INTEGER[];
+                ancestors_of INTEGER[];
+            BEGIN
+                IF (SELECT count(*) FROM inserted_edges) <= 1 THEN
+                    PERFORM apply_edge_insert(inserted_edges.source_id, inserted_edges.target_id)
+                    FROM inserted_edges;
+                    RETURN NULL;
+                END IF;
+
+                descendants_of := ARRAY(
+                    SELECT inserted_edges.source_id FROM inserted_edges
+                    UNION
+                    SELECT unnest(unit.ancestors) FROM inserted_edges
+                        JOIN unit ON unit.node_id = inserted_edges.source_id
+                );
+                ancestors_of := ARRAY(
+                    SELECT inserted_edges.target_id FROM inserted_edges
+                    UNION
+                    SELECT unnest(unit.descendants) FROM inserted_edges
+                        JOIN unit ON unit.node_id = inserted_edges.target_id
+                );
+                PERFORM recalculate_unit_trees(descendants_of, ancestors_of);
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_delete() RETURNS TRIGGER AS $$
+            DECLARE
+                descendants_of INTEGER[];
+                ancestors_of INTEGER[];
+            BEGIN
+                IF (SELECT count(*) FROM deleted_edges) <= 1 THEN
+                    PERFORM apply_edge_delete(deleted_edges.source_id, deleted_edges.target_id)
+                    FROM deleted_edges;
+                    RETURN NULL;
+                END IF;
+
+                -- Read from the other units, the endpoints' rows may be gone when the
+                -- edges are deleted by the cascade of a unit deletion.
+                descendants_of := ARRAY(
+                    SELECT deleted_edges.source_id FROM deleted_edges
+                    UNION
+                    SELECT unit.node_id FROM unit
+                        JOIN deleted_edges ON unit.descendants @> ARRAY[deleted_edges.source_id]
+                );
+                ancestors_of := ARRAY(
+                    SELECT deleted_edges.target_id FROM deleted_edges
+                    UNION
+                    SELECT unit.node_id FROM unit
+                        JOIN deleted_edges ON unit.ancestors @> ARRAY[deleted_edges.target_id]
+                );
+                PERFORM recalculate_unit_trees(descendants_of, ancestors_of);
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute("DROP TRIGGER IF EXISTS update_unit_tree_on_edge_insert ON public.edge;")
+    op.execute("DROP TRIGGER IF EXISTS update_unit_tree_on_edge_delete ON public.edge;")
+    op.execute(
+        """
+        CREATE TRIGGER update_unit_tree_on_edge_insert
+        AFTER INSERT ON public.edge
+        REFERENCING NEW TABLE AS inserted_edges
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION update_unit_tree_on_edge_insert();
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER update_unit_tree_on_edge_delete
+        AFTER DELETE ON public.edge
+        REFERENCING OLD TABLE AS deleted_edges
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION update_unit_tree_on_edge_delete();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS update_unit_tree_on_edge_delete ON public.edge;")
+    op.execute("DROP TRIGGER IF EXISTS update_unit_tree_on_edge_insert ON public.edge;")
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_insert() RETURNS TRIGGER AS $$
+            DECLARE
+                source_ancestors INTEGER[];
+                target_descendants INTEGER[];
+            BEGIN
+                IF EXISTS (
+                    SELECT 1 FROM unit
+                    WHERE unit.node_id = NEW.source_id
+                        AND unit.descendants @> ARRAY[NEW.target_id]
+                ) THEN
+                    RETURN NEW;
+                END IF;
+
+                source_ancestors := array_union(
+                    COALESCE(
+                        (SELECT ancestors FROM unit WHERE unit.node_id = NEW.source_id),
+                        calculate_ancestors(NEW.source_id)
+                    ),
+                    ARRAY[NEW.source_id]
+                );
+                target_descendants := array_union(
+                    COALESCE(
+                        (SELECT descendants FROM unit WHERE unit.node_id = NEW.target_id),
+                        calculate_descendants(NEW.target_id)
+                    ),
+                    ARRAY[NEW.target_id]
+                );
+
+                UPDATE unit
+                SET
+                    ancestors = CASE
+                        WHEN unit.node_id = ANY(target_descendants)
+                        THEN array_union(unit.ancestors, source_ancestors)
+                        ELSE unit.ancestors
+                    END,
+                    descendants = CASE
+                        WHEN unit.node_id = ANY(source_ancestors)
+                        THEN array_union(unit.descendants, target_descendants)
+                        ELSE unit.descendants
+                    END
+                    WHERE unit.node_id = ANY(target_descendants || source_ancestors);
+
+                RETURN NEW;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_delete() RETURNS TRIGGER AS $$
+            DECLARE
+                source_ancestors INTEGER[];
+                target_descendants INTEGER[];
+            BEGIN
+                -- Another relation between the same units keeps the reachability.
+                IF EXISTS (
+                    SELECT 1 FROM edge
+                    WHERE edge.source_id = OLD.source_id AND edge.target_id = OLD.target_id
+                ) THEN
+                    RETURN OLD;
+                END IF;
+
+                -- Read from the other units, the endpoint's own row may be gone when
+                -- the edge is deleted by the cascade of a unit deletion.
+                source_ancestors := array_union(
+                    ARRAY(SELECT unit.node_id FROM unit WHERE unit.descendants @> ARRAY[OLD.source_id]),
+                    ARRAY[OLD.source_id]
+                );
+                target_descendants := array_union(
+                    ARRAY(SELECT unit.node_id FROM unit WHERE unit.ancestors @> ARRAY[OLD.target_id]),
+                    ARRAY[OLD.target_id]
+                );
+
+                IF source_ancestors && target_descendants THEN
+                    -- The edge was on a cycle: only the affected side is recomputed.
+                    UPDATE unit
+                    SET
+                        ancestors = CASE
+                            WHEN unit.node_id = ANY(target_descendants)
+                            THEN calculate_ancestors(unit.node_id)
+                            ELSE unit.ancestors
+                        END,
+                        descendants = CASE
+                            WHEN unit.node_id = ANY(source_ancestors)
+                            THEN calculate_descendants(unit.node_id)
+                            ELSE unit.descendants
+                        END
+                        WHERE unit.node_id = ANY(target_descendants || source_ancestors);
+
+                    RETURN OLD;
+                END IF;
+
+                WITH affected AS (
+                    SELECT
+                        unit.node_id,
+                        ARRAY(
+                            SELECT id FROM unnest(unit.descendants) AS id
+                            WHERE NOT id = ANY(target_descendants)
+                        ) AS kept
+                    FROM unit
+                    WHERE unit.node_id = ANY(source_ancestors)
+                ), entering AS (
+                    SELECT edge.source_id, edge.target_id
+                    FROM edge
+                    WHERE edge.target_id = ANY(target_descendants)
+                        AND NOT edge.source_id = ANY(target_descendants)
+                ), reached AS (
+                    SELECT DISTINCT affected.node_id, reached.id
+                    FROM affected
+                    CROSS JOIN LATERAL unnest(affected.kept || affected.node_id) AS through(id)
+                    JOIN entering ON entering.source_id = through.id
+                    LEFT JOIN unit entered ON entered.node_id = entering.target_id
+                    CROSS JOIN LATERAL unnest(
+                        COALESCE(entered.descendants, ARRAY[]::INTEGER[]) || entering.target_id
+                    ) AS reached(id)
+                )
+                UPDATE unit
+                SET descendants = array_union(
+                    affected.kept,
+                    ARRAY(SELECT reached.id FROM reached WHERE reached.node_id = affected.node_id)
+                )
+                FROM affected
+                WHERE unit.node_id = affected.node_id;
+
+                WITH affected AS (
+                    SELECT
+                        unit.node_id,
+                        ARRAY(
+                            SELECT id FROM unnest(unit.ancestors) AS id
+                            WHERE NOT id = ANY(source_ancestors)
+                        ) AS kept
+                    FROM unit
+                    WHERE unit.node_id = ANY(target_descendants)
+                ), leaving AS (
+                    SELECT edge.source_id, edge.target_id
+                    FROM edge
+                    WHERE edge.source_id = ANY(source_ancestors)
+                        AND NOT edge.target_id = ANY(source_ancestors)
+                ), reached AS (
+                    SELECT DISTINCT affected.node_id, reached.id
+                    FROM affected
+                    CROSS JOIN LATERAL unnest(affected.kept || affected.node_id) AS through(id)
+                    JOIN leaving ON leaving.target_id = through.id
+                    LEFT JOIN unit exited ON exited.node_id = leaving.source_id
+                    CROSS JOIN LATERAL unnest(
+                        COALESCE(exited.ancestors, ARRAY[]::INTEGER[]) || leaving.source_id
+                    ) AS reached(id)
+                )
+                UPDATE unit
+                SET ancestors = array_union(
+                    affected.kept,
+                    ARRAY(SELECT reached.id FROM reached WHERE reached.node_id = affected.node_id)
+                )
+                FROM affected
+                WHERE unit.node_id = affected.node_id;
+
+                RETURN OLD;
+            END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE TRIGGER update_unit_tree_on_edge_insert
+        AFTER INSERT ON public.edge
+        FOR EACH ROW
+        EXECUTE FUNCTION update_unit_tree_on_edge_insert();
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE TRIGGER update_unit_tree_on_edge_delete
+        AFTER DELETE ON public.edge
+        FOR EACH ROW
+        EXECUTE FUNCTION update_unit_tree_on_edge_delete();
+        """
+    )
+
+    op.execute("DROP FUNCTION IF EXISTS recalculate_unit_trees;")
+    op.execute("DROP FUNCTION IF EXISTS apply_edge_delete;")
+    op.execute("DROP FUNCTION IF EXISTS apply_edge_insert;")
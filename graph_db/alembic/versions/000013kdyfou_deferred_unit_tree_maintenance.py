@@ -0,0 +1,219 @@
+"""Deferred unit tree maintenance
+
+Revision ID: 000013kdyfou
+Revises: 000012tmwgsh
+Create Date: 2026-02-02 11:23:40.377152
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000013kdyfou"
+down_revision: Union[str, None] = "000012tmwgsh"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+IMMEDIATE = "current_setting('app.closure_mode', true) IS DISTINCT FROM 'deferred'"
+DEFERRED = "current_setting('app.closure_mode', true) = 'deferred'"
+
+
+def upgrade() -> None:
+    # With `SET LOCAL app.closure_mode = 'deferred'` the edge triggers only stage the
+    # endpoints of the changed edges in a transaction-local table. The unit trees
+    # are not touched until COMMIT, so the stored arrays still describe the graph
+    # before the transaction and the affected units are derived from them once.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION stage_unit_tree_nodes (
+            source_ids INTEGER[], target_ids INTEGER[]
+        ) RETURNS VOID AS $$
+            BEGIN
+                IF to_regclass('pg_temp.unit_tree_staging') IS NULL THEN
+                    CREATE TEMPORARY TABLE unit_tree_staging (
+                        node_id INTEGER NOT NULL,
+                        is_source BOOLEAN NOT NULL,
+                        PRIMARY KEY (node_id, is_source)
+                    ) ON COMMIT DELETE ROWS;
+                END IF;
+
+                INSERT INTO pg_temp.unit_tree_staging (node_id, is_source)
+                SELECT node_id, true FROM unnest(source_ids) AS node_id
+                UNION
+                SELECT node_id, false FROM unnest(target_ids) AS node_id
+                ON CONFLICT DO NOTHING;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION stage_unit_tree_on_edge_change() RETURNS TRIGGER AS $$
+            BEGIN
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    PERFORM stage_unit_tree_nodes(
+                        ARRAY(SELECT inserted_edges.source_id FROM inserted_edges),
+                        ARRAY(SELECT inserted_edges.target_id FROM inserted_edges)
+                    );
+                END IF;
+                IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                    PERFORM stage_unit_tree_nodes(
+                        ARRAY(SELECT deleted_edges.source_id FROM deleted_edges),
+                        ARRAY(SELECT deleted_edges.target_id FROM deleted_edges)
+                    );
+                END IF;
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    # Fired once per staged row at COMMIT, the first call drains the staging table
+    # and recomputes every affected unit once, the following calls find it empty.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_at_commit() RETURNS TRIGGER AS $$
+            DECLARE
+                source_ids INTEGER[];
+                target_ids INTEGER[];
+            BEGIN
+                IF to_regclass('pg_temp.unit_tree_staging') IS NULL THEN
+                    RETURN NULL;
+                END IF;
+
+                WITH staged AS (
+                    DELETE FROM pg_temp.unit_tree_staging
+                    RETURNING node_id, is_source
+                )
+                SELECT
+                    ARRAY_AGG(node_id) FILTER (WHERE is_source),
+                    ARRAY_AGG(node_id) FILTER (WHERE NOT is_source)
+                INTO source_ids, target_ids
+                FROM staged;
+
+                IF source_ids IS NULL AND target_ids IS NULL THEN
+                    RETURN NULL;
+                END IF;
+                source_ids := COALESCE(source_ids, ARRAY[]::INTEGER[]);
+                target_ids := COALESCE(target_ids, ARRAY[]::INTEGER[]);
+
+                PERFORM recalculate_unit_trees(
+                    array_union(
+                        source_ids,
+                        ARRAY(SELECT unit.node_id FROM unit WHERE unit.descendants && source_ids)
+                    ),
+                    array_union(
+                        target_ids,
+                        ARRAY(SELECT unit.node_id FROM unit WHERE unit.ancestors && target_ids)
+                    )
+                );
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute(
+        f"""
+        CREATE OR REPLACE TRIGGER update_unit_tree_on_edge_insert
+        AFTER INSERT ON public.edge
+        REFERENCING NEW TABLE AS inserted_edges
+        FOR EACH STATEMENT
+        WHEN ({IMMEDIATE})
+        EXECUTE FUNCTION update_unit_tree_on_edge_insert();
+        """
+    )
+    op.execute(
+        f"""
+        CREATE OR REPLACE TRIGGER update_unit_tree_on_edge_delete
+        AFTER DELETE ON public.edge
+        REFERENCING OLD TABLE AS deleted_edges
+        FOR EACH STATEMENT
+        WHEN ({IMMEDIATE})
+        EXECUTE FUNCTION update_unit_tree_on_edge_delete();
+        """
+    )
+    op.execute(
+        f"""
+        CREATE OR REPLACE TRIGGER update_unit_tree_on_edge_upsert
+        AFTER UPDATE OF source_id, target_id ON public.edge
+        FOR EACH ROW
+        WHEN ({IMMEDIATE})
+        EXECUTE FUNCTION update_unit_tree_on_edge_upsert();
+        """
+    )
+
+    for event, transition_tables in [
+        ("insert", "NEW TABLE AS inserted_edges"),
+        ("delete", "OLD TABLE AS deleted_edges"),
+        ("update", "OLD TABLE AS deleted_edges NEW TABLE AS inserted_edges"),
+    ]:
+        op.execute(
+            f"""
+            CREATE OR REPLACE TRIGGER stage_unit_tree_on_edge_{event}
+            AFTER {event.upper()} ON public.edge
+            REFERENCING {transition_tables}
+            FOR EACH STATEMENT
+            WHEN ({DEFERRED})
+            EXECUTE FUNCTION stage_unit_tree_on_edge_change();
+            """
+        )
+
+    # The WHEN condition of a constraint trigger is evaluated when the row changes,
+    # so only rows written in deferred mode queue an event for COMMIT.
+    op.execute(
+        f"""
+        CREATE CONSTRAINT TRIGGER update_unit_tree_at_commit
+        AFTER INSERT OR UPDATE OR DELETE ON public.edge
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW
+        WHEN ({DEFERRED})
+        EXECUTE FUNCTION update_unit_tree_at_commit();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS update_unit_tree_at_commit ON public.edge;")
+    for event in ["insert", "delete", "update"]:
+        op.execute(
+            f"DROP TRIGGER IF EXISTS stage_unit_tree_on_edge_{event} ON public.edge;"
+        )
+
+    op.execute(
+        """
+        CREATE OR REPLACE TRIGGER update_unit_tree_on_edge_insert
+        AFTER INSERT ON public.edge
+        REFERENCING NEW TABLE AS inserted_edges
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION update_unit_tree_on_edge_insert();
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE TRIGGER update_unit_tree_on_edge_delete
+        AFTER DELETE ON public.edge
+        REFERENCING OLD TABLE AS deleted_edges
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION update_unit_tree_on_edge_delete();
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE TRIGGER update_unit_tree_on_edge_upsert
+        AFTER UPDATE OF source_id, target_id ON public.edge
+        FOR EACH ROW
+        EXECUTE FUNCTION update_unit_tree_on_edge_upsert();
+        """
+    )
+
+    op.execute("DROP FUNCTION IF EXISTS update_unit_tree_at_commit;")
+    op.execute("DROP FUNCTION IF EXISTS stage_unit_tree_on_edge_change;")
+    op.execute("DROP FUNCTION IF EXISTS stage_unit_tree_nodes;")
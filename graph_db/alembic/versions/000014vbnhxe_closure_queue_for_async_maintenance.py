@@ -0,0 +1,224 @@
+"""Closure queue for async maintenance
+
+Revision ID: 000014vbnhxe
+Revises: 000013kdyfou
+Create Date: 2026-02-09 16:05:12.804417
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000014vbnhxe"
+down_revision: Union[str, None] = "000013kdyfou"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+IMMEDIATE = "COALESCE(current_setting('app.closure_mode', true), '') NOT IN ('deferred', 'async')"
+PREVIOUS_IMMEDIATE = (
+    "current_setting('app.closure_mode', true) IS DISTINCT FROM 'deferred'"
+)
+ASYNC = "current_setting('app.closure_mode', true) = 'async'"
+
+IMMEDIATE_TRIGGERS = [
+    (
+        "update_unit_tree_on_edge_insert",
+        "AFTER INSERT ON public.edge REFERENCING NEW TABLE AS inserted_edges FOR EACH STATEMENT",
+    ),
+    (
+        "update_unit_tree_on_edge_delete",
+        "AFTER DELETE ON public.edge REFERENCING OLD TABLE AS deleted_edges FOR EACH STATEMENT",
+    ),
+    (
+        "update_unit_tree_on_edge_upsert",
+        "AFTER UPDATE OF source_id, target_id ON public.edge FOR EACH ROW",
+    ),
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "closure_queue",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column("node_id", sa.Integer(), nullable=False),
+        sa.Column("is_source", sa.Boolean(), nullable=False),
+        sa.Column(
+            "created",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column(
+            "modified",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        schema="public",
+    )
+    op.add_column(
+        "unit",
+        sa.Column(
+            "closure_version", sa.BigInteger(), server_default="0", nullable=False
+        ),
+        schema="public",
+    )
+
+    # With `SET LOCAL app.closure_mode = 'async'` the edge triggers only enqueue the
+    # endpoints of the changed edges and wake up graph_db/closure_worker.py.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION enqueue_unit_tree_on_edge_change() RETURNS TRIGGER AS $$
+            BEGIN
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO closure_queue (node_id, is_source)
+                    SELECT inserted_edges.source_id, true FROM inserted_edges
+                    UNION
+                    SELECT inserted_edges.target_id, false FROM inserted_edges;
+                END IF;
+                IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                    INSERT INTO closure_queue (node_id, is_source)
+                    SELECT deleted_edges.source_id, true FROM deleted_edges
+                    UNION
+                    SELECT deleted_edges.target_id, false FROM deleted_edges;
+                END IF;
+
+                PERFORM pg_notify('closure_queue', '');
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    # Unlike the deferred mode, the stored arrays may already include some of the
+    # queued writes and miss others, so the affected units are the ones related to
+    # the queued nodes either by the stored arrays or by the current edges.
+    # Every processed unit gets the last queue id of the batch as closure_version.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION process_closure_queue (batch_size INTEGER) RETURNS INTEGER AS $$
+            DECLARE
+                processed INTEGER;
+                last_id BIGINT;
+                source_ids INTEGER[];
+                target_ids INTEGER[];
+                descendants_of INTEGER[];
+                ancestors_of INTEGER[];
+            BEGIN
+                -- Concurrent batches could overwrite each other's units with the
+                -- trees of an older snapshot, so they are serialized.
+                PERFORM pg_advisory_xact_lock(hashtext('closure_queue'));
+
+                WITH batch AS (
+                    DELETE FROM closure_queue
+                    WHERE closure_queue.id IN (
+                        SELECT closure_queue.id FROM closure_queue
+                        ORDER BY closure_queue.id
+                        LIMIT batch_size
+                    )
+                    RETURNING id, node_id, is_source
+                )
+                SELECT
+                    COUNT(*),
+                    MAX(id),
+                    COALESCE(ARRAY_AGG(DISTINCT node_id) FILTER (WHERE is_source), ARRAY[]::INTEGER[]),
+                    COALESCE(ARRAY_AGG(DISTINCT node_id) FILTER (WHERE NOT is_source), ARRAY[]::INTEGER[])
+                INTO processed, last_id, source_ids, target_ids
+                FROM batch;
+
+                IF processed = 0 THEN
+                    RETURN 0;
+                END IF;
+
+                WITH RECURSIVE reaching(id) AS (
+                    SELECT edge.source_id FROM edge WHERE edge.target_id = ANY(source_ids)
+                    UNION
+                    SELECT edge.source_id FROM reaching
+                        JOIN edge ON edge.target_id = reaching.id
+                )
+                SELECT array_union(
+                    source_ids,
+                    ARRAY(SELECT reaching.id FROM reaching)
+                        || ARRAY(SELECT unit.node_id FROM unit WHERE unit.descendants && source_ids)
+                )
+                INTO descendants_of;
+
+                WITH RECURSIVE reached(id) AS (
+                    SELECT edge.target_id FROM edge WHERE edge.source_id = ANY(target_ids)
+                    UNION
+                    SELECT edge.target_id FROM reached
+                        JOIN edge ON edge.source_id = reached.id
+                )
+                SELECT array_union(
+                    target_ids,
+                    ARRAY(SELECT reached.id FROM reached)
+                        || ARRAY(SELECT unit.node_id FROM unit WHERE unit.ancestors && target_ids)
+                )
+                INTO ancestors_of;
+
+                PERFORM recalculate_unit_trees(descendants_of, ancestors_of);
+
+                UPDATE unit
+                SET closure_version = last_id
+                WHERE unit.node_id = ANY(descendants_of || ancestors_of);
+
+                RETURN processed;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    for name, timing in IMMEDIATE_TRIGGERS:
+        op.execute(
+            f"""
+            CREATE OR REPLACE TRIGGER {name}
+            {timing}
+            WHEN ({IMMEDIATE})
+            EXECUTE FUNCTION {name}();
+            """
+        )
+
+    for event, transition_tables in [
+        ("insert", "NEW TABLE AS inserted_edges"),
+        ("delete", "OLD TABLE AS deleted_edges"),
+        ("update", "OLD TABLE AS deleted_edges NEW TABLE AS inserted_edges"),
+    ]:
+        op.execute(
+            f"""
+            CREATE OR REPLACE TRIGGER enqueue_unit_tree_on_edge_{event}
+            AFTER {event.upper()} ON public.edge
+            REFERENCING {transition_tables}
+            FOR EACH STATEMENT
+            WHEN ({ASYNC})
+            EXECUTE FUNCTION enqueue_unit_tree_on_edge_change();
+            """
+        )
+
+
+def downgrade() -> None:
+    for event in ["insert", "delete", "update"]:
+        op.execute(
+            f"DROP TRIGGER IF EXISTS enqueue_unit_tree_on_edge_{event} ON public.edge;"
+        )
+
+    for name, timing in IMMEDIATE_TRIGGERS:
+        op.execute(
+            f"""
+            CREATE OR REPLACE TRIGGER {name}
+            {timing}
+            WHEN ({PREVIOUS_IMMEDIATE})
+            EXECUTE FUNCTION {name}();
+            """
+        )
+
+    op.execute("DROP FUNCTION IF EXISTS process_closure_queue;")
+    op.execute("DROP FUNCTION IF EXISTS enqueue_unit_tree_on_edge_change;")
+    op.drop_column("unit", "closure_version", schema="public")
+    op.drop_table("closure_queue", schema="public")
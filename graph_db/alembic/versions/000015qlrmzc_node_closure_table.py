@@ -0,0 +1,887 @@
+"""Node closure table
+
+Revision ID: 000015qlrmzc
+Revises: 000014vbnhxe
+Create Date: 2026-02-16 10:12:48.550931
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000015qlrmzc"
+down_revision: Union[str, None] = "000014vbnhxe"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # One row per (ancestor, descendant) pair with the length of the shortest path.
+    # Nodes on a cycle are their own ancestor. There are no foreign keys, the edge
+    # triggers remove the pairs of a node when its edges are deleted.
+    op.create_table(
+        "node_closure",
+        sa.Column("ancestor_id", sa.Integer(), nullable=False),
+        sa.Column("descendant_id", sa.Integer(), nullable=False),
+        sa.Column("min_depth", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint(
+            "ancestor_id", "descendant_id", postgresql_include=["min_depth"]
+        ),
+        schema="public",
+    )
+    op.create_index(
+        "ix_public_node_closure_descendant_id_ancestor_id",
+        "node_closure",
+        ["descendant_id", "ancestor_id"],
+        unique=False,
+        schema="public",
+        postgresql_include=["min_depth"],
+    )
+
+    # Rebuilds every pair of the given ancestors with a breadth-first traversal.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION recalculate_node_closure (ancestor_ids INTEGER[]) RETURNS VOID AS $$
+            DECLARE
+                depth INTEGER := 1;
+                reached INTEGER;
+            BEGIN
+                DELETE FROM node_closure WHERE node_closure.ancestor_id = ANY(ancestor_ids);
+
+                INSERT INTO node_closure (ancestor_id, descendant_id, min_depth)
+                SELECT DISTINCT edge.source_id, edge.target_id, 1
+                FROM edge
+                WHERE edge.source_id = ANY(ancestor_ids);
+                GET DIAGNOSTICS reached = ROW_COUNT;
+
+                -- Level by level, so a pair is first reached at its shortest depth.
+                WHILE reached > 0 LOOP
+                    INSERT INTO node_closure (ancestor_id, descendant_id, min_depth)
+                    SELECT DISTINCT node_closure.ancestor_id, edge.target_id, depth + 1
+                    FROM node_closure
+                    JOIN edge ON edge.source_id = node_closure.descendant_id
+                    WHERE node_closure.ancestor_id = ANY(ancestor_ids)
+                        AND node_closure.min_depth = depth
+                    ON CONFLICT (ancestor_id, descendant_id) DO NOTHING;
+                    GET DIAGNOSTICS reached = ROW_COUNT;
+                    depth := depth + 1;
+                END LOOP;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    # Adding source -> target links {source} + ancestors to {target} + descendants,
+    # a pair gets closer when the path through the new edge is shorter.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION apply_edge_insert (source_node_id INT, target_node_id INT) RETURNS VOID AS $$
+            BEGIN
+                -- Another relation between the same nodes, nothing can get closer.
+                IF EXISTS (
+                    SELECT 1 FROM node_closure
+                    WHERE node_closure.ancestor_id = source_node_id
+                        AND node_closure.descendant_id = target_node_id
+                        AND node_closure.min_depth = 1
+                ) THEN
+                    RETURN;
+                END IF;
+
+                INSERT INTO node_closure (ancestor_id, descendant_id, min_depth)
+                SELECT source_side.id, target_side.id, MIN(source_side.depth + 1 + target_side.depth)
+                FROM (
+                    SELECT source_node_id AS id, 0 AS depth
+                    UNION ALL
+                    SELECT node_closure.ancestor_id, node_closure.min_depth FROM node_closure
+                    WHERE node_closure.descendant_id = source_node_id
+                ) AS source_side
+                CROSS JOIN (
+                    SELECT target_node_id AS id, 0 AS depth
+                    UNION ALL
+                    SELECT node_closure.descendant_id, node_closure.min_depth FROM node_closure
+                    WHERE node_closure.ancestor_id = target_node_id
+                ) AS target_side
+                GROUP BY source_side.id, target_side.id
+                ON CONFLICT (ancestor_id, descendant_id) DO UPDATE
+                SET min_depth = EXCLUDED.min_depth
+                WHERE node_closure.min_depth > EXCLUDED.min_depth;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    # Removing source -> target only affects the pairs from A = {source} + ancestors
+    # to D = {target} + descendants. Unless the edge was on a cycle, every remaining
+    # path from A into D enters D once through an edge x -> e, and the pairs (a, x)
+    # and (e, d) are not affected, so each pair is rederived from them.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION apply_edge_delete (source_node_id INT, target_node_id INT) RETURNS VOID AS $$
+            BEGIN
+                -- Another relation between the same nodes keeps the reachability.
+                IF EXISTS (
+                    SELECT 1 FROM edge
+                    WHERE edge.source_id = source_node_id AND edge.target_id = target_node_id
+                ) THEN
+                    RETURN;
+                END IF;
+
+                IF source_node_id = target_node_id OR EXISTS (
+                    SELECT 1 FROM node_closure
+                    WHERE node_closure.ancestor_id = target_node_id
+                        AND node_closure.descendant_id = source_node_id
+                ) THEN
+                    PERFORM recalculate_node_closure(
+                        source_node_id || ARRAY(
+                            SELECT node_closure.ancestor_id FROM node_closure
+                            WHERE node_closure.descendant_id = source_node_id
+                        )
+                    );
+                    RETURN;
+                END IF;
+
+                WITH source_side AS (
+                    SELECT source_node_id AS id
+                    UNION ALL
+                    SELECT node_closure.ancestor_id FROM node_closure
+                    WHERE node_closure.descendant_id = source_node_id
+                ), target_side AS (
+                    SELECT target_node_id AS id
+                    UNION ALL
+                    SELECT node_closure.descendant_id FROM node_closure
+                    WHERE node_closure.ancestor_id = target_node_id
+                ), entering AS (
+                    SELECT DISTINCT edge.source_id, edge.target_id
+                    FROM edge
+                    JOIN target_side ON target_side.id = edge.target_id
+                    WHERE edge.source_id NOT IN (SELECT target_side.id FROM target_side)
+                ), derived AS (
+                    SELECT via.id AS ancestor_id, reached.id AS descendant_id,
+                        MIN(via.depth + 1 + reached.depth) AS min_depth
+                    FROM entering
+                    CROSS JOIN LATERAL (
+                        SELECT entering.source_id AS id, 0 AS depth
+                        UNION ALL
+                        SELECT node_closure.ancestor_id, node_closure.min_depth FROM node_closure
+                        WHERE node_closure.descendant_id = entering.source_id
+                    ) AS via
+                    CROSS JOIN LATERAL (
+                        SELECT entering.target_id AS id, 0 AS depth
+                        UNION ALL
+                        SELECT node_closure.descendant_id, node_closure.min_depth FROM node_closure
+                        WHERE node_closure.ancestor_id = entering.target_id
+                    ) AS reached
+                    WHERE via.id IN (SELECT source_side.id FROM source_side)
+                    GROUP BY via.id, reached.id
+                ), removed AS (
+                    DELETE FROM node_closure
+                    USING source_side, target_side
+                    WHERE node_closure.ancestor_id = source_side.id
+                        AND node_closure.descendant_id = target_side.id
+                        AND NOT EXISTS (
+                            SELECT 1 FROM derived
+                            WHERE derived.ancestor_id = node_closure.ancestor_id
+                                AND derived.descendant_id = node_closure.descendant_id
+                        )
+                )
+                UPDATE node_closure
+                SET min_depth = derived.min_depth
+                FROM derived
+                WHERE node_closure.ancestor_id = derived.ancestor_id
+                    AND node_closure.descendant_id = derived.descendant_id
+                    AND node_closure.min_depth <> derived.min_depth;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    # The insert delta only reads the closure, so the new edges are applied one
+    # after the other. The delete rederivation reads the remaining edges, which
+    # already miss every deleted edge, so several deletions rebuild the pairs of
+    # all the ancestors of their sources instead.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_insert() RETURNS TRIGGER AS $$
+            BEGIN
+                PERFORM apply_edge_insert(inserted_edges.source_id, inserted_edges.target_id)
+                FROM inserted_edges;
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_delete() RETURNS TRIGGER AS $$
+            BEGIN
+                IF (SELECT count(*) FROM deleted_edges) <= 1 THEN
+                    PERFORM apply_edge_delete(deleted_edges.source_id, deleted_edges.target_id)
+                    FROM deleted_edges;
+                    RETURN NULL;
+                END IF;
+
+                PERFORM recalculate_node_closure(ARRAY(
+                    SELECT deleted_edges.source_id FROM deleted_edges
+                    UNION
+                    SELECT node_closure.ancestor_id FROM node_closure
+                        JOIN deleted_edges ON node_closure.descendant_id = deleted_edges.source_id
+                ));
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    # Row triggers fire once the whole UPDATE is done, the rebuild reads the final
+    # edges and the closure still holds the ancestors of the old and new source.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_upsert() RETURNS TRIGGER AS $$
+            BEGIN
+                PERFORM recalculate_node_closure(ARRAY(
+                    SELECT node_id FROM unnest(ARRAY[OLD.source_id, NEW.source_id]) AS node_id
+                    UNION
+                    SELECT node_closure.ancestor_id FROM node_closure
+                    WHERE node_closure.descendant_id IN (OLD.source_id, NEW.source_id)
+                ));
+
+                RETURN NEW;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    # The staged targets are not needed anymore: every changed pair starts at a
+    # staged source or one of its ancestors before the transaction.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_at_commit() RETURNS TRIGGER AS $$
+            DECLARE
+                source_ids INTEGER[];
+            BEGIN
+                IF to_regclass('pg_temp.unit_tree_staging') IS NULL THEN
+                    RETURN NULL;
+                END IF;
+
+                WITH staged AS (
+                    DELETE FROM pg_temp.unit_tree_staging
+                    RETURNING node_id, is_source
+                )
+                SELECT ARRAY_AGG(node_id) FILTER (WHERE is_source)
+                INTO source_ids
+                FROM staged;
+
+                IF source_ids IS NULL THEN
+                    RETURN NULL;
+                END IF;
+
+                PERFORM recalculate_node_closure(ARRAY(
+                    SELECT unnest(source_ids)
+                    UNION
+                    SELECT node_closure.ancestor_id FROM node_closure
+                    WHERE node_closure.descendant_id = ANY(source_ids)
+                ));
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION process_closure_queue (batch_size INTEGER) RETURNS INTEGER AS $$
+            DECLARE
+                processed INTEGER;
+                last_id BIGINT;
+                source_ids INTEGER[];
+                target_ids INTEGER[];
+                descendants_of INTEGER[];
+                ancestors_of INTEGER[];
+            BEGIN
+                -- Concurrent batches could overwrite each other's pairs with the
+                -- closure of an older snapshot, so they are serialized.
+                PERFORM pg_advisory_xact_lock(hashtext('closure_queue'));
+
+                WITH batch AS (
+                    DELETE FROM closure_queue
+                    WHERE closure_queue.id IN (
+                        SELECT closure_queue.id FROM closure_queue
+                        ORDER BY closure_queue.id
+                        LIMIT batch_size
+                    )
+                    RETURNING id, node_id, is_source
+                )
+                SELECT
+                    COUNT(*),
+                    MAX(id),
+                    COALESCE(ARRAY_AGG(DISTINCT node_id) FILTER (WHERE is_source), ARRAY[]::INTEGER[]),
+                    COALESCE(ARRAY_AGG(DISTINCT node_id) FILTER (WHERE NOT is_source), ARRAY[]::INTEGER[])
+                INTO processed, last_id, source_ids, target_ids
+                FROM batch;
+
+                IF processed = 0 THEN
+                    RETURN 0;
+                END IF;
+
+                WITH RECURSIVE reaching(id) AS (
+                    SELECT edge.source_id FROM edge WHERE edge.target_id = ANY(source_ids)
+                    UNION
+                    SELECT edge.source_id FROM reaching
+                        JOIN edge ON edge.target_id = reaching.id
+                )
+                SELECT ARRAY(
+                    SELECT unnest(source_ids)
+                    UNION
+                    SELECT reaching.id FROM reaching
+                    UNION
+                    SELECT node_closure.ancestor_id FROM node_closure
+                    WHERE node_closure.descendant_id = ANY(source_ids)
+                )
+                INTO descendants_of;
+
+                WITH RECURSIVE reached(id) AS (
+                    SELECT edge.target_id FROM edge WHERE edge.source_id = ANY(target_ids)
+                    UNION
+                    SELECT edge.target_id FROM reached
+                        JOIN edge ON edge.source_id = reached.id
+                )
+                SELECT ARRAY(
+                    SELECT unnest(target_ids)
+                    UNION
+                    SELECT reached.id FROM reached
+                    UNION
+                    SELECT node_closure.descendant_id FROM node_closure
+                    WHERE node_closure.ancestor_id = ANY(target_ids)
+                )
+                INTO ancestors_of;
+
+                PERFORM recalculate_node_closure(descendants_of);
+
+                UPDATE unit
+                SET closure_version = last_id
+                WHERE unit.node_id = ANY(descendants_of || ancestors_of);
+
+                RETURN processed;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute("DROP POLICY node_access ON public.unit;")
+    op.execute(
+        """
+        CREATE POLICY node_access ON public.unit
+        FOR SELECT
+        USING (
+            EXISTS (
+                SELECT 1 FROM node_closure
+                WHERE node_closure.descendant_id = unit.node_id
+                    AND node_closure.ancestor_id IN (
+                        SELECT unnest(nodes)
+                        FROM public."user"
+                        WHERE id = current_setting('app.current_user_id')::integer
+                    )
+            )
+        );
+        """
+    )
+
+    op.execute(
+        "SELECT recalculate_node_closure(ARRAY(SELECT DISTINCT source_id FROM edge));"
+    )
+
+    op.execute("DROP FUNCTION IF EXISTS recalculate_unit_trees;")
+    op.execute("DROP INDEX IF EXISTS public.idx_gin_unit_descendants;")
+    op.execute("DROP INDEX IF EXISTS public.idx_gin_unit_ancestors;")
+    op.drop_index(
+        op.f("ix_public_unit_descendants"), table_name="unit", schema="public"
+    )
+    op.drop_index(op.f("ix_public_unit_ancestors"), table_name="unit", schema="public")
+    op.drop_column("unit", "ancestors", schema="public")
+    op.drop_column("unit", "descendants", schema="public")
+
+
+def downgrade() -> None:
+    for column in ["ancestors", "descendants"]:
+        op.add_column(
+            "unit",
+            sa.Column(
+                column,
+                postgresql.ARRAY(sa.Integer()),
+                nullable=False,
+                server_default=sa.text("ARRAY[]::INTEGER[]"),
+            ),
+            schema="public",
+        )
+    op.execute(
+        """
+        UPDATE unit
+        SET
+            ancestors = ARRAY(
+                SELECT node_closure.ancestor_id FROM node_closure
+                WHERE node_closure.descendant_id = unit.node_id
+                ORDER BY node_closure.ancestor_id
+            ),
+            descendants = ARRAY(
+                SELECT node_closure.descendant_id FROM node_closure
+                WHERE node_closure.ancestor_id = unit.node_id
+                ORDER BY node_closure.descendant_id
+            );
+        """
+    )
+    op.create_index(
+        op.f("ix_public_unit_ancestors"),
+        "unit",
+        ["ancestors"],
+        unique=False,
+        schema="public",
+    )
+    op.create_index(
+        op.f("ix_public_unit_descendants"),
+        "unit",
+        ["descendants"],
+        unique=False,
+        schema="public",
+    )
+    op.execute(
+        "CREATE INDEX idx_gin_unit_ancestors ON public.unit USING GIN (ancestors);"
+    )
+    op.execute(
+        "CREATE INDEX idx_gin_unit_descendants ON public.unit USING GIN (descendants);"
+    )
+
+    op.execute("DROP POLICY node_access ON public.unit;")
+    op.execute(
+        """
+        CREATE POLICY node_access ON public.unit
+        FOR SELECT
+        USING (
+            ancestors && (
+                SELECT nodes
+                FROM public."user"
+                WHERE id = current_setting('app.current_user_id')::integer
+            )
+        );
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION recalculate_unit_trees (
+            descendants_of INTEGER[], ancestors_of INTEGER[]
+        ) RETURNS VOID AS $$
+            WITH RECURSIVE reached_descendants(root, id) AS (
+                SELECT edge.source_id, edge.target_id FROM edge
+                WHERE edge.source_id = ANY(descendants_of)
+                UNION
+                SELECT reached_descendants.root, edge.target_id FROM reached_descendants
+                    JOIN edge ON reached_descendants.id = edge.source_id
+            ), reached_ancestors(root, id) AS (
+                SELECT edge.target_id, edge.source_id FROM edge
+                WHERE edge.target_id = ANY(ancestors_of)
+                UNION
+                SELECT reached_ancestors.root, edge.source_id FROM reached_ancestors
+                    JOIN edge ON reached_ancestors.id = edge.target_id
+            ), descendant_arrays AS (
+                SELECT root, ARRAY_AGG(DISTINCT id ORDER BY id) AS ids
+                FROM reached_descendants GROUP BY root
+            ), ancestor_arrays AS (
+                SELECT root, ARRAY_AGG(DISTINCT id ORDER BY id) AS ids
+                FROM reached_ancestors GROUP BY root
+            )
+            UPDATE unit
+            SET
+                descendants = CASE
+                    WHEN unit.node_id = ANY(descendants_of)
+                    THEN COALESCE(trees.descendants, ARRAY[]::INTEGER[])
+                    ELSE unit.descendants
+                END,
+                ancestors = CASE
+                    WHEN unit.node_id = ANY(ancestors_of)
+                    THEN COALESCE(trees.ancestors, ARRAY[]::INTEGER[])
+                    ELSE unit.ancestors
+                END
+            FROM (
+                SELECT affected.node_id, descendant_arrays.ids AS descendants,
+                    ancestor_arrays.ids AS ancestors
+                FROM (SELECT DISTINCT unnest(descendants_of || ancestors_of) AS node_id) AS affected
+                LEFT JOIN descendant_arrays ON descendant_arrays.root = affected.node_id
+                LEFT JOIN ancestor_arrays ON ancestor_arrays.root = affected.node_id
+            ) AS trees
+            WHERE unit.node_id = trees.node_id;
+        $$ LANGUAGE sql
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION apply_edge_insert (source_node_id INT, target_node_id INT) RETURNS VOID AS $$
+            DECLARE
+                source_ancestors INTEGER[];
+                target_descendants INTEGER[];
+            BEGIN
+                IF EXISTS (
+                    SELECT 1 FROM unit
+                    WHERE unit.node_id = source_node_id
+                        AND unit.descendants @> ARRAY[target_node_id]
+                ) THEN
+                    RETURN;
+                END IF;
+
+                source_ancestors := array_union(
+                    COALESCE(
+                        (SELECT ancestors FROM unit WHERE unit.node_id = source_node_id),
+                        calculate_ancestors(source_node_id)
+                    ),
+                    ARRAY[source_node_id]
+                );
+                target_descendants := array_union(
+                    COALESCE(
+                        (SELECT descendants FROM unit WHERE unit.node_id = target_node_id),
+                        calculate_descendants(target_node_id)
+                    ),
+                    ARRAY[target_node_id]
+                );
+
+                UPDATE unit
+                SET
+                    ancestors = CASE
+                        WHEN unit.node_id = ANY(target_descendants)
+                        THEN array_union(unit.ancestors, source_ancestors)
+                        ELSE unit.ancestors
+                    END,
+                    descendants = CASE
+                        WHEN unit.node_id = ANY(source_ancestors)
+                        THEN array_union(unit.descendants, target_descendants)
+                        ELSE unit.descendants
+                    END
+                    WHERE unit.node_id = ANY(target_descendants || source_ancestors);
+
+                RETURN;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION apply_edge_delete (source_node_id INT, target_node_id INT) RETURNS VOID AS $$
+            DECLARE
+                source_ancestors INTEGER[];
+                target_descendants INTEGER[];
+            BEGIN
+                -- Another relation between the same units keeps the reachability.
+                IF EXISTS (
+                    SELECT 1 FROM edge
+                    WHERE edge.source_id = source_node_id AND edge.target_id = target_node_id
+                ) THEN
+                    RETURN;
+                END IF;
+
+                -- Read from the other units, the endpoint's own row may be gone when
+                -- the edge is deleted by the cascade of a unit deletion.
+                source_ancestors := array_union(
+                    ARRAY(SELECT unit.node_id FROM unit WHERE unit.descendants @> ARRAY[source_node_id]),
+                    ARRAY[source_node_id]
+                );
+                target_descendants := array_union(
+                    ARRAY(SELECT unit.node_id FROM unit WHERE unit.ancestors @> ARRAY[target_node_id]),
+                    ARRAY[target_node_id]
+                );
+
+                IF source_ancestors && target_descendants THEN
+                    -- The edge was on a cycle: only the affected side is recomputed.
+                    PERFORM recalculate_unit_trees(source_ancestors, target_descendants);
+                    RETURN;
+                END IF;
+
+                WITH affected AS (
+                    SELECT
+                        unit.node_id,
+                        ARRAY(
+                            SELECT id FROM unnest(unit.descendants) AS id
+                            WHERE NOT id = ANY(target_descendants)
+                        ) AS kept
+                    FROM unit
+                    WHERE unit.node_id = ANY(source_ancestors)
+                ), entering AS (
+                    SELECT edge.source_id, edge.target_id
+                    FROM edge
+                    WHERE edge.target_id = ANY(target_descendants)
+                        AND NOT edge.source_id = ANY(target_descendants)
+                ), reached AS (
+                    SELECT DISTINCT affected.node_id, reached.id
+                    FROM affected
+                    CROSS JOIN LATERAL unnest(affected.kept || affected.node_id) AS through(id)
+                    JOIN entering ON entering.source_id = through.id
+                    LEFT JOIN unit entered ON entered.node_id = entering.target_id
+                    CROSS JOIN LATERAL unnest(
+                        COALESCE(entered.descendants, ARRAY[]::INTEGER[]) || entering.target_id
+                    ) AS reached(id)
+                )
+                UPDATE unit
+                SET descendants = array_union(
+                    affected.kept,
+                    ARRAY(SELECT reached.id FROM reached WHERE reached.node_id = affected.node_id)
+                )
+                FROM affected
+                WHERE unit.node_id = affected.node_id;
+
+                WITH affected AS (
+                    SELECT
+                        unit.node_id,
+                        ARRAY(
+                            SELECT id FROM unnest(unit.ancestors) AS id
+                            WHERE NOT id = ANY(source_ancestors)
+                        ) AS kept
+                    FROM unit
+                    WHERE unit.node_id = ANY(target_descendants)
+                ), leaving AS (
+                    SELECT edge.source_id, edge.target_id
+                    FROM edge
+                    WHERE edge.source_id = ANY(source_ancestors)
+                        AND NOT edge.target_id = ANY(source_ancestors)
+                ), reached AS (
+                    SELECT DISTINCT affected.node_id, reached.id
+                    FROM affected
+                    CROSS JOIN LATERAL unnest(affected.kept || affected.node_id) AS through(id)
+                    JOIN leaving ON leaving.target_id = through.id
+                    LEFT JOIN unit exited ON exited.node_id = leaving.source_id
+                    CROSS JOIN LATERAL unnest(
+                        COALESCE(exited.ancestors, ARRAY[]::INTEGER[]) || leaving.source_id
+                    ) AS reached(id)
+                )
+                UPDATE unit
+                SET ancestors = array_union(
+                    affected.kept,
+                    ARRAY(SELECT reached.id FROM reached WHERE reached.node_id = affected.node_id)
+                )
+                FROM affected
+                WHERE unit.node_id = affected.node_id;
+
+                RETURN;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_insert() RETURNS TRIGGER AS $$
+            DECLARE
+                descendants_of INTEGER[];
+                ancestors_of INTEGER[];
+            BEGIN
+                IF (SELECT count(*) FROM inserted_edges) <= 1 THEN
+                    PERFORM apply_edge_insert(inserted_edges.source_id, inserted_edges.target_id)
+                    FROM inserted_edges;
+                    RETURN NULL;
+                END IF;
+
+                descendants_of := ARRAY(
+                    SELECT inserted_edges.source_id FROM inserted_edges
+                    UNION
+                    SELECT unnest(unit.ancestors) FROM inserted_edges
+                        JOIN unit ON unit.node_id = inserted_edges.source_id
+                );
+                ancestors_of := ARRAY(
+                    SELECT inserted_edges.target_id FROM inserted_edges
+                    UNION
+                    SELECT unnest(unit.descendants) FROM inserted_edges
+                        JOIN unit ON unit.node_id = inserted_edges.target_id
+                );
+                PERFORM recalculate_unit_trees(descendants_of, ancestors_of);
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_delete() RETURNS TRIGGER AS $$
+            DECLARE
+                descendants_of INTEGER[];
+                ancestors_of INTEGER[];
+            BEGIN
+                IF (SELECT count(*) FROM deleted_edges) <= 1 THEN
+                    PERFORM apply_edge_delete(deleted_edges.source_id, deleted_edges.target_id)
+                    FROM deleted_edges;
+                    RETURN NULL;
+                END IF;
+
+                -- Read from the other units, the endpoints' rows may be gone when the
+                -- edges are deleted by the cascade of a unit deletion.
+                descendants_of := ARRAY(
+                    SELECT deleted_edges.source_id FROM deleted_edges
+                    UNION
+                    SELECT unit.node_id FROM unit
+                        JOIN deleted_edges ON unit.descendants @> ARRAY[deleted_edges.source_id]
+                );
+                ancestors_of := ARRAY(
+                    SELECT deleted_edges.target_id FROM deleted_edges
+                    UNION
+                    SELECT unit.node_id FROM unit
+                        JOIN deleted_edges ON unit.ancestors @> ARRAY[deleted_edges.target_id]
+                );
+                PERFORM recalculate_unit_trees(descendants_of, ancestors_of);
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_upsert() RETURNS TRIGGER AS $$
+            BEGIN
+                UPDATE unit
+                SET
+                    ancestors = calculate_ancestors(unit.node_id),
+                    descendants = calculate_descendants(unit.node_id)
+                WHERE unit.node_id IN (
+                        OLD.source_id, OLD.target_id, NEW.source_id, NEW.target_id
+                    )
+                    OR unit.descendants && ARRAY[OLD.source_id, NEW.source_id]
+                    OR unit.ancestors && ARRAY[OLD.target_id, NEW.target_id];
+
+                RETURN NEW;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_at_commit() RETURNS TRIGGER AS $$
+            DECLARE
+                source_ids INTEGER[];
+                target_ids INTEGER[];
+            BEGIN
+                IF to_regclass('pg_temp.unit_tree_staging') IS NULL THEN
+                    RETURN NULL;
+                END IF;
+
+                WITH staged AS (
+                    DELETE FROM pg_temp.unit_tree_staging
+                    RETURNING node_id, is_source
+                )
+                SELECT
+                    ARRAY_AGG(node_id) FILTER (WHERE is_source),
+                    ARRAY_AGG(node_id) FILTER (WHERE NOT is_source)
+                INTO source_ids, target_ids
+                FROM staged;
+
+                IF source_ids IS NULL AND target_ids IS NULL THEN
+                    RETURN NULL;
+                END IF;
+                source_ids := COALESCE(source_ids, ARRAY[]::INTEGER[]);
+                target_ids := COALESCE(target_ids, ARRAY[]::INTEGER[]);
+
+                PERFORM recalculate_unit_trees(
+                    array_union(
+                        source_ids,
+                        ARRAY(SELECT unit.node_id FROM unit WHERE unit.descendants && source_ids)
+                    ),
+                    array_union(
+                        target_ids,
+                        ARRAY(SELECT unit.node_id FROM unit WHERE unit.ancestors && target_ids)
+                    )
+                );
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION process_closure_queue (batch_size INTEGER) RETURNS INTEGER AS $$
+            DECLARE
+                processed INTEGER;
+                last_id BIGINT;
+                source_ids INTEGER[];
+                target_ids INTEGER[];
+                descendants_of INTEGER[];
+                ancestors_of INTEGER[];
+            BEGIN
+                -- Concurrent batches could overwrite each other's units with the
+                -- trees of an older snapshot, so they are serialized.
+                PERFORM pg_advisory_xact_lock(hashtext('closure_queue'));
+
+                WITH batch AS (
+                    DELETE FROM closure_queue
+                    WHERE closure_queue.id IN (
+                        SELECT closure_queue.id FROM closure_queue
+                        ORDER BY closure_queue.id
+                        LIMIT batch_size
+                    )
+                    RETURNING id, node_id, is_source
+                )
+                SELECT
+                    COUNT(*),
+                    MAX(id),
+                    COALESCE(ARRAY_AGG(DISTINCT node_id) FILTER (WHERE is_source), ARRAY[]::INTEGER[]),
+                    COALESCE(ARRAY_AGG(DISTINCT node_id) FILTER (WHERE NOT is_source), ARRAY[]::INTEGER[])
+                INTO processed, last_id, source_ids, target_ids
+                FROM batch;
+
+                IF processed = 0 THEN
+                    RETURN 0;
+                END IF;
+
+                WITH RECURSIVE reaching(id) AS (
+                    SELECT edge.source_id FROM edge WHERE edge.target_id = ANY(source_ids)
+                    UNION
+                    SELECT edge.source_id FROM reaching
+                        JOIN edge ON edge.target_id = reaching.id
+                )
+                SELECT array_union(
+                    source_ids,
+                    ARRAY(SELECT reaching.id FROM reaching)
+                        || ARRAY(SELECT unit.node_id FROM unit WHERE unit.descendants && source_ids)
+                )
+                INTO descendants_of;
+
+                WITH RECURSIVE reached(id) AS (
+                    SELECT edge.target_id FROM edge WHERE edge.source_id = ANY(target_ids)
+                    UNION
+                    SELECT edge.target_id FROM reached
+                        JOIN edge ON edge.source_id = reached.id
+                )
+                SELECT array_union(
+                    target_ids,
+                    ARRAY(SELECT reached.id FROM reached)
+                        || ARRAY(SELECT unit.node_id FROM unit WHERE unit.ancestors && target_ids)
+                )
+                INTO ancestors_of;
+
+                PERFORM recalculate_unit_trees(descendants_of, ancestors_of);
+
+                UPDATE unit
+                SET closure_version = last_id
+                WHERE unit.node_id = ANY(descendants_of || ancestors_of);
+
+                RETURN processed;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute("DROP FUNCTION IF EXISTS recalculate_node_closure;")
+    op.drop_index(
+        "ix_public_node_closure_descendant_id_ancestor_id",
+        table_name="node_closure",
+        schema="public",
+    )
+    op.drop_table("node_closure", schema="public")
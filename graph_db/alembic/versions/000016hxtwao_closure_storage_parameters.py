@@ -0,0 +1,51 @@
+"""Closure storage parameters
+
+Revision ID: 000016hxtwao
+Revises: 000015qlrmzc
+Create Date: 2026-02-18 09:37:21.460295
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000016hxtwao"
+down_revision: Union[str, None] = "000015qlrmzc"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # unit only holds scalar columns now. Free space on each page lets updates of
+    # unindexed columns (description, modified, closure_version) stay HOT.
+    op.execute("ALTER TABLE public.unit SET (fillfactor = 90);")
+
+    # node_closure takes all the trigger churn: rows are inserted and deleted in
+    # bulk, so it is vacuumed and analyzed long before the default 20% of dead rows.
+    op.execute(
+        """
+        ALTER TABLE public.node_closure SET (
+            fillfactor = 90,
+            autovacuum_vacuum_scale_factor = 0.02,
+            autovacuum_vacuum_insert_scale_factor = 0.05,
+            autovacuum_analyze_scale_factor = 0.01
+        );
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE public.node_closure RESET (
+            fillfactor,
+            autovacuum_vacuum_scale_factor,
+            autovacuum_vacuum_insert_scale_factor,
+            autovacuum_analyze_scale_factor
+        );
+        """
+    )
+    op.execute("ALTER TABLE public.unit RESET (fillfactor);")
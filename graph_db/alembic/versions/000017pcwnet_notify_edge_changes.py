@@ -0,0 +1,81 @@
+"""Notify edge changes
+
+Revision ID: 000017pcwnet
+Revises: 000016hxtwao
+Create Date: 2026-02-24 14:05:48.912376
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000017pcwnet"
+down_revision: Union[str, None] = "000016hxtwao"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Every committed edge write is announced on `edge_changes` as
+    # `<xid>:<+|->:<source>,<target>;...`, whatever the closure mode, so the
+    # in-memory graph of graph_api/graphql/traversal.py can follow it. Payloads
+    # are limited to 8000 bytes, larger statements only announce `<xid>:*`.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_edge_change() RETURNS TRIGGER AS $$
+            DECLARE
+                xid TEXT := pg_current_xact_id()::TEXT;
+                pairs TEXT;
+            BEGIN
+                IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                    SELECT string_agg(deleted_edges.source_id || ',' || deleted_edges.target_id, ';')
+                    INTO pairs
+                    FROM deleted_edges;
+                    IF pairs IS NOT NULL THEN
+                        PERFORM pg_notify(
+                            'edge_changes',
+                            CASE WHEN length(pairs) < 7900 THEN xid || ':-:' || pairs ELSE xid || ':*' END
+                        );
+                    END IF;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    SELECT string_agg(inserted_edges.source_id || ',' || inserted_edges.target_id, ';')
+                    INTO pairs
+                    FROM inserted_edges;
+                    IF pairs IS NOT NULL THEN
+                        PERFORM pg_notify(
+                            'edge_changes',
+                            CASE WHEN length(pairs) < 7900 THEN xid || ':+:' || pairs ELSE xid || ':*' END
+                        );
+                    END IF;
+                END IF;
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    for event, transition_tables in [
+        ("insert", "NEW TABLE AS inserted_edges"),
+        ("delete", "OLD TABLE AS deleted_edges"),
+        ("update", "OLD TABLE AS deleted_edges NEW TABLE AS inserted_edges"),
+    ]:
+        op.execute(
+            f"""
+            CREATE OR REPLACE TRIGGER notify_edge_{event}
+            AFTER {event.upper()} ON public.edge
+            REFERENCING {transition_tables}
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION notify_edge_change();
+            """
+        )
+
+
+def downgrade() -> None:
+    for event in ["insert", "delete", "update"]:
+        op.execute(f"DROP TRIGGER IF EXISTS notify_edge_{event} ON public.edge;")
+    op.execute("DROP FUNCTION IF EXISTS notify_edge_change;")
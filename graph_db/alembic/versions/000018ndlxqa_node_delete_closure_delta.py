@@ -0,0 +1,194 @@
+"""Node delete closure delta
+
+Revision ID: 000018ndlxqa
+Revises: 000017pcwnet
+Create Date: 2026-03-02 11:20:37.418205
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000018ndlxqa"
+down_revision: Union[str, None] = "000017pcwnet"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+IMMEDIATE = "COALESCE(current_setting('app.closure_mode', true), '') NOT IN ('deferred', 'async')"
+
+
+def upgrade() -> None:
+    # Removing a node u with all its edges only affects the pairs from A = its
+    # ancestors to D = its descendants. Unless u is on a cycle A and D are disjoint,
+    # so like for apply_edge_delete every remaining path from A into D enters D once
+    # through an edge x -> e whose pairs (a, x) and (e, d) are not affected.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION apply_node_delete (deleted_node_id INT) RETURNS VOID AS $$
+            BEGIN
+                IF EXISTS (
+                    SELECT 1 FROM node_closure
+                    WHERE node_closure.ancestor_id = deleted_node_id
+                        AND node_closure.descendant_id = deleted_node_id
+                ) THEN
+                    PERFORM recalculate_node_closure(
+                        deleted_node_id || ARRAY(
+                            SELECT node_closure.ancestor_id FROM node_closure
+                            WHERE node_closure.descendant_id = deleted_node_id
+                        )
+                    );
+                    RETURN;
+                END IF;
+
+                WITH source_side AS (
+                    SELECT node_closure.ancestor_id AS id FROM node_closure
+                    WHERE node_closure.descendant_id = deleted_node_id
+                ), target_side AS (
+                    SELECT node_closure.descendant_id AS id FROM node_closure
+                    WHERE node_closure.ancestor_id = deleted_node_id
+                ), entering AS (
+                    SELECT DISTINCT edge.source_id, edge.target_id
+                    FROM edge
+                    JOIN target_side ON target_side.id = edge.target_id
+                    WHERE edge.source_id NOT IN (SELECT target_side.id FROM target_side)
+                ), derived AS (
+                    SELECT via.id AS ancestor_id, reached.id AS descendant_id,
+                        MIN(via.depth + 1 + reached.depth) AS min_depth
+                    FROM entering
+                    CROSS JOIN LATERAL (
+                        SELECT entering.source_id AS id, 0 AS depth
+                        UNION ALL
+                        SELECT node_closure.ancestor_id, node_closure.min_depth FROM node_closure
+                        WHERE node_closure.descendant_id = entering.source_id
+                    ) AS via
+                    CROSS JOIN LATERAL (
+                        SELECT entering.target_id AS id, 0 AS depth
+                        UNION ALL
+                        SELECT node_closure.descendant_id, node_closure.min_depth FROM node_closure
+                        WHERE node_closure.ancestor_id = entering.target_id
+                    ) AS reached
+                    WHERE via.id IN (SELECT source_side.id FROM source_side)
+                    GROUP BY via.id, reached.id
+                ), removed AS (
+                    DELETE FROM node_closure
+                    USING source_side, target_side
+                    WHERE node_closure.ancestor_id = source_side.id
+                        AND node_closure.descendant_id = target_side.id
+                        AND NOT EXISTS (
+                            SELECT 1 FROM derived
+                            WHERE derived.ancestor_id = node_closure.ancestor_id
+                                AND derived.descendant_id = node_closure.descendant_id
+                        )
+                )
+                UPDATE node_closure
+                SET min_depth = derived.min_depth
+                FROM derived
+                WHERE node_closure.ancestor_id = derived.ancestor_id
+                    AND node_closure.descendant_id = derived.descendant_id
+                    AND node_closure.min_depth <> derived.min_depth;
+
+                DELETE FROM node_closure WHERE node_closure.ancestor_id = deleted_node_id;
+                DELETE FROM node_closure WHERE node_closure.descendant_id = deleted_node_id;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    # The cascade deletes the incoming and outgoing edges of a node in separate
+    # statements, before its node statement trigger fires. Their pairs are left to
+    # the node delta, which reads the closure from before the cascade.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_delete() RETURNS TRIGGER AS $$
+            DECLARE
+                source_ids INTEGER[];
+                target_ids INTEGER[];
+            BEGIN
+                SELECT ARRAY_AGG(deleted_edges.source_id), ARRAY_AGG(deleted_edges.target_id)
+                INTO source_ids, target_ids
+                FROM deleted_edges
+                WHERE EXISTS (SELECT 1 FROM node WHERE node.id = deleted_edges.source_id)
+                    AND EXISTS (SELECT 1 FROM node WHERE node.id = deleted_edges.target_id);
+
+                IF cardinality(source_ids) = 1 THEN
+                    PERFORM apply_edge_delete(source_ids[1], target_ids[1]);
+                ELSIF cardinality(source_ids) > 1 THEN
+                    PERFORM recalculate_node_closure(ARRAY(
+                        SELECT unnest(source_ids)
+                        UNION
+                        SELECT node_closure.ancestor_id FROM node_closure
+                        WHERE node_closure.descendant_id IN (SELECT unnest(source_ids))
+                    ));
+                END IF;
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    # Several nodes at once rebuild the pairs of all their ancestors, the closure
+    # still describes the graph before the statement.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_node_delete() RETURNS TRIGGER AS $$
+            BEGIN
+                IF (SELECT count(*) FROM deleted_nodes) <= 1 THEN
+                    PERFORM apply_node_delete(deleted_nodes.id) FROM deleted_nodes;
+                    RETURN NULL;
+                END IF;
+
+                PERFORM recalculate_node_closure(ARRAY(
+                    SELECT deleted_nodes.id FROM deleted_nodes
+                    UNION
+                    SELECT node_closure.ancestor_id FROM node_closure
+                        JOIN deleted_nodes ON node_closure.descendant_id = deleted_nodes.id
+                ));
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        f"""
+        CREATE OR REPLACE TRIGGER update_unit_tree_on_node_delete
+        AFTER DELETE ON public.node
+        REFERENCING OLD TABLE AS deleted_nodes
+        FOR EACH STATEMENT
+        WHEN ({IMMEDIATE})
+        EXECUTE FUNCTION update_unit_tree_on_node_delete();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS update_unit_tree_on_node_delete ON public.node;")
+    op.execute("DROP FUNCTION IF EXISTS update_unit_tree_on_node_delete;")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_delete() RETURNS TRIGGER AS $$
+            BEGIN
+                IF (SELECT count(*) FROM deleted_edges) <= 1 THEN
+                    PERFORM apply_edge_delete(deleted_edges.source_id, deleted_edges.target_id)
+                    FROM deleted_edges;
+                    RETURN NULL;
+                END IF;
+
+                PERFORM recalculate_node_closure(ARRAY(
+                    SELECT deleted_edges.source_id FROM deleted_edges
+                    UNION
+                    SELECT node_closure.ancestor_id FROM node_closure
+                        JOIN deleted_edges ON node_closure.descendant_id = deleted_edges.source_id
+                ));
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute("DROP FUNCTION IF EXISTS apply_node_delete;")
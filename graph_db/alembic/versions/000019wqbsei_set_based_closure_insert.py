@@ -0,0 +1,140 @@
+"""Set based closure insert
+
+Revision ID: 000019wqbsei
+Revises: 000018ndlxqa
+Create Date: 2026-03-03 09:47:12.664081
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000019wqbsei"
+down_revision: Union[str, None] = "000018ndlxqa"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+RECALCULATE_NODE_CLOSURE = """
+CREATE OR REPLACE FUNCTION recalculate_node_closure (ancestor_ids INTEGER[]) RETURNS VOID AS $$
+    DECLARE
+        depth INTEGER := 1;
+        reached INTEGER;
+    BEGIN
+        DELETE FROM node_closure WHERE node_closure.ancestor_id {member};
+
+        INSERT INTO node_closure (ancestor_id, descendant_id, min_depth)
+        SELECT DISTINCT edge.source_id, edge.target_id, 1
+        FROM edge
+        WHERE edge.source_id {member};
+        GET DIAGNOSTICS reached = ROW_COUNT;
+
+        -- Level by level, so a pair is first reached at its shortest depth.
+        WHILE reached > 0 LOOP
+            INSERT INTO node_closure (ancestor_id, descendant_id, min_depth)
+            SELECT DISTINCT node_closure.ancestor_id, edge.target_id, depth + 1
+            FROM node_closure
+            JOIN edge ON edge.source_id = node_closure.descendant_id
+            WHERE node_closure.ancestor_id {member}
+                AND node_closure.min_depth = depth
+            ON CONFLICT (ancestor_id, descendant_id) DO NOTHING;
+            GET DIAGNOSTICS reached = ROW_COUNT;
+            depth := depth + 1;
+        END LOOP;
+    END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    # `= ANY(array)` is evaluated row by row, a semi-join against the unnested
+    # array can be hashed when many ancestors are rebuilt at once.
+    op.execute(
+        RECALCULATE_NODE_CLOSURE.format(member="IN (SELECT unnest(ancestor_ids))")
+    )
+
+    # A shortest path may use several of the inserted edges, so the delta of all of
+    # them is applied in one statement until nothing gets closer. After the first
+    # round only the edges next to a changed pair can bring a pair closer: those
+    # whose source got new ancestors or whose target got new descendants.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_insert() RETURNS TRIGGER AS $$
+            DECLARE
+                source_ids INTEGER[];
+                target_ids INTEGER[];
+                reaching_ids INTEGER[];
+                reached_ids INTEGER[];
+            BEGIN
+                -- Another relation between the same nodes, nothing can get closer.
+                SELECT ARRAY_AGG(new_edges.source_id), ARRAY_AGG(new_edges.target_id)
+                INTO source_ids, target_ids
+                FROM (
+                    SELECT DISTINCT inserted_edges.source_id, inserted_edges.target_id
+                    FROM inserted_edges
+                ) AS new_edges
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM node_closure
+                    WHERE node_closure.ancestor_id = new_edges.source_id
+                        AND node_closure.descendant_id = new_edges.target_id
+                        AND node_closure.min_depth = 1
+                );
+
+                WHILE source_ids IS NOT NULL LOOP
+                    WITH changed AS (
+                        INSERT INTO node_closure (ancestor_id, descendant_id, min_depth)
+                        SELECT source_side.id, target_side.id, MIN(source_side.depth + 1 + target_side.depth)
+                        FROM unnest(source_ids, target_ids) AS new_edges(source_id, target_id)
+                        CROSS JOIN LATERAL (
+                            SELECT new_edges.source_id AS id, 0 AS depth
+                            UNION ALL
+                            SELECT node_closure.ancestor_id, node_closure.min_depth FROM node_closure
+                            WHERE node_closure.descendant_id = new_edges.source_id
+                        ) AS source_side
+                        CROSS JOIN LATERAL (
+                            SELECT new_edges.target_id AS id, 0 AS depth
+                            UNION ALL
+                            SELECT node_closure.descendant_id, node_closure.min_depth FROM node_closure
+                            WHERE node_closure.ancestor_id = new_edges.target_id
+                        ) AS target_side
+                        GROUP BY source_side.id, target_side.id
+                        ON CONFLICT (ancestor_id, descendant_id) DO UPDATE
+                        SET min_depth = EXCLUDED.min_depth
+                        WHERE node_closure.min_depth > EXCLUDED.min_depth
+                        RETURNING node_closure.ancestor_id, node_closure.descendant_id
+                    )
+                    SELECT ARRAY_AGG(DISTINCT changed.ancestor_id), ARRAY_AGG(DISTINCT changed.descendant_id)
+                    INTO reaching_ids, reached_ids
+                    FROM changed;
+
+                    SELECT ARRAY_AGG(new_edges.source_id), ARRAY_AGG(new_edges.target_id)
+                    INTO source_ids, target_ids
+                    FROM unnest(source_ids, target_ids) AS new_edges(source_id, target_id)
+                    WHERE new_edges.source_id IN (SELECT unnest(reached_ids))
+                        OR new_edges.target_id IN (SELECT unnest(reaching_ids));
+                END LOOP;
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_insert() RETURNS TRIGGER AS $$
+            BEGIN
+                PERFORM apply_edge_insert(inserted_edges.source_id, inserted_edges.target_id)
+                FROM inserted_edges;
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(RECALCULATE_NODE_CLOSURE.format(member="= ANY(ancestor_ids)"))
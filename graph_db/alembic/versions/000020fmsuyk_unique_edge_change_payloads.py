@@ -0,0 +1,70 @@
+"""Unique edge change payloads
+
+Revision ID: 000020fmsuyk
+Revises: 000019wqbsei
+Create Date: 2026-03-04 15:32:08.271940
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000020fmsuyk"
+down_revision: Union[str, None] = "000019wqbsei"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+NOTIFY_EDGE_CHANGE = """
+CREATE OR REPLACE FUNCTION notify_edge_change() RETURNS TRIGGER AS $$
+    DECLARE
+        xid TEXT := {xid};
+        pairs TEXT;
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            SELECT string_agg(deleted_edges.source_id || ',' || deleted_edges.target_id, ';')
+            INTO pairs
+            FROM deleted_edges;
+            IF pairs IS NOT NULL THEN
+                PERFORM pg_notify(
+                    'edge_changes',
+                    CASE WHEN length(pairs) < 7900 THEN xid || ':-:' || pairs ELSE xid || ':*' END
+                );
+            END IF;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            SELECT string_agg(inserted_edges.source_id || ',' || inserted_edges.target_id, ';')
+            INTO pairs
+            FROM inserted_edges;
+            IF pairs IS NOT NULL THEN
+                PERFORM pg_notify(
+                    'edge_changes',
+                    CASE WHEN length(pairs) < 7900 THEN xid || ':+:' || pairs ELSE xid || ':*' END
+                );
+            END IF;
+        END IF;
+
+        RETURN NULL;
+    END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    # Identical notifications of one transaction are delivered once, so two
+    # statements writing the same pairs would only be counted once. The xid is
+    # followed by `.<n>` from a sequence to keep every payload distinct.
+    op.execute("CREATE SEQUENCE IF NOT EXISTS public.edge_change_seq CYCLE;")
+    op.execute(
+        NOTIFY_EDGE_CHANGE.format(
+            xid="pg_current_xact_id()::TEXT || '.' || nextval('public.edge_change_seq')"
+        )
+    )
+
+
+def downgrade() -> None:
+    op.execute(NOTIFY_EDGE_CHANGE.format(xid="pg_current_xact_id()::TEXT"))
+    op.execute("DROP SEQUENCE IF EXISTS public.edge_change_seq;")
@@ -0,0 +1,311 @@
+"""Strongly connected components of nodes
+
+Revision ID: 000021sccndq
+Revises: 000020fmsuyk
+Create Date: 2026-03-06 10:14:51.093377
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000021sccndq"
+down_revision: Union[str, None] = "000020fmsuyk"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+IMMEDIATE = "COALESCE(current_setting('app.closure_mode', true), '') NOT IN ('deferred', 'async')"
+
+UPDATE_UNIT_TREE_AT_COMMIT = """
+        CREATE OR REPLACE FUNCTION update_unit_tree_at_commit() RETURNS TRIGGER AS $$
+            DECLARE
+                source_ids INTEGER[];
+            BEGIN
+                IF to_regclass('pg_temp.unit_tree_staging') IS NULL THEN
+                    RETURN NULL;
+                END IF;
+
+                WITH staged AS (
+                    DELETE FROM pg_temp.unit_tree_staging
+                    RETURNING node_id, is_source
+                )
+                SELECT ARRAY_AGG(node_id) FILTER (WHERE is_source)
+                INTO source_ids
+                FROM staged;
+
+                IF source_ids IS NULL THEN
+                    RETURN NULL;
+                END IF;
+
+                PERFORM recalculate_node_closure(ARRAY(
+                    SELECT unnest(source_ids)
+                    UNION
+                    SELECT node_closure.ancestor_id FROM node_closure
+                    WHERE node_closure.descendant_id = ANY(source_ids)
+                ));
+{refresh}
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+"""
+
+PROCESS_CLOSURE_QUEUE = """
+        CREATE OR REPLACE FUNCTION process_closure_queue (batch_size INTEGER) RETURNS INTEGER AS $$
+            DECLARE
+                processed INTEGER;
+                last_id BIGINT;
+                source_ids INTEGER[];
+                target_ids INTEGER[];
+                descendants_of INTEGER[];
+                ancestors_of INTEGER[];
+            BEGIN
+                -- Concurrent batches could overwrite each other's pairs with the
+                -- closure of an older snapshot, so they are serialized.
+                PERFORM pg_advisory_xact_lock(hashtext('closure_queue'));
+
+                WITH batch AS (
+                    DELETE FROM closure_queue
+                    WHERE closure_queue.id IN (
+                        SELECT closure_queue.id FROM closure_queue
+                        ORDER BY closure_queue.id
+                        LIMIT batch_size
+                    )
+                    RETURNING id, node_id, is_source
+                )
+                SELECT
+                    COUNT(*),
+                    MAX(id),
+                    COALESCE(ARRAY_AGG(DISTINCT node_id) FILTER (WHERE is_source), ARRAY[]::INTEGER[]),
+                    COALESCE(ARRAY_AGG(DISTINCT node_id) FILTER (WHERE NOT is_source), ARRAY[]::INTEGER[])
+                INTO processed, last_id, source_ids, target_ids
+                FROM batch;
+
+                IF processed = 0 THEN
+                    RETURN 0;
+                END IF;
+
+                WITH RECURSIVE reaching(id) AS (
+                    SELECT edge.source_id FROM edge WHERE edge.target_id = ANY(source_ids)
+                    UNION
+                    SELECT edge.source_id FROM reaching
+                        JOIN edge ON edge.target_id = reaching.id
+                )
+                SELECT ARRAY(
+                    SELECT unnest(source_ids)
+                    UNION
+                    SELECT reaching.id FROM reaching
+                    UNION
+                    SELECT node_closure.ancestor_id FROM node_closure
+                    WHERE node_closure.descendant_id = ANY(source_ids)
+                )
+                INTO descendants_of;
+
+                WITH RECURSIVE reached(id) AS (
+                    SELECT edge.target_id FROM edge WHERE edge.source_id = ANY(target_ids)
+                    UNION
+                    SELECT edge.target_id FROM reached
+                        JOIN edge ON edge.source_id = reached.id
+                )
+                SELECT ARRAY(
+                    SELECT unnest(target_ids)
+                    UNION
+                    SELECT reached.id FROM reached
+                    UNION
+                    SELECT node_closure.descendant_id FROM node_closure
+                    WHERE node_closure.ancestor_id = ANY(target_ids)
+                )
+                INTO ancestors_of;
+
+                PERFORM recalculate_node_closure(descendants_of);
+{refresh}
+                UPDATE unit
+                SET closure_version = last_id
+                WHERE unit.node_id = ANY(descendants_of || ancestors_of);
+
+                RETURN processed;
+            END;
+        $$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    # The least node id of the strongly connected component, NULL for the nodes on
+    # no cycle. Two nodes are in the same component when they reach each other, so
+    # it is derived from node_closure and only written for nodes on cycles.
+    op.add_column(
+        "node", sa.Column("scc_id", sa.Integer(), nullable=True), schema="public"
+    )
+    op.create_index(
+        "ix_public_node_scc_id",
+        "node",
+        ["scc_id"],
+        unique=False,
+        schema="public",
+        postgresql_where=sa.text("scc_id IS NOT NULL"),
+    )
+
+    # The components of the given nodes may have merged, then their new members
+    # reach them both ways, or split, then they shared their previous scc_id.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION refresh_node_scc (node_ids INTEGER[]) RETURNS VOID AS $$
+            BEGIN
+                WITH seeds AS (
+                    SELECT node.id, node.scc_id FROM node
+                    WHERE node.id IN (SELECT unnest(node_ids))
+                ), affected AS (
+                    SELECT seeds.id FROM seeds
+                    UNION
+                    SELECT node.id FROM node
+                    WHERE node.scc_id IN (SELECT seeds.scc_id FROM seeds)
+                    UNION
+                    SELECT forward.descendant_id FROM seeds
+                    JOIN node_closure AS forward ON forward.ancestor_id = seeds.id
+                    WHERE EXISTS (
+                        SELECT 1 FROM node_closure AS back
+                        WHERE back.ancestor_id = forward.descendant_id
+                            AND back.descendant_id = seeds.id
+                    )
+                ), component AS (
+                    SELECT affected.id, (
+                        SELECT MIN(forward.descendant_id) FROM node_closure AS forward
+                        WHERE forward.ancestor_id = affected.id
+                            AND EXISTS (
+                                SELECT 1 FROM node_closure AS back
+                                WHERE back.ancestor_id = forward.descendant_id
+                                    AND back.descendant_id = affected.id
+                            )
+                    ) AS scc_id
+                    FROM affected
+                )
+                UPDATE node
+                SET scc_id = component.scc_id
+                FROM component
+                WHERE node.id = component.id
+                    AND node.scc_id IS DISTINCT FROM component.scc_id;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    # Fired after the closure triggers, which sort before them by name. Like those,
+    # the edges cascaded from a deleted node are left to the node trigger.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_scc_on_edge_change() RETURNS TRIGGER AS $$
+            BEGIN
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    PERFORM refresh_node_scc(ARRAY(
+                        SELECT inserted_edges.source_id FROM inserted_edges
+                        -- Only an edge closing a cycle can merge components.
+                        WHERE EXISTS (
+                            SELECT 1 FROM node_closure
+                            WHERE node_closure.ancestor_id = inserted_edges.source_id
+                                AND node_closure.descendant_id = inserted_edges.source_id
+                        )
+                    ));
+                END IF;
+                IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                    PERFORM refresh_node_scc(ARRAY(
+                        SELECT node.id FROM deleted_edges
+                        JOIN node ON node.id = deleted_edges.source_id
+                        WHERE node.scc_id IS NOT NULL
+                            AND EXISTS (SELECT 1 FROM node WHERE node.id = deleted_edges.target_id)
+                    ));
+                END IF;
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for event, transition_tables in [
+        ("insert", "NEW TABLE AS inserted_edges"),
+        ("delete", "OLD TABLE AS deleted_edges"),
+        ("update", "OLD TABLE AS deleted_edges NEW TABLE AS inserted_edges"),
+    ]:
+        op.execute(
+            f"""
+            CREATE OR REPLACE TRIGGER update_unit_tree_scc_on_edge_{event}
+            AFTER {event.upper()} ON public.edge
+            REFERENCING {transition_tables}
+            FOR EACH STATEMENT
+            WHEN ({IMMEDIATE})
+            EXECUTE FUNCTION update_unit_tree_scc_on_edge_change();
+            """
+        )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_unit_tree_scc_on_node_delete() RETURNS TRIGGER AS $$
+            BEGIN
+                PERFORM refresh_node_scc(ARRAY(
+                    SELECT node.id FROM node
+                    WHERE node.scc_id IN (SELECT deleted_nodes.scc_id FROM deleted_nodes)
+                ));
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        f"""
+        CREATE OR REPLACE TRIGGER update_unit_tree_scc_on_node_delete
+        AFTER DELETE ON public.node
+        REFERENCING OLD TABLE AS deleted_nodes
+        FOR EACH STATEMENT
+        WHEN ({IMMEDIATE})
+        EXECUTE FUNCTION update_unit_tree_scc_on_node_delete();
+        """
+    )
+
+    # In deferred and async mode the components follow the recalculated closures,
+    # every changed pair starts at one of the sources.
+    op.execute(
+        UPDATE_UNIT_TREE_AT_COMMIT.format(
+            refresh="                PERFORM refresh_node_scc(source_ids);\n"
+        )
+    )
+    op.execute(
+        PROCESS_CLOSURE_QUEUE.format(
+            refresh="                PERFORM refresh_node_scc(source_ids);\n"
+        )
+    )
+
+    op.execute(
+        """
+        UPDATE node SET scc_id = component.scc_id
+        FROM (
+            SELECT forward.ancestor_id AS id, MIN(forward.descendant_id) AS scc_id
+            FROM node_closure AS forward
+            JOIN node_closure AS back
+                ON back.ancestor_id = forward.descendant_id
+                AND back.descendant_id = forward.ancestor_id
+            GROUP BY forward.ancestor_id
+        ) AS component
+        WHERE node.id = component.id;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(UPDATE_UNIT_TREE_AT_COMMIT.format(refresh=""))
+    op.execute(PROCESS_CLOSURE_QUEUE.format(refresh=""))
+    op.execute(
+        "DROP TRIGGER IF EXISTS update_unit_tree_scc_on_node_delete ON public.node;"
+    )
+    op.execute("DROP FUNCTION IF EXISTS update_unit_tree_scc_on_node_delete;")
+    for event in ["insert", "delete", "update"]:
+        op.execute(
+            f"DROP TRIGGER IF EXISTS update_unit_tree_scc_on_edge_{event} ON public.edge;"
+        )
+    op.execute("DROP FUNCTION IF EXISTS update_unit_tree_scc_on_edge_change;")
+    op.execute("DROP FUNCTION IF EXISTS refresh_node_scc;")
+    op.drop_index("ix_public_node_scc_id", table_name="node", schema="public")
+    op.drop_column("node", "scc_id", schema="public")
@@ -0,0 +1,54 @@
+"""Unit footprint
+
+Revision ID: 000022ftprnt
+Revises: 000021sccndq
+Create Date: 2026-03-09 11:02:37.518204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000022ftprnt"
+down_revision: Union[str, None] = "000021sccndq"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "edge", sa.Column("quantity", sa.Float(), nullable=True), schema="public"
+    )
+    op.create_table(
+        "unit_footprint",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("unit_id", sa.Integer(), nullable=False),
+        sa.Column("metric_path", sa.String(), nullable=False),
+        sa.Column("direct", sa.Float(), nullable=False),
+        sa.Column("total", sa.Float(), nullable=False),
+        sa.Column(
+            "created",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column(
+            "modified",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.ForeignKeyConstraint(["unit_id"], ["public.unit.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("unit_id", "metric_path", name="uq_unit_footprint"),
+        schema="public",
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("unit_footprint", schema="public")
+    op.drop_column("edge", "quantity", schema="public")
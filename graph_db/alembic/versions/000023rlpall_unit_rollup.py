@@ -0,0 +1,52 @@
+"""Unit rollup
+
+Revision ID: 000023rlpall
+Revises: 000022ftprnt
+Create Date: 2026-03-10 16:45:12.804316
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000023rlpall"
+down_revision: Union[str, None] = "000022ftprnt"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "unit_rollup",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("unit_id", sa.Integer(), nullable=False),
+        sa.Column("metric_path", sa.String(), nullable=False),
+        sa.Column("total", sa.Float(), nullable=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("minimum", sa.Float(), nullable=True),
+        sa.Column("maximum", sa.Float(), nullable=True),
+        sa.Column(
+            "created",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column(
+            "modified",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.ForeignKeyConstraint(["unit_id"], ["public.unit.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("unit_id", "metric_path", name="uq_unit_rollup"),
+        schema="public",
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("unit_rollup", schema="public")
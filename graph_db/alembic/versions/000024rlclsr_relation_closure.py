@@ -0,0 +1,224 @@
+"""Relation closure
+
+Revision ID: 000024rlclsr
+Revises: 000023rlpall
+Create Date: 2026-03-12 09:26:40.117853
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000024rlclsr"
+down_revision: Union[str, None] = "000023rlpall"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The relations whose reachability is kept in relation_closure.
+    op.add_column(
+        "relation",
+        sa.Column("materialized", sa.Boolean(), server_default="false", nullable=False),
+        schema="public",
+    )
+
+    # node_closure restricted to the edges of one relation, for the materialized
+    # relations only.
+    op.create_table(
+        "relation_closure",
+        sa.Column("relation", sa.String(), nullable=False),
+        sa.Column("ancestor_id", sa.Integer(), nullable=False),
+        sa.Column("descendant_id", sa.Integer(), nullable=False),
+        sa.Column("min_depth", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["relation"], ["public.relation.name"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint(
+            "relation",
+            "ancestor_id",
+            "descendant_id",
+            postgresql_include=["min_depth"],
+        ),
+        schema="public",
+    )
+    op.create_index(
+        "ix_public_relation_closure_relation_descendant_id_ancestor_id",
+        "relation_closure",
+        ["relation", "descendant_id", "ancestor_id"],
+        unique=False,
+        schema="public",
+        postgresql_include=["min_depth"],
+    )
+    op.execute(
+        """
+        ALTER TABLE public.relation_closure SET (
+            fillfactor = 90,
+            autovacuum_vacuum_scale_factor = 0.02,
+            autovacuum_vacuum_insert_scale_factor = 0.05,
+            autovacuum_analyze_scale_factor = 0.01
+        );
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION recalculate_relation_closure (
+            relation_name VARCHAR, ancestor_ids INTEGER[]
+        ) RETURNS VOID AS $$
+            DECLARE
+                depth INTEGER := 1;
+                reached INTEGER;
+            BEGIN
+                DELETE FROM relation_closure
+                WHERE relation_closure.relation = relation_name
+                    AND relation_closure.ancestor_id IN (SELECT unnest(ancestor_ids));
+
+                INSERT INTO relation_closure (relation, ancestor_id, descendant_id, min_depth)
+                SELECT DISTINCT relation_name, edge.source_id, edge.target_id, 1
+                FROM edge
+                WHERE edge.relation = relation_name
+                    AND edge.source_id IN (SELECT unnest(ancestor_ids));
+                GET DIAGNOSTICS reached = ROW_COUNT;
+
+                WHILE reached > 0 LOOP
+                    INSERT INTO relation_closure (relation, ancestor_id, descendant_id, min_depth)
+                    SELECT DISTINCT relation_name, relation_closure.ancestor_id, edge.target_id, depth + 1
+                    FROM relation_closure
+                    JOIN edge ON edge.source_id = relation_closure.descendant_id
+                    WHERE relation_closure.relation = relation_name
+                        AND edge.relation = relation_name
+                        AND relation_closure.ancestor_id IN (SELECT unnest(ancestor_ids))
+                        AND relation_closure.min_depth = depth
+                    ON CONFLICT (relation, ancestor_id, descendant_id) DO NOTHING;
+                    GET DIAGNOSTICS reached = ROW_COUNT;
+                    depth := depth + 1;
+                END LOOP;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    # The pairs of the written sources and of their ancestors are rebuilt, the
+    # pairs of sources deleted with their node are dropped.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION refresh_relation_closure (
+            relation_name VARCHAR, source_ids INTEGER[]
+        ) RETURNS VOID AS $$
+            BEGIN
+                DELETE FROM relation_closure
+                WHERE relation_closure.relation = relation_name
+                    AND relation_closure.ancestor_id IN (SELECT unnest(source_ids))
+                    AND NOT EXISTS (
+                        SELECT 1 FROM node WHERE node.id = relation_closure.ancestor_id
+                    );
+
+                PERFORM recalculate_relation_closure(relation_name, ARRAY(
+                    SELECT node.id FROM node
+                    WHERE node.id IN (SELECT unnest(source_ids))
+                    UNION
+                    SELECT relation_closure.ancestor_id FROM relation_closure
+                    WHERE relation_closure.relation = relation_name
+                        AND relation_closure.descendant_id IN (SELECT unnest(source_ids))
+                ));
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_relation_closure_on_edge_change() RETURNS TRIGGER AS $$
+            BEGIN
+                IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                    PERFORM refresh_relation_closure(changed.relation, changed.source_ids)
+                    FROM (
+                        SELECT deleted_edges.relation, ARRAY_AGG(DISTINCT deleted_edges.source_id) AS source_ids
+                        FROM deleted_edges
+                        JOIN relation ON relation.name = deleted_edges.relation
+                        WHERE relation.materialized
+                        GROUP BY deleted_edges.relation
+                    ) AS changed;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    PERFORM refresh_relation_closure(changed.relation, changed.source_ids)
+                    FROM (
+                        SELECT inserted_edges.relation, ARRAY_AGG(DISTINCT inserted_edges.source_id) AS source_ids
+                        FROM inserted_edges
+                        JOIN relation ON relation.name = inserted_edges.relation
+                        WHERE relation.materialized
+                        GROUP BY inserted_edges.relation
+                    ) AS changed;
+                END IF;
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for event, transition_tables in [
+        ("insert", "NEW TABLE AS inserted_edges"),
+        ("delete", "OLD TABLE AS deleted_edges"),
+        ("update", "OLD TABLE AS deleted_edges NEW TABLE AS inserted_edges"),
+    ]:
+        op.execute(
+            f"""
+            CREATE OR REPLACE TRIGGER update_relation_closure_on_edge_{event}
+            AFTER {event.upper()} ON public.edge
+            REFERENCING {transition_tables}
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION update_relation_closure_on_edge_change();
+            """
+        )
+
+    # Materializing a relation builds its pairs, unmaterializing drops them.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_relation_closure_on_relation_update() RETURNS TRIGGER AS $$
+            BEGIN
+                IF NEW.materialized AND NOT OLD.materialized THEN
+                    PERFORM recalculate_relation_closure(NEW.name, ARRAY(
+                        SELECT DISTINCT edge.source_id FROM edge WHERE edge.relation = NEW.name
+                    ));
+                ELSIF OLD.materialized AND NOT NEW.materialized THEN
+                    DELETE FROM relation_closure WHERE relation_closure.relation = OLD.name;
+                END IF;
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE TRIGGER update_relation_closure_on_relation_update
+        AFTER UPDATE OF materialized ON public.relation
+        FOR EACH ROW
+        EXECUTE FUNCTION update_relation_closure_on_relation_update();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        "DROP TRIGGER IF EXISTS update_relation_closure_on_relation_update ON public.relation;"
+    )
+    op.execute("DROP FUNCTION IF EXISTS update_relation_closure_on_relation_update;")
+    for event in ["insert", "delete", "update"]:
+        op.execute(
+            f"DROP TRIGGER IF EXISTS update_relation_closure_on_edge_{event} ON public.edge;"
+        )
+    op.execute("DROP FUNCTION IF EXISTS update_relation_closure_on_edge_change;")
+    op.execute("DROP FUNCTION IF EXISTS refresh_relation_closure;")
+    op.execute("DROP FUNCTION IF EXISTS recalculate_relation_closure;")
+    op.drop_index(
+        "ix_public_relation_closure_relation_descendant_id_ancestor_id",
+        table_name="relation_closure",
+        schema="public",
+    )
+    op.drop_table("relation_closure", schema="public")
+    op.drop_column("relation", "materialized", schema="public")
@@ -0,0 +1,307 @@
+"""Compact label and relation ids
+
+Revision ID: 000025smlids
+Revises: 000024rlclsr
+Create Date: 2026-03-16 10:02:13.486201
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000025smlids"
+down_revision: Union[str, None] = "000024rlclsr"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# The relation closure functions of 000024rlclsr, with the relation referenced
+# by {column} of type {type} holding relation.{key}.
+RECALCULATE_RELATION_CLOSURE = """
+CREATE OR REPLACE FUNCTION recalculate_relation_closure (
+    relation_key {type}, ancestor_ids INTEGER[]
+) RETURNS VOID AS $$
+    DECLARE
+        depth INTEGER := 1;
+        reached INTEGER;
+    BEGIN
+        DELETE FROM relation_closure
+        WHERE relation_closure.{column} = relation_key
+            AND relation_closure.ancestor_id IN (SELECT unnest(ancestor_ids));
+
+        INSERT INTO relation_closure ({column}, ancestor_id, descendant_id, min_depth)
+        SELECT DISTINCT relation_key, edge.source_id, edge.target_id, 1
+        FROM edge
+        WHERE edge.{column} = relation_key
+            AND edge.source_id IN (SELECT unnest(ancestor_ids));
+        GET DIAGNOSTICS reached = ROW_COUNT;
+
+        WHILE reached > 0 LOOP
+            INSERT INTO relation_closure ({column}, ancestor_id, descendant_id, min_depth)
+            SELECT DISTINCT relation_key, relation_closure.ancestor_id, edge.target_id, depth + 1
+            FROM relation_closure
+            JOIN edge ON edge.source_id = relation_closure.descendant_id
+            WHERE relation_closure.{column} = relation_key
+                AND edge.{column} = relation_key
+                AND relation_closure.ancestor_id IN (SELECT unnest(ancestor_ids))
+                AND relation_closure.min_depth = depth
+            ON CONFLICT ({column}, ancestor_id, descendant_id) DO NOTHING;
+            GET DIAGNOSTICS reached = ROW_COUNT;
+            depth := depth + 1;
+        END LOOP;
+    END;
+$$ LANGUAGE plpgsql
+"""
+
+REFRESH_RELATION_CLOSURE = """
+CREATE OR REPLACE FUNCTION refresh_relation_closure (
+    relation_key {type}, source_ids INTEGER[]
+) RETURNS VOID AS $$
+    BEGIN
+        DELETE FROM relation_closure
+        WHERE relation_closure.{column} = relation_key
+            AND relation_closure.ancestor_id IN (SELECT unnest(source_ids))
+            AND NOT EXISTS (
+                SELECT 1 FROM node WHERE node.id = relation_closure.ancestor_id
+            );
+
+        PERFORM recalculate_relation_closure(relation_key, ARRAY(
+            SELECT node.id FROM node
+            WHERE node.id IN (SELECT unnest(source_ids))
+            UNION
+            SELECT relation_closure.ancestor_id FROM relation_closure
+            WHERE relation_closure.{column} = relation_key
+                AND relation_closure.descendant_id IN (SELECT unnest(source_ids))
+        ));
+    END;
+$$ LANGUAGE plpgsql
+"""
+
+UPDATE_RELATION_CLOSURE_ON_EDGE_CHANGE = """
+CREATE OR REPLACE FUNCTION update_relation_closure_on_edge_change() RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            PERFORM refresh_relation_closure(changed.relation_key, changed.source_ids)
+            FROM (
+                SELECT deleted_edges.{column} AS relation_key, ARRAY_AGG(DISTINCT deleted_edges.source_id) AS source_ids
+                FROM deleted_edges
+                JOIN relation ON relation.{key} = deleted_edges.{column}
+                WHERE relation.materialized
+                GROUP BY deleted_edges.{column}
+            ) AS changed;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM refresh_relation_closure(changed.relation_key, changed.source_ids)
+            FROM (
+                SELECT inserted_edges.{column} AS relation_key, ARRAY_AGG(DISTINCT inserted_edges.source_id) AS source_ids
+                FROM inserted_edges
+                JOIN relation ON relation.{key} = inserted_edges.{column}
+                WHERE relation.materialized
+                GROUP BY inserted_edges.{column}
+            ) AS changed;
+        END IF;
+
+        RETURN NULL;
+    END;
+$$ LANGUAGE plpgsql
+"""
+
+UPDATE_RELATION_CLOSURE_ON_RELATION_UPDATE = """
+CREATE OR REPLACE FUNCTION update_relation_closure_on_relation_update() RETURNS TRIGGER AS $$
+    BEGIN
+        IF NEW.materialized AND NOT OLD.materialized THEN
+            PERFORM recalculate_relation_closure(NEW.{key}, ARRAY(
+                SELECT DISTINCT edge.source_id FROM edge WHERE edge.{column} = NEW.{key}
+            ));
+        ELSIF OLD.materialized AND NOT NEW.materialized THEN
+            DELETE FROM relation_closure WHERE relation_closure.{column} = OLD.{key};
+        END IF;
+
+        RETURN NULL;
+    END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def _create_relation_closure_functions(column: str, type: str, key: str) -> None:
+    for template in [
+        RECALCULATE_RELATION_CLOSURE,
+        REFRESH_RELATION_CLOSURE,
+        UPDATE_RELATION_CLOSURE_ON_EDGE_CHANGE,
+        UPDATE_RELATION_CLOSURE_ON_RELATION_UPDATE,
+    ]:
+        op.execute(template.format(column=column, type=type, key=key))
+
+
+def _convert_column(table: str, column: str, lookup: str, type: str, to_ids: bool):
+    """Rewrites the names in `table`.`column` to the ids of `lookup` or back.
+
+    The lookup tables are tiny, so the mapping is inlined as a CASE expression and
+    the table is rewritten once by ALTER COLUMN ... TYPE, which fires no triggers.
+    """
+    source, target = ("name", "id") if to_ids else ("id", "name")
+    op.execute(
+        f"""
+        DO $$ BEGIN
+            EXECUTE (
+                SELECT format(
+                    'ALTER TABLE public.{table} ALTER COLUMN {column} TYPE {type} '
+                    'USING (CASE {column} %s END)::{type}',
+                    COALESCE(
+                        string_agg(format('WHEN %L THEN %L', {source}, {target}), ' '),
+                        'WHEN NULL THEN NULL'
+                    )
+                )
+                FROM public.{lookup}
+            );
+        END $$;
+        """
+    )
+
+
+def upgrade() -> None:
+    op.execute(
+        "DROP FUNCTION IF EXISTS recalculate_relation_closure(VARCHAR, INTEGER[]);"
+    )
+    op.execute("DROP FUNCTION IF EXISTS refresh_relation_closure(VARCHAR, INTEGER[]);")
+
+    op.drop_constraint("fk_node_label", "node", schema="public", type_="foreignkey")
+    op.drop_constraint("fk_edge_relation", "edge", schema="public", type_="foreignkey")
+    op.drop_constraint(
+        "relation_closure_relation_fkey",
+        "relation_closure",
+        schema="public",
+        type_="foreignkey",
+    )
+    op.execute("ALTER TABLE public.edge ALTER COLUMN relation DROP DEFAULT;")
+
+    for lookup in ["label", "relation"]:
+        op.execute(f"ALTER TABLE public.{lookup} ALTER COLUMN id TYPE SMALLINT;")
+        op.execute(f"ALTER SEQUENCE public.{lookup}_id_seq AS SMALLINT;")
+
+    for table, column, lookup in [
+        ("node", "label", "label"),
+        ("edge", "relation", "relation"),
+        ("relation_closure", "relation", "relation"),
+    ]:
+        _convert_column(table, column, lookup, "SMALLINT", True)
+        op.alter_column(table, column, new_column_name=f"{column}_id", schema="public")
+    op.execute(
+        """
+        ALTER INDEX public.ix_public_relation_closure_relation_descendant_id_ancestor_id
+        RENAME TO ix_public_relation_closure_relation_id_descendant_id;
+        """
+    )
+
+    op.create_foreign_key(
+        "fk_node_label_id",
+        "node",
+        "label",
+        ["label_id"],
+        ["id"],
+        source_schema="public",
+        referent_schema="public",
+    )
+    op.create_foreign_key(
+        "fk_edge_relation_id",
+        "edge",
+        "relation",
+        ["relation_id"],
+        ["id"],
+        source_schema="public",
+        referent_schema="public",
+    )
+    op.create_foreign_key(
+        "relation_closure_relation_id_fkey",
+        "relation_closure",
+        "relation",
+        ["relation_id"],
+        ["id"],
+        source_schema="public",
+        referent_schema="public",
+        ondelete="CASCADE",
+    )
+    op.execute(
+        """
+        DO $$ BEGIN
+            EXECUTE format(
+                'ALTER TABLE public.edge ALTER COLUMN relation_id SET DEFAULT %s',
+                (SELECT id FROM public.relation WHERE name = 'links')
+            );
+        END $$;
+        """
+    )
+
+    _create_relation_closure_functions("relation_id", "SMALLINT", "id")
+
+
+def downgrade() -> None:
+    op.execute(
+        "DROP FUNCTION IF EXISTS recalculate_relation_closure(SMALLINT, INTEGER[]);"
+    )
+    op.execute("DROP FUNCTION IF EXISTS refresh_relation_closure(SMALLINT, INTEGER[]);")
+
+    op.drop_constraint("fk_node_label_id", "node", schema="public", type_="foreignkey")
+    op.drop_constraint(
+        "fk_edge_relation_id", "edge", schema="public", type_="foreignkey"
+    )
+    op.drop_constraint(
+        "relation_closure_relation_id_fkey",
+        "relation_closure",
+        schema="public",
+        type_="foreignkey",
+    )
+    op.execute("ALTER TABLE public.edge ALTER COLUMN relation_id DROP DEFAULT;")
+
+    op.execute(
+        """
+        ALTER INDEX public.ix_public_relation_closure_relation_id_descendant_id
+        RENAME TO ix_public_relation_closure_relation_descendant_id_ancestor_id;
+        """
+    )
+    for table, column, lookup in [
+        ("node", "label", "label"),
+        ("edge", "relation", "relation"),
+        ("relation_closure", "relation", "relation"),
+    ]:
+        op.alter_column(table, f"{column}_id", new_column_name=column, schema="public")
+        _convert_column(table, column, lookup, "VARCHAR", False)
+
+    for lookup in ["label", "relation"]:
+        op.execute(f"ALTER SEQUENCE public.{lookup}_id_seq AS INTEGER;")
+        op.execute(f"ALTER TABLE public.{lookup} ALTER COLUMN id TYPE INTEGER;")
+
+    op.create_foreign_key(
+        "fk_node_label",
+        "node",
+        "label",
+        ["label"],
+        ["name"],
+        source_schema="public",
+        referent_schema="public",
+    )
+    op.create_foreign_key(
+        "fk_edge_relation",
+        "edge",
+        "relation",
+        ["relation"],
+        ["name"],
+        source_schema="public",
+        referent_schema="public",
+    )
+    op.create_foreign_key(
+        "relation_closure_relation_fkey",
+        "relation_closure",
+        "relation",
+        ["relation"],
+        ["name"],
+        source_schema="public",
+        referent_schema="public",
+        ondelete="CASCADE",
+    )
+    op.execute("ALTER TABLE public.edge ALTER COLUMN relation SET DEFAULT 'links';")
+
+    _create_relation_closure_functions("relation", "VARCHAR", "name")
@@ -0,0 +1,57 @@
+"""Reverse edge index
+
+Revision ID: 000026edgidx
+Revises: 000025smlids
+Create Date: 2026-03-18 14:37:05.219734
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000026edgidx"
+down_revision: Union[str, None] = "000025smlids"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # uq_edge (source_id, target_id, relation_id) covers the outgoing edges, this
+    # mirrors it for the incoming ones: the ancestors traversals, the closure
+    # delete triggers and the ON DELETE CASCADE of the targets read only the
+    # index, with or without a relation filter. See graph_db/bench_edge_indexes.py.
+    op.create_index(
+        "ix_public_edge_target_id_relation_id_source_id",
+        "edge",
+        ["target_id", "relation_id", "source_id"],
+        unique=False,
+        schema="public",
+    )
+    # Index-only scans skip the heap only for the pages marked all-visible.
+    op.execute(
+        """
+        ALTER TABLE public.edge SET (
+            autovacuum_vacuum_insert_scale_factor = 0.05,
+            autovacuum_vacuum_scale_factor = 0.05
+        );
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE public.edge RESET (
+            autovacuum_vacuum_insert_scale_factor,
+            autovacuum_vacuum_scale_factor
+        );
+        """
+    )
+    op.drop_index(
+        "ix_public_edge_target_id_relation_id_source_id",
+        table_name="edge",
+        schema="public",
+    )
@@ -0,0 +1,276 @@
+"""Relation closure delta
+
+Revision ID: 000027rlcdlt
+Revises: 000026edgidx
+Create Date: 2026-03-19 10:41:52.730418
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "000027rlcdlt"
+down_revision: Union[str, None] = "000026edgidx"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # update_unit_tree_on_edge_insert restricted to the edges and pairs of one
+    # relation: the pairs linked through the inserted edges are added or brought
+    # closer, round after round until nothing gets closer.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION apply_relation_edge_insert (
+            relation_key SMALLINT, source_ids INTEGER[], target_ids INTEGER[]
+        ) RETURNS VOID AS $$
+            DECLARE
+                reaching_ids INTEGER[];
+                reached_ids INTEGER[];
+            BEGIN
+                -- Another edge of the relation between the same nodes.
+                SELECT ARRAY_AGG(new_edges.source_id), ARRAY_AGG(new_edges.target_id)
+                INTO source_ids, target_ids
+                FROM (
+                    SELECT DISTINCT new_edges.source_id, new_edges.target_id
+                    FROM unnest(source_ids, target_ids) AS new_edges(source_id, target_id)
+                ) AS new_edges
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM relation_closure
+                    WHERE relation_closure.relation_id = relation_key
+                        AND relation_closure.ancestor_id = new_edges.source_id
+                        AND relation_closure.descendant_id = new_edges.target_id
+                        AND relation_closure.min_depth = 1
+                );
+
+                WHILE source_ids IS NOT NULL LOOP
+                    WITH changed AS (
+                        INSERT INTO relation_closure (relation_id, ancestor_id, descendant_id, min_depth)
+                        SELECT relation_key, source_side.id, target_side.id, MIN(source_side.depth + 1 + target_side.depth)
+                        FROM unnest(source_ids, target_ids) AS new_edges(source_id, target_id)
+                        CROSS JOIN LATERAL (
+                            SELECT new_edges.source_id AS id, 0 AS depth
+                            UNION ALL
+                            SELECT relation_closure.ancestor_id, relation_closure.min_depth FROM relation_closure
+                            WHERE relation_closure.relation_id = relation_key
+                                AND relation_closure.descendant_id = new_edges.source_id
+                        ) AS source_side
+                        CROSS JOIN LATERAL (
+                            SELECT new_edges.target_id AS id, 0 AS depth
+                            UNION ALL
+                            SELECT relation_closure.descendant_id, relation_closure.min_depth FROM relation_closure
+                            WHERE relation_closure.relation_id = relation_key
+                                AND relation_closure.ancestor_id = new_edges.target_id
+                        ) AS target_side
+                        GROUP BY source_side.id, target_side.id
+                        ON CONFLICT (relation_id, ancestor_id, descendant_id) DO UPDATE
+                        SET min_depth = EXCLUDED.min_depth
+                        WHERE relation_closure.min_depth > EXCLUDED.min_depth
+                        RETURNING relation_closure.ancestor_id, relation_closure.descendant_id
+                    )
+                    SELECT ARRAY_AGG(DISTINCT changed.ancestor_id), ARRAY_AGG(DISTINCT changed.descendant_id)
+                    INTO reaching_ids, reached_ids
+                    FROM changed;
+
+                    SELECT ARRAY_AGG(new_edges.source_id), ARRAY_AGG(new_edges.target_id)
+                    INTO source_ids, target_ids
+                    FROM unnest(source_ids, target_ids) AS new_edges(source_id, target_id)
+                    WHERE new_edges.source_id IN (SELECT unnest(reached_ids))
+                        OR new_edges.target_id IN (SELECT unnest(reaching_ids));
+                END LOOP;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    # apply_edge_delete restricted to one relation: unless the edge was on a
+    # cycle, the pairs from its source side to its target side are rederived from
+    # the remaining edges of the relation entering the target side.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION apply_relation_edge_delete (
+            relation_key SMALLINT, source_node_id INT, target_node_id INT
+        ) RETURNS VOID AS $$
+            BEGIN
+                -- Another edge of the relation keeps the reachability.
+                IF EXISTS (
+                    SELECT 1 FROM edge
+                    WHERE edge.relation_id = relation_key
+                        AND edge.source_id = source_node_id
+                        AND edge.target_id = target_node_id
+                ) THEN
+                    RETURN;
+                END IF;
+
+                IF source_node_id = target_node_id OR EXISTS (
+                    SELECT 1 FROM relation_closure
+                    WHERE relation_closure.relation_id = relation_key
+                        AND relation_closure.ancestor_id = target_node_id
+                        AND relation_closure.descendant_id = source_node_id
+                ) THEN
+                    PERFORM recalculate_relation_closure(
+                        relation_key,
+                        source_node_id || ARRAY(
+                            SELECT relation_closure.ancestor_id FROM relation_closure
+                            WHERE relation_closure.relation_id = relation_key
+                                AND relation_closure.descendant_id = source_node_id
+                        )
+                    );
+                    RETURN;
+                END IF;
+
+                WITH source_side AS (
+                    SELECT source_node_id AS id
+                    UNION ALL
+                    SELECT relation_closure.ancestor_id FROM relation_closure
+                    WHERE relation_closure.relation_id = relation_key
+                        AND relation_closure.descendant_id = source_node_id
+                ), target_side AS (
+                    SELECT target_node_id AS id
+                    UNION ALL
+                    SELECT relation_closure.descendant_id FROM relation_closure
+                    WHERE relation_closure.relation_id = relation_key
+                        AND relation_closure.ancestor_id = target_node_id
+                ), entering AS (
+                    SELECT DISTINCT edge.source_id, edge.target_id
+                    FROM edge
+                    JOIN target_side ON target_side.id = edge.target_id
+                    WHERE edge.relation_id = relation_key
+                        AND edge.source_id NOT IN (SELECT target_side.id FROM target_side)
+                ), derived AS (
+                    SELECT via.id AS ancestor_id, reached.id AS descendant_id,
+                        MIN(via.depth + 1 + reached.depth) AS min_depth
+                    FROM entering
+                    CROSS JOIN LATERAL (
+                        SELECT entering.source_id AS id, 0 AS depth
+                        UNION ALL
+                        SELECT relation_closure.ancestor_id, relation_closure.min_depth FROM relation_closure
+                        WHERE relation_closure.relation_id = relation_key
+                            AND relation_closure.descendant_id = entering.source_id
+                    ) AS via
+                    CROSS JOIN LATERAL (
+                        SELECT entering.target_id AS id, 0 AS depth
+                        UNION ALL
+                        SELECT relation_closure.descendant_id, relation_closure.min_depth FROM relation_closure
+                        WHERE relation_closure.relation_id = relation_key
+                            AND relation_closure.ancestor_id = entering.target_id
+                    ) AS reached
+                    WHERE via.id IN (SELECT source_side.id FROM source_side)
+                    GROUP BY via.id, reached.id
+                ), removed AS (
+                    DELETE FROM relation_closure
+                    USING source_side, target_side
+                    WHERE relation_closure.relation_id = relation_key
+                        AND relation_closure.ancestor_id = source_side.id
+                        AND relation_closure.descendant_id = target_side.id
+                        AND NOT EXISTS (
+                            SELECT 1 FROM derived
+                            WHERE derived.ancestor_id = relation_closure.ancestor_id
+                                AND derived.descendant_id = relation_closure.descendant_id
+                        )
+                )
+                UPDATE relation_closure
+                SET min_depth = derived.min_depth
+                FROM derived
+                WHERE relation_closure.relation_id = relation_key
+                    AND relation_closure.ancestor_id = derived.ancestor_id
+                    AND relation_closure.descendant_id = derived.descendant_id
+                    AND relation_closure.min_depth <> derived.min_depth;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    # Like node_closure, a single deleted edge is applied as a delta and several
+    # ones, or the edges cascaded from a deleted node, rebuild the pairs of their
+    # sources and of the ancestors of these. The inserted edges are a delta.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_relation_closure_on_edge_change() RETURNS TRIGGER AS $$
+            DECLARE
+                changed RECORD;
+            BEGIN
+                IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                    FOR changed IN
+                        SELECT deleted_edges.relation_id,
+                            ARRAY_AGG(deleted_edges.source_id) AS source_ids,
+                            ARRAY_AGG(deleted_edges.target_id) AS target_ids,
+                            BOOL_AND(
+                                EXISTS (SELECT 1 FROM node WHERE node.id = deleted_edges.source_id)
+                                AND EXISTS (SELECT 1 FROM node WHERE node.id = deleted_edges.target_id)
+                            ) AS nodes_kept
+                        FROM deleted_edges
+                        JOIN relation ON relation.id = deleted_edges.relation_id
+                        WHERE relation.materialized
+                        GROUP BY deleted_edges.relation_id
+                    LOOP
+                        IF cardinality(changed.source_ids) = 1 AND changed.nodes_kept THEN
+                            PERFORM apply_relation_edge_delete(
+                                changed.relation_id, changed.source_ids[1], changed.target_ids[1]
+                            );
+                        ELSE
+                            PERFORM refresh_relation_closure(
+                                changed.relation_id, ARRAY(SELECT DISTINCT unnest(changed.source_ids))
+                            );
+                        END IF;
+                    END LOOP;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    FOR changed IN
+                        SELECT inserted_edges.relation_id,
+                            ARRAY_AGG(inserted_edges.source_id) AS source_ids,
+                            ARRAY_AGG(inserted_edges.target_id) AS target_ids
+                        FROM inserted_edges
+                        JOIN relation ON relation.id = inserted_edges.relation_id
+                        WHERE relation.materialized
+                        GROUP BY inserted_edges.relation_id
+                    LOOP
+                        PERFORM apply_relation_edge_insert(
+                            changed.relation_id, changed.source_ids, changed.target_ids
+                        );
+                    END LOOP;
+                END IF;
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION update_relation_closure_on_edge_change() RETURNS TRIGGER AS $$
+            BEGIN
+                IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                    PERFORM refresh_relation_closure(changed.relation_key, changed.source_ids)
+                    FROM (
+                        SELECT deleted_edges.relation_id AS relation_key, ARRAY_AGG(DISTINCT deleted_edges.source_id) AS source_ids
+                        FROM deleted_edges
+                        JOIN relation ON relation.id = deleted_edges.relation_id
+                        WHERE relation.materialized
+                        GROUP BY deleted_edges.relation_id
+                    ) AS changed;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    PERFORM refresh_relation_closure(changed.relation_key, changed.source_ids)
+                    FROM (
+                        SELECT inserted_edges.relation_id AS relation_key, ARRAY_AGG(DISTINCT inserted_edges.source_id) AS source_ids
+                        FROM inserted_edges
+                        JOIN relation ON relation.id = inserted_edges.relation_id
+                        WHERE relation.materialized
+                        GROUP BY inserted_edges.relation_id
+                    ) AS changed;
+                END IF;
+
+                RETURN NULL;
+            END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute("DROP FUNCTION IF EXISTS apply_relation_edge_delete;")
+    op.execute("DROP FUNCTION IF EXISTS apply_relation_edge_insert;")
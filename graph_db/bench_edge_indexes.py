@@ -0,0 +1,224 @@
+"""Compares the edge index strategies on a synthetic graph.
+
+A layered random graph is written to the edge_bench schema, a copy of
+public.edge holding only the columns the traversals read, once per strategy
+with that strategy's indexes. The adjacency queries of the API and the closure
+triggers then run under EXPLAIN (ANALYZE, BUFFERS) and their scans, buffers and
+median times are printed. The schema is dropped afterwards. Run it with:
+
+    PYTHONPATH=. python -m graph_db.bench_edge_indexes [--nodes 100000]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+from graph_db.session import engine
+
+SCHEMA = "edge_bench"
+
+# The index strategies, as the indexes created on edge_bench.edge besides its
+# primary key.
+STRATEGIES: dict[str, list[str]] = {
+    # Up to 000025smlids.
+    "source_only": [
+        "CREATE UNIQUE INDEX ON edge (source_id, target_id, relation_id)",
+        "CREATE INDEX ON edge (source_id, target_id, id)",
+    ],
+    # 000026edgidx: the reverse index mirrors uq_edge for the incoming edges.
+    "both_directions": [
+        "CREATE UNIQUE INDEX ON edge (source_id, target_id, relation_id)",
+        "CREATE INDEX ON edge (source_id, target_id, id)",
+        "CREATE INDEX ON edge (target_id, relation_id, source_id)",
+    ],
+}
+
+# The statements timed, named after the code they mirror.
+QUERIES: dict[str, str] = {
+    # select_relation_closure(ancestors=True), the ancestors over relations.
+    "ancestors_cte": """
+        WITH RECURSIVE reach (node_id, related_id) AS (
+            SELECT target_id, source_id FROM edge
+            WHERE target_id = ANY(%(node_ids)s) AND relation_id = ANY(%(relation_ids)s)
+            UNION
+            SELECT reach.node_id, edge.source_id FROM reach
+            JOIN edge ON edge.target_id = reach.related_id
+            WHERE edge.relation_id = ANY(%(relation_ids)s)
+        )
+        SELECT count(*) FROM reach
+    """,
+    # select_relation_closure(ancestors=False) over a single relation.
+    "descendants_cte": """
+        WITH RECURSIVE reach (node_id, related_id) AS (
+            SELECT source_id, target_id FROM edge
+            WHERE source_id = ANY(%(node_ids)s) AND relation_id = %(relation_id)s
+            UNION
+            SELECT reach.node_id, edge.target_id FROM reach
+            JOIN edge ON edge.source_id = reach.related_id
+            WHERE edge.relation_id = %(relation_id)s
+        )
+        SELECT count(*) FROM reach
+    """,
+    # _get_edges(target_id=...), the incoming edges of a unit.
+    "incoming_edges": """
+        SELECT * FROM edge WHERE target_id = ANY(%(node_ids)s)
+        ORDER BY source_id, target_id
+    """,
+    # The closure delete triggers, whose deleted targets are re-reached through
+    # the remaining incoming edges, and the ON DELETE CASCADE of the node.
+    "incoming_sources": """
+        SELECT DISTINCT source_id FROM edge WHERE target_id = ANY(%(node_ids)s)
+    """,
+    # The parallel edge checks of the closure triggers.
+    "edge_pair": """
+        SELECT EXISTS (
+            SELECT 1 FROM edge
+            WHERE source_id = %(source_id)s AND target_id = %(target_id)s
+        )
+    """,
+}
+
+
+def generate_edges(
+    nodes: int, degree: int, relations: int, window: int, seed: int
+) -> list[tuple[int, int, int]]:
+    """Edges from every node to `degree` random nodes of the next `window`
+    ones, the relation ids skewed towards 1 like a default relation."""
+    rnd = random.Random(seed)
+    weights = [2**-index for index in range(relations)]
+    edges = set()
+    for source in range(1, nodes):
+        for _ in range(degree):
+            target = rnd.randint(source + 1, min(source + window, nodes))
+            relation = rnd.choices(range(1, relations + 1), weights)[0]
+            edges.add((source, target, relation))
+    return sorted(edges)
+
+
+def _scans(plan: dict) -> list[str]:
+    scans = []
+    if "Scan" in plan["Node Type"]:
+        index = plan.get("Index Name")
+        scans.append(plan["Node Type"] + (f" ({index})" if index else ""))
+    for child in plan.get("Plans", []):
+        scans.extend(_scans(child))
+    return scans
+
+
+def run(
+    nodes: int = 100_000,
+    degree: int = 3,
+    relations: int = 3,
+    window: int = 50,
+    probes: int = 20,
+    repeat: int = 5,
+    seed: int = 1,
+) -> dict[str, dict[str, dict]]:
+    edges = generate_edges(nodes, degree, relations, window, seed)
+    rnd = random.Random(seed)
+    parameters = {
+        # Relation 2 holds about 2/7 of the edges, so the reach stays bounded
+        # while taking several levels.
+        "ancestors_cte": {
+            "node_ids": rnd.sample(range(1, nodes + 1), probes),
+            "relation_ids": [2],
+        },
+        "descendants_cte": {
+            "node_ids": rnd.sample(range(1, nodes + 1), probes),
+            "relation_id": 2,
+        },
+        "incoming_edges": {"node_ids": rnd.sample(range(1, nodes + 1), probes)},
+        "incoming_sources": {"node_ids": rnd.sample(range(1, nodes + 1), probes)},
+        "edge_pair": {"source_id": edges[0][0], "target_id": edges[0][1]},
+    }
+
+    results: dict[str, dict[str, dict]] = {}
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+        cursor.execute(f"SET search_path TO {SCHEMA}")
+        for strategy, indexes in STRATEGIES.items():
+            cursor.execute("DROP TABLE IF EXISTS edge")
+            cursor.execute(
+                """
+                CREATE TABLE edge (
+                    id SERIAL PRIMARY KEY,
+                    source_id INTEGER NOT NULL,
+                    target_id INTEGER NOT NULL,
+                    relation_id SMALLINT NOT NULL,
+                    quantity DOUBLE PRECISION
+                )
+                """
+            )
+            cursor.execute(
+                """
+                INSERT INTO edge (source_id, target_id, relation_id)
+                SELECT * FROM unnest(%s::int[], %s::int[], %s::smallint[])
+                """,
+                tuple(map(list, zip(*edges))),
+            )
+            for index in indexes:
+                cursor.execute(index)
+            connection.commit()
+            # A fresh visibility map, as autovacuum keeps it, for index-only scans.
+            connection.driver_connection.autocommit = True
+            cursor.execute("VACUUM ANALYZE edge")
+            connection.driver_connection.autocommit = False
+
+            results[strategy] = {}
+            for name, sql in QUERIES.items():
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    cursor.execute(sql, parameters[name])
+                    cursor.fetchall()
+                    timings.append((time.perf_counter() - started) * 1000)
+                cursor.execute(
+                    "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, parameters[name]
+                )
+                plan = cursor.fetchone()[0][0]["Plan"]
+                results[strategy][name] = {
+                    "ms": round(statistics.median(timings), 2),
+                    "buffers": plan.get("Shared Hit Blocks", 0)
+                    + plan.get("Shared Read Blocks", 0),
+                    "scans": sorted(set(_scans(plan))),
+                }
+            connection.rollback()
+    finally:
+        connection.rollback()
+        cursor = connection.cursor()
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        # The connection goes back to the pool.
+        cursor.execute("RESET search_path")
+        connection.commit()
+        connection.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--degree", type=int, default=3, help="Out edges per node.")
+    parser.add_argument("--relations", type=int, default=3)
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=50,
+        help="Edges go to one of the next `window` nodes, deeper graphs when small.",
+    )
+    parser.add_argument("--probes", type=int, default=20, help="Nodes per query.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Only the report is written to stdout.
+    engine.echo = False
+    results = run(
+        args.nodes, args.degree, args.relations, args.window, args.probes, args.repeat
+    )
+    for name in QUERIES:
+        print(name)
+        for strategy, queries in results.items():
+            print(f"  {strategy:<16} {json.dumps(queries[name])}")
@@ -0,0 +1,229 @@
+"""Checks node_closure against the reachability recomputed from public.edge.
+
+The edges are read in a read-only repeatable read transaction whose snapshot is
+exported to the workers, so every process compares against the same state of
+the tables without blocking writers. A full check recomputes every closure per
+weakly connected component like the rebuild does; a sampled check only walks
+the graph from `--sample` random ancestors. The discrepancies are printed as
+JSON, and `--repair` applies a rebuild when there are any. Run it with:
+
+    PYTHONPATH=. python -m graph_db.check_closure [--sample 1000] [--repair]
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+
+from graph_db.rebuild_closure import (
+    CHUNK_SIZE,
+    component_chunks,
+    iter_closures,
+    rebuild,
+)
+from graph_db.session import engine
+
+# Stored rows are fetched for this many ancestors at a time.
+BATCH_SIZE = 1000
+# Discrepancies listed in the report, the counts cover all of them.
+REPORT_LIMIT = 1000
+
+_successors: dict[int, list[int]] = {}
+
+
+def _breadth_first(node: int) -> dict[int, int]:
+    closure: dict[int, int] = {}
+    queue = deque([(node, 0)])
+    while queue:
+        current, depth = queue.popleft()
+        for child in _successors.get(current, ()):
+            if child not in closure:
+                closure[child] = depth + 1
+                queue.append((child, depth + 1))
+    return closure
+
+
+def _init_worker(successors: dict[int, list[int]]) -> None:
+    global _successors
+    _successors = successors
+    # The report is written to stdout.
+    engine.echo = False
+
+
+def _batched(
+    closures: Iterable[tuple[int, dict[int, int]]], size: int
+) -> Iterator[dict[int, dict[int, int]]]:
+    batch: dict[int, dict[int, int]] = {}
+    for node, closure in closures:
+        batch[node] = closure
+        if len(batch) == size:
+            yield batch
+            batch = {}
+    if batch:
+        yield batch
+
+
+def _diff(
+    snapshot: str, closures: Iterable[tuple[int, dict[int, int]]]
+) -> tuple[int, list[dict]]:
+    """Compares the expected closures with the stored rows of their ancestors,
+    returns the number of ancestors checked and the discrepancies."""
+    checked = 0
+    discrepancies: list[dict] = []
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+        for batch in _batched(closures, BATCH_SIZE):
+            cursor.execute(
+                """
+                SELECT ancestor_id, descendant_id, min_depth FROM public.node_closure
+                WHERE ancestor_id = ANY(%s)
+                """,
+                (list(batch),),
+            )
+            stored: dict[int, dict[int, int]] = defaultdict(dict)
+            for ancestor, descendant, depth in cursor:
+                stored[ancestor][descendant] = depth
+            for ancestor, expected in batch.items():
+                actual = stored.get(ancestor, {})
+                for descendant in expected.keys() | actual.keys():
+                    if expected.get(descendant) != actual.get(descendant):
+                        discrepancies.append(
+                            {
+                                "ancestor_id": ancestor,
+                                "descendant_id": descendant,
+                                "expected": expected.get(descendant),
+                                "stored": actual.get(descendant),
+                            }
+                        )
+            checked += len(batch)
+        connection.rollback()
+    finally:
+        connection.close()
+    return checked, discrepancies
+
+
+def check_chunk(snapshot: str, edges: list[tuple[int, int]]) -> tuple[int, list[dict]]:
+    return _diff(snapshot, iter_closures(edges))
+
+
+def check_sample(snapshot: str, nodes: list[int]) -> tuple[int, list[dict]]:
+    return _diff(snapshot, ((node, _breadth_first(node)) for node in nodes))
+
+
+def check(
+    sample: int | None = None,
+    processes: int | None = None,
+    seed: int | None = None,
+) -> dict:
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cursor.execute("SELECT pg_export_snapshot()")
+        snapshot = cursor.fetchone()[0]
+        cursor.execute("SELECT DISTINCT source_id, target_id FROM public.edge")
+        edges = cursor.fetchall()
+        # Writes in async closure mode are only reflected once drained.
+        cursor.execute("SELECT count(*) FROM public.closure_queue")
+        pending = cursor.fetchone()[0]
+
+        discrepancies: list[dict] = []
+        successors: dict[int, list[int]] = defaultdict(list)
+        if sample is None:
+            # Ancestors outside of every edge are not seen by any chunk.
+            cursor.execute(
+                """
+                SELECT ancestor_id, descendant_id, min_depth FROM public.node_closure
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM public.edge WHERE edge.source_id = node_closure.ancestor_id
+                ) AND NOT EXISTS (
+                    SELECT 1 FROM public.edge WHERE edge.target_id = node_closure.ancestor_id
+                )
+                """
+            )
+            discrepancies.extend(
+                {
+                    "ancestor_id": ancestor,
+                    "descendant_id": descendant,
+                    "expected": None,
+                    "stored": depth,
+                }
+                for ancestor, descendant, depth in cursor
+            )
+            tasks = component_chunks(edges, CHUNK_SIZE)
+            worker = check_chunk
+        else:
+            for source, target in edges:
+                successors[source].append(target)
+            nodes = random.Random(seed).sample(
+                sorted(successors), min(sample, len(successors))
+            )
+            processes = processes or multiprocessing.cpu_count()
+            tasks = [
+                nodes[i::processes] for i in range(processes) if nodes[i::processes]
+            ]
+            worker = check_sample
+
+        # The exported snapshot stays importable while this transaction is open.
+        spawn = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            processes,
+            mp_context=spawn,
+            initializer=_init_worker,
+            initargs=(dict(successors),),
+        ) as pool:
+            results = list(pool.map(worker, [snapshot] * len(tasks), tasks))
+        connection.rollback()
+    finally:
+        connection.close()
+
+    checked = sum(result[0] for result in results)
+    for result in results:
+        discrepancies.extend(result[1])
+    return {
+        "mode": "full" if sample is None else "sample",
+        "edges": len(edges),
+        "ancestors_checked": checked,
+        "pending_queue": pending,
+        "missing": sum(item["stored"] is None for item in discrepancies),
+        "extra": sum(item["expected"] is None for item in discrepancies),
+        "wrong_depth": sum(
+            None not in (item["expected"], item["stored"]) for item in discrepancies
+        ),
+        "discrepancies": discrepancies,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sample", type=int, default=None, help="Check this many random ancestors."
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--processes", type=int, default=None, help="Defaults to the CPU count."
+    )
+    parser.add_argument("--limit", type=int, default=REPORT_LIMIT)
+    parser.add_argument(
+        "--repair",
+        action="store_true",
+        help="Rebuild node_closure when discrepancies are found.",
+    )
+    args = parser.parse_args()
+    engine.echo = False
+
+    report = check(args.sample, args.processes, args.seed)
+    report["discrepancies"] = report["discrepancies"][: args.limit]
+    drifted = report["missing"] or report["extra"] or report["wrong_depth"]
+    if args.repair and drifted:
+        report["repair"] = rebuild(args.processes)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    sys.exit(1 if drifted else 0)
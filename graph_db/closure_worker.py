@@ -0,0 +1,72 @@
+"""Background maintainer of the unit trees for writes in async closure mode.
+
+Writers opt in with `closure_mode(CLOSURE_MODE_ASYNC)`; their edge writes only
+enqueue the touched nodes into `closure_queue` and notify this worker, which
+recomputes the affected units in batches. Run it with:
+
+    PYTHONPATH=. python -m graph_db.closure_worker
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from graph_db.session import async_engine
+
+CHANNEL = "closure_queue"
+BATCH_SIZE = 1000
+# Notifications are not delivered while the listener reconnects, so the queue
+# is also polled.
+POLL_INTERVAL = 5.0
+
+
+async def process_batch(engine: AsyncEngine, batch_size: int = BATCH_SIZE) -> int:
+    """Applies the oldest queued writes in one transaction, returns their count."""
+    async with engine.begin() as connection:
+        sql = text("SELECT process_closure_queue(:batch_size)")
+        return (await connection.execute(sql, {"batch_size": batch_size})).scalar_one()
+
+
+async def drain(engine: AsyncEngine, batch_size: int = BATCH_SIZE) -> int:
+    processed = 0
+    while count := await process_batch(engine, batch_size):
+        processed += count
+    return processed
+
+
+async def run(
+    engine: AsyncEngine = async_engine,
+    batch_size: int = BATCH_SIZE,
+    poll_interval: float = POLL_INTERVAL,
+) -> None:
+    notified = asyncio.Event()
+    async with engine.connect() as listener:
+        raw_connection = await listener.get_raw_connection()
+        await raw_connection.driver_connection.add_listener(
+            CHANNEL, lambda *args: notified.set()
+        )
+        while True:
+            # Cleared before draining, so a write committed meanwhile wakes us up.
+            notified.clear()
+            await drain(engine, batch_size)
+            try:
+                await asyncio.wait_for(notified.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    parser.add_argument(
+        "--once", action="store_true", help="Drain the queue once and exit."
+    )
+    args = parser.parse_args()
+
+    if args.once:
+        asyncio.run(drain(async_engine, args.batch_size))
+    else:
+        asyncio.run(run(async_engine, args.batch_size, args.poll_interval))
@@ -0,0 +1,218 @@
+"""Computes the embodied footprint of every unit with one sparse solve.
+
+Input-output (Leontief) model of the whole network: the total value of a unit is
+its direct value plus the totals of its suppliers weighted by the quantities it
+uses of them, x = d + A x. The direct values d are the numeric document values
+at each metric path summed per unit, A[s, t] is the `quantity` of the edge s -> t
+(1 when unset, parallel edges add up). (I - A) is factorized once and solved for
+all the metrics, then the rows of these metrics in unit_footprint are replaced
+in one transaction. Run it with:
+
+    PYTHONPATH=. python -m graph_db.footprint emissions.co2 energy.kwh
+"""
+
+import argparse
+import io
+import time
+
+import numpy as np
+from scipy.sparse import csc_matrix, csr_matrix, identity
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import splu
+
+from graph_db.session import engine
+
+
+def technical_coefficients(
+    node_ids: np.ndarray,
+    sources: np.ndarray,
+    targets: np.ndarray,
+    quantities: np.ndarray,
+) -> csc_matrix:
+    """A[s, t] indexed like the sorted `node_ids`."""
+    size = len(node_ids)
+    return csc_matrix(
+        (
+            quantities,
+            (np.searchsorted(node_ids, sources), np.searchsorted(node_ids, targets)),
+        ),
+        shape=(size, size),
+    )
+
+
+def spectral_radius_below_one(
+    coefficients: csc_matrix, tolerance: float = 1e-9, max_iterations: int = 1000
+) -> bool:
+    """Whether the spectral radius of |A| is below 1, so x = d + A x converges.
+
+    The radius of A is the largest radius of its strongly connected components,
+    the nodes of no cycle adding nothing. Each component is bounded by a power
+    iteration on I + |A|, which also converges on periodic cycles, with the
+    Collatz-Wielandt bounds min (Bx)_i / x_i <= 1 + radius <= max (Bx)_i / x_i.
+    Radii within `tolerance` of 1, or not decided in `max_iterations`, count as
+    diverging.
+    """
+    magnitudes = abs(coefficients).tocoo()
+    count, labels = connected_components(magnitudes, connection="strong")
+    inside = labels[magnitudes.row] == labels[magnitudes.col]
+    size = coefficients.shape[0]
+    shifted = identity(size, format="csr") + csr_matrix(
+        (magnitudes.data[inside], (magnitudes.row[inside], magnitudes.col[inside])),
+        shape=(size, size),
+    )
+
+    undecided = np.ones(count, bool)
+    vector = np.ones(size)
+    for _ in range(max_iterations):
+        product = shifted @ vector
+        ratios = product / vector
+        lower = np.full(count, np.inf)
+        upper = np.zeros(count)
+        np.minimum.at(lower, labels, ratios)
+        np.maximum.at(upper, labels, ratios)
+        if (undecided & (lower - 1 >= 1 - tolerance)).any():
+            return False
+        undecided &= upper - 1 >= 1 - tolerance
+        if not undecided.any():
+            return True
+        # Normalized per component, the ratios of each are unchanged.
+        vector = product / upper[labels]
+    return False
+
+
+def solve_totals(coefficients: csc_matrix, direct: np.ndarray) -> np.ndarray:
+    """Solves (I - A) x = d for every column of `direct`."""
+    if coefficients.shape[0] == 0:
+        return np.zeros_like(direct)
+    if not spectral_radius_below_one(coefficients):
+        raise ValueError(
+            "The quantities of a supply cycle don't converge, "
+            "their product along the cycle must be below 1."
+        )
+    factors = splu((identity(coefficients.shape[0]) - coefficients).tocsc())
+    totals = factors.solve(direct)
+    if not np.isfinite(totals).all():
+        raise ValueError("The footprints don't converge.")
+    return totals
+
+
+def _metric_path(metric_path: str) -> list[str]:
+    path = metric_path.split(".")
+    if not all(path):
+        raise ValueError('Metric paths are dot separated keys, like "emissions.co2".')
+    return path
+
+
+def compute(metric_paths: list[str], dry_run: bool = False) -> dict[str, int]:
+    paths = [_metric_path(metric_path) for metric_path in metric_paths]
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        # Edges and documents from the same snapshot.
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute(
+            """
+            SELECT source_id, target_id, COALESCE(quantity, 1) FROM public.edge
+            """
+        )
+        edges = np.array(cursor.fetchall(), np.float64).reshape(-1, 3)
+        cursor.execute("SELECT id, node_id FROM public.unit ORDER BY id")
+        units = np.array(cursor.fetchall(), np.int64).reshape(-1, 2)
+
+        sources, targets = edges[:, 0].astype(np.int64), edges[:, 1].astype(np.int64)
+        node_ids = np.unique(np.concatenate([sources, targets, units[:, 1]]))
+        coefficients = technical_coefficients(node_ids, sources, targets, edges[:, 2])
+
+        direct = np.zeros((len(node_ids), len(paths)))
+        unit_rows = np.searchsorted(node_ids, units[:, 1])
+        for column, path in enumerate(paths):
+            cursor.execute(
+                """
+                SELECT unit_id, SUM((content #> %(path)s)::TEXT::NUMERIC)
+                FROM public.document
+                WHERE jsonb_typeof(content #> %(path)s) = 'number'
+                GROUP BY unit_id
+                """,
+                {"path": path},
+            )
+            values = np.array(cursor.fetchall(), np.float64).reshape(-1, 2)
+            rows = unit_rows[
+                np.searchsorted(units[:, 0], values[:, 0].astype(np.int64))
+            ]
+            direct[rows, column] = values[:, 1]
+
+        totals = solve_totals(coefficients, direct)
+
+        lines = io.StringIO()
+        for column, metric_path in enumerate(metric_paths):
+            for unit_id, unit_direct, unit_total in zip(
+                units[:, 0].tolist(),
+                direct[unit_rows, column].tolist(),
+                totals[unit_rows, column].tolist(),
+            ):
+                lines.write(
+                    f"{unit_id}\t{metric_path}\t{unit_direct!r}\t{unit_total!r}\n"
+                )
+        lines.seek(0)
+        cursor.execute(
+            """
+            CREATE TEMPORARY TABLE unit_footprint_solve (
+                unit_id INTEGER NOT NULL,
+                metric_path VARCHAR NOT NULL,
+                direct DOUBLE PRECISION NOT NULL,
+                total DOUBLE PRECISION NOT NULL
+            ) ON COMMIT DROP
+            """
+        )
+        cursor.copy_expert(
+            "COPY unit_footprint_solve (unit_id, metric_path, direct, total) FROM STDIN",
+            lines,
+        )
+        cursor.execute(
+            "DELETE FROM public.unit_footprint WHERE metric_path = ANY(%s)",
+            (metric_paths,),
+        )
+        cursor.execute(
+            """
+            INSERT INTO public.unit_footprint (unit_id, metric_path, direct, total)
+            SELECT unit_id, metric_path, direct, total FROM unit_footprint_solve
+            """
+        )
+        written = cursor.rowcount
+
+        if dry_run:
+            connection.rollback()
+        else:
+            connection.commit()
+    finally:
+        connection.close()
+
+    return {
+        "edges": len(edges),
+        "units": len(units),
+        "metrics": len(metric_paths),
+        "written": written,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "metric_paths",
+        nargs="+",
+        metavar="metric_path",
+        help='Dot separated keys of the document contents, like "emissions.co2".',
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Solve and write the footprints, then roll back.",
+    )
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    stats = compute(args.metric_paths, args.dry_run)
+    print(
+        ", ".join(f"{key}={value}" for key, value in stats.items()),
+        f"in {time.monotonic() - started:.1f}s",
+    )
@@ -1,8 +1,21 @@
 from graph_db.models.base import Base, EntityBase
-from sqlalchemy import Column, Integer, ForeignKey, String, UniqueConstraint
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Float,
+    Integer,
+    ForeignKey,
+    Index,
+    PrimaryKeyConstraint,
+    SmallInteger,
+    String,
+    Table,
+    UniqueConstraint,
+    text,
+)
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
-from sqlalchemy import event, DDL
 from sqlalchemy.dialects.postgresql import ARRAY
 
 
@@ -10,6 +23,8 @@ class Label(Base):
     __tablename__ = "label"
     __table_args__ = {"schema": "public"}
 
+    # Referenced by every node, resolved to names by graph_api/graphql/names.py.
+    id = Column(SmallInteger, primary_key=True)
     name = Column(String, unique=True, nullable=False)
 
     nodes = relationship("Node", back_populates="node_label")
@@ -19,17 +34,30 @@ class Relation(Base):
     __tablename__ = "relation"
     __table_args__ = {"schema": "public"}
 
+    # Referenced by every edge, resolved to names by graph_api/graphql/names.py.
+    id = Column(SmallInteger, primary_key=True)
     name = Column(String, unique=True, nullable=False)
+    # Whether its reachability is kept in relation_closure.
+    materialized = Column(Boolean, nullable=False, server_default="false")
 
     edges = relationship("Edge", back_populates="edge_relation")
 
 
 class Node(Base):
     __tablename__ = "node"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        Index(
+            "ix_public_node_scc_id",
+            "scc_id",
+            postgresql_where=text("scc_id IS NOT NULL"),
+        ),
+        {"schema": "public"},
+    )
 
-    label = Column(String, ForeignKey(Label.name), nullable=False)
+    label_id = Column(SmallInteger, ForeignKey(Label.id), nullable=False)
     properties = Column(JSONB, nullable=False, default=dict)
+    # Least node id of the strongly connected component, NULL if on no cycle.
+    scc_id = Column(Integer, nullable=True)
 
     node_label = relationship("Label", back_populates="nodes")
 
@@ -66,13 +94,20 @@ class Node(Base):
     units = relationship("Unit", back_populates="node", cascade="all, delete-orphan")
 
     def as_dict(self):
-        return {"id": self.id, "label": self.label, "properties": self.properties}
+        return {
+            "id": self.id,
+            "label_id": self.label_id,
+            "properties": self.properties,
+        }
 
 
 # TODO: add tenant_id = Column(String(64), nullable=False, index=True)
 class Unit(EntityBase):
     __tablename__ = "unit"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        Index("ix_public_unit_name_id", "name", "id"),
+        {"schema": "public"},
+    )
 
     node_id = Column(
         Integer,
@@ -80,8 +115,8 @@ class Unit(EntityBase):
         index=True,
         nullable=False,
     )
-    ancestors = Column(ARRAY(Integer), nullable=False, default=list, index=True)
-    descendants = Column(ARRAY(Integer), nullable=False, default=list, index=True)
+    # Last closure_queue id applied to the trees by graph_db/closure_worker.py.
+    closure_version = Column(BigInteger, nullable=False, server_default="0")
 
     # TODO: regenerate alembic
     node = relationship(
@@ -102,14 +137,16 @@ class Unit(EntityBase):
             "node_id": self.node_id,
             "name": self.name,
             "description": self.description,
-            "ancestors": self.ancestors,
-            "descendants": self.descendants,
+            "closure_version": self.closure_version,
         }
 
 
 class Document(EntityBase):
     __tablename__ = "document"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        Index("ix_public_document_name_id", "name", "id"),
+        {"schema": "public"},
+    )
     unit_id = Column(
         Integer, ForeignKey(Unit.id, ondelete="CASCADE"), index=True, nullable=False
     )
@@ -134,7 +171,14 @@ class Document(EntityBase):
 class Edge(Base):
     __tablename__ = "edge"
     __table_args__ = (
-        UniqueConstraint("source_id", "target_id", "relation", name="uq_edge"),
+        UniqueConstraint("source_id", "target_id", "relation_id", name="uq_edge"),
+        Index("ix_public_edge_source_id_target_id_id", "source_id", "target_id", "id"),
+        Index(
+            "ix_public_edge_target_id_relation_id_source_id",
+            "target_id",
+            "relation_id",
+            "source_id",
+        ),
         {
             "schema": "public",
         },
@@ -143,13 +187,10 @@ class Edge(Base):
     # TODO: rename to from_id, to_id
     source_id = Column(Integer, ForeignKey(Node.id, ondelete="CASCADE"), nullable=False)
     target_id = Column(Integer, ForeignKey(Node.id, ondelete="CASCADE"), nullable=False)
-    relation = Column(
-        String,
-        ForeignKey(Relation.name),
-        nullable=False,
-        default="links",
-        server_default="links",
-    )
+    # Defaults to the id of "links".
+    relation_id = Column(SmallInteger, ForeignKey(Relation.id), nullable=False)
+    # Units of the target used per unit of the source, read by graph_db/footprint.py.
+    quantity = Column(Float, nullable=True)
 
     edge_relation = relationship("Relation", back_populates="edges")
     source_node = relationship(
@@ -164,145 +205,111 @@ class Edge(Base):
             "id": self.id,
             "source_id": self.source_id,
             "target_id": self.target_id,
-            "relation": self.relation,
+            "relation_id": self.relation_id,
+            "quantity": self.quantity,
         }
 
 
-class User(Base):
-    __tablename__ = "user"
-    __table_args__ = (
-        {
-            "schema": "public",
-        },
-    )
-    name = Column(String, nullable=False, unique=True)
-    nodes = Column(ARRAY(Integer), nullable=False, default=list, index=True)
+# Every (ancestor, descendant) pair of nodes with the length of the shortest path,
+# maintained by the edge triggers. Nodes on a cycle are their own ancestor.
+node_closure = Table(
+    "node_closure",
+    Base.metadata,
+    Column("ancestor_id", Integer, nullable=False),
+    Column("descendant_id", Integer, nullable=False),
+    Column("min_depth", Integer, nullable=False),
+    PrimaryKeyConstraint(
+        "ancestor_id", "descendant_id", postgresql_include=["min_depth"]
+    ),
+    Index(
+        "ix_public_node_closure_descendant_id_ancestor_id",
+        "descendant_id",
+        "ancestor_id",
+        postgresql_include=["min_depth"],
+    ),
+    schema="public",
+)
 
 
-# ============================================================================
-# TRIGGER: Update unit ancestors/descendants when unit is upserted
-# ============================================================================
-
-update_unit_tree_on_upsert_function = DDL(
-    """
-    CREATE OR REPLACE FUNCTION update_unit_tree_on_upsert() RETURNS TRIGGER AS $$
-        DECLARE
-            ancestors_arr INTEGER[];
-            descendants_arr INTEGER[];
-        BEGIN
-            WITH RECURSIVE ancestors(id) AS (
-                SELECT edge.source_id AS id FROM edge WHERE edge.target_id = NEW.node_id
-                UNION ALL
-                SELECT edge.source_id AS id FROM ancestors
-                    JOIN edge ON ancestors.id = edge.target_id
-                -- WHERE NOT EXISTS (SELECT 1 FROM ancestors WHERE id = e.source_id)
-                -- Do not specify 'SEARCH' method in case of depth first
-                -- SEARCH BREADTH FIRST BY id SET ordercol
-            ) SEARCH DEPTH FIRST BY id SET order_col CYCLE id SET is_cycle USING path
-            SELECT ARRAY_AGG(DISTINCT id) INTO ancestors_arr FROM ancestors;
-            
-            WITH RECURSIVE descendants(id) AS (
-                SELECT edge.target_id AS id FROM edge WHERE edge.source_id = NEW.node_id
-                UNION ALL
-                SELECT edge.target_id AS id FROM descendants
-                    JOIN edge ON descendants.id = edge.source_id
-            ) SEARCH DEPTH FIRST BY id SET order_col CYCLE id SET is_cycle USING path
-            SELECT ARRAY_AGG(DISTINCT id) INTO descendants_arr FROM descendants;
-
-            NEW.ancestors := COALESCE(ancestors_arr, ARRAY[]::INTEGER[]);
-            NEW.descendants := COALESCE(descendants_arr, ARRAY[]::INTEGER[]);
-
-            RETURN NEW;
-        END;
-    $$ LANGUAGE plpgsql;
-    """
+# node_closure restricted to the edges of each materialized relation.
+relation_closure = Table(
+    "relation_closure",
+    Base.metadata,
+    Column(
+        "relation_id",
+        SmallInteger,
+        ForeignKey(Relation.id, ondelete="CASCADE"),
+        nullable=False,
+    ),
+    Column("ancestor_id", Integer, nullable=False),
+    Column("descendant_id", Integer, nullable=False),
+    Column("min_depth", Integer, nullable=False),
+    PrimaryKeyConstraint(
+        "relation_id",
+        "ancestor_id",
+        "descendant_id",
+        postgresql_include=["min_depth"],
+    ),
+    Index(
+        "ix_public_relation_closure_relation_id_descendant_id",
+        "relation_id",
+        "descendant_id",
+        "ancestor_id",
+        postgresql_include=["min_depth"],
+    ),
+    schema="public",
 )
 
 
-# TODO: delete this trigger
-update_unit_tree_on_upsert_trigger = DDL(
-    """
-    CREATE OR REPLACE TRIGGER update_unit_tree_on_upsert
-    AFTER INSERT OR UPDATE ON public.unit
-    FOR EACH ROW
-    EXECUTE FUNCTION update_unit_tree_on_upsert();
-    """
-)
+class ClosureQueue(Base):
+    """Edge endpoints written in async closure mode, see graph_db/closure_worker.py."""
 
-event.listen(
-    Unit.__table__,
-    "after_create",
-    update_unit_tree_on_upsert_function.execute_if(dialect="postgresql"),
-)
+    __tablename__ = "closure_queue"
+    __table_args__ = {"schema": "public"}
 
-event.listen(
-    Unit.__table__,
-    "after_create",
-    update_unit_tree_on_upsert_trigger.execute_if(dialect="postgresql"),
-)
+    id = Column(BigInteger, primary_key=True)
+    node_id = Column(Integer, nullable=False)
+    is_source = Column(Boolean, nullable=False)
 
-update_unit_tree_on_edge_upsert_function = DDL(
-    """
-    CREATE OR REPLACE FUNCTION update_unit_tree_on_edge_upsert() RETURNS AS $$
-        BEGIN
-            UPDATE unit
-            SET
-                ancestors = COALESCE(
-                    (
-                        WITH RECURSIVE ancestors(id) AS (
-                            SELECT edge.source_id AS id FROM edge WHERE edge.target_id = unit.node_id
-                            UNION ALL
-                            SELECT edge.source_id AS id FROM ancestors
-                                JOIN edge ON ancestors.id = edge.target_id
-                        ) SEARCH DEPTH FIRST BY id SET order_col CYCLE id SET is_cycle USING path
-                        SELECT ARRAY_AGG(DISTINCT id) FROM ancestors
-                    ),
-                    ARRAY[]::INTEGER[]
-                ),
-                descendants = COALESCE(
-                    (
-                        WITH RECURSIVE descendants(id) AS (
-                            SELECT edge.target_id AS id FROM edge WHERE edge.source_id = unit.node_id
-                            UNION ALL
-                            SELECT edge.target_id AS id FROM descendants
-                                JOIN edge ON descendants.id = edge.source_id
-                        ) SEARCH DEPTH FIRST BY id SET order_col CYCLE id SET is_cycle USING PATH
-                        SELECT ARRAY_AGG(DISTINCT id) FROM descendants
-                    ),
-                    ARRAY[]::INTEGER[]
-                )
-                WHERE unit.node_id IN (NEW.source_id, NEW.target_id)
-                    OR NEW.source_id = ANY(unit.ancestors)
-                    OR NEW.target_id = ANY(unit.descendants);
-    
-            RETURN NEW;
-        END;
-    $$ LANGUAGE plpgsql
-    """
-)
 
-update_unit_tree_on_edge_upsert_trigger = DDL(
-    """
-    CREATE OR REPLACE TRIGGER update_unit_tree_on_edge_upsert
-    AFTER INSERT OR UPDATE ON public.edge
-    FOR EACH ROW
-    EXECUTE FUNCTION update_unit_tree_on_edge_upsert();
-    """
-)
+class UnitFootprint(Base):
+    """Embodied values of the units, written by graph_db/footprint.py."""
 
+    __tablename__ = "unit_footprint"
+    __table_args__ = (
+        UniqueConstraint("unit_id", "metric_path", name="uq_unit_footprint"),
+        {"schema": "public"},
+    )
 
-event.listen(
-    Edge.__table__,
-    "after_create",
-    update_unit_tree_on_edge_upsert_function.execute_if(dialect="postgresql"),
-)
+    unit_id = Column(Integer, ForeignKey(Unit.id, ondelete="CASCADE"), nullable=False)
+    metric_path = Column(String, nullable=False)
+    direct = Column(Float, nullable=False)
+    total = Column(Float, nullable=False)
 
-event.listen(
-    Edge.__table__,
-    "after_create",
-    update_unit_tree_on_edge_upsert_trigger.execute_if(dialect="postgresql"),
-)
 
-# ============================================================================
-# TRIGGER: Update unit ancestors/descendants when unit is upserted
-# ============================================================================
+class UnitRollup(Base):
+    """Supply chain aggregates of every unit, written by the rollupAll mutation."""
+
+    __tablename__ = "unit_rollup"
+    __table_args__ = (
+        UniqueConstraint("unit_id", "metric_path", name="uq_unit_rollup"),
+        {"schema": "public"},
+    )
+
+    unit_id = Column(Integer, ForeignKey(Unit.id, ondelete="CASCADE"), nullable=False)
+    metric_path = Column(String, nullable=False)
+    total = Column(Float, nullable=True)
+    count = Column(Integer, nullable=False)
+    minimum = Column(Float, nullable=True)
+    maximum = Column(Float, nullable=True)
+
+
+class User(Base):
+    __tablename__ = "user"
+    __table_args__ = (
+        {
+            "schema": "public",
+        },
+    )
+    name = Column(String, nullable=False, unique=True)
+    nodes = Column(ARRAY(Integer), nullable=False, default=list, index=True)
@@ -0,0 +1,323 @@
+"""Rebuilds node_closure from public.edge in one pass.
+
+The edges are read once and split into weakly connected components, which are
+processed in parallel. Within a component the cycles are condensed into
+strongly connected components (Tarjan), which come out sinks first, so every
+closure is built from the already finished closures of its successors. The
+pairs are written back with COPY and applied as a diff in the same transaction,
+so only stale rows are touched. Run it with:
+
+    PYTHONPATH=. python -m graph_db.rebuild_closure
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+
+from graph_db.session import engine
+
+# Components are grouped into chunks of about this many edges per task, so tiny
+# components don't each pay for a round-trip to the pool.
+CHUNK_SIZE = 50_000
+
+
+def weakly_connected_components(edges: Iterable[tuple[int, int]]) -> list[list[int]]:
+    parent: dict[int, int] = {}
+
+    def find(node: int) -> int:
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    for source, target in edges:
+        parent.setdefault(source, source)
+        parent.setdefault(target, target)
+        source_root, target_root = find(source), find(target)
+        if source_root != target_root:
+            parent[source_root] = target_root
+
+    components: dict[int, list[int]] = defaultdict(list)
+    for node in parent:
+        components[find(node)].append(node)
+    return list(components.values())
+
+
+def strongly_connected_components(
+    successors: dict[int, list[int]],
+) -> list[list[int]]:
+    """Iterative Tarjan, the components come out in reverse topological order."""
+    index: dict[int, int] = {}
+    low: dict[int, int] = {}
+    on_stack: set[int] = set()
+    stack: list[int] = []
+    components: list[list[int]] = []
+
+    for root in successors:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors[root]))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors.get(child, ()))))
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+def _distances_within(
+    start: int, members: set[int], successors: dict[int, list[int]]
+) -> dict[int, int]:
+    """Shortest distances from `start` to the members of its component, 0 for
+    itself unless it lies on a cycle."""
+    distances: dict[int, int] = {}
+    queue = deque([(start, 0)])
+    while queue:
+        node, depth = queue.popleft()
+        for child in successors.get(node, ()):
+            if child in members and child not in distances:
+                distances[child] = depth + 1
+                queue.append((child, depth + 1))
+    return distances
+
+
+def iter_closures(
+    edges: Iterable[tuple[int, int]],
+) -> Iterator[tuple[int, dict[int, int]]]:
+    """Yields each node of the subgraph with the min depth of its descendants."""
+    successors: dict[int, list[int]] = defaultdict(list)
+    for source, target in set(edges):
+        successors[source].append(target)
+        successors.setdefault(target, [])
+
+    components = strongly_connected_components(successors)
+    component_of = {
+        node: number for number, members in enumerate(components) for node in members
+    }
+
+    # A closure is dropped once every edge entering it from another component
+    # has been used, so memory follows the frontier rather than the whole graph.
+    readers: dict[int, int] = defaultdict(int)
+    for source, targets in successors.items():
+        for target in targets:
+            if component_of[source] != component_of[target]:
+                readers[target] += 1
+
+    closures: dict[int, dict[int, int]] = {}
+    for number, members in enumerate(components):
+        member_set = set(members)
+        exits = [
+            (source, target)
+            for source in members
+            for target in successors[source]
+            if component_of[target] != number
+        ]
+        for node in members:
+            closure = _distances_within(node, member_set, successors)
+            # Shortest offset to enter each successor component's node.
+            offsets: dict[int, int] = {}
+            for source, target in exits:
+                offset = (0 if source == node else closure[source]) + 1
+                if offset < offsets.get(target, offset + 1):
+                    offsets[target] = offset
+            for target, offset in sorted(offsets.items(), key=lambda item: item[1]):
+                if offset < closure.get(target, offset + 1):
+                    closure[target] = offset
+                for descendant, depth in closures[target].items():
+                    if offset + depth < closure.get(descendant, offset + depth + 1):
+                        closure[descendant] = offset + depth
+            closures[node] = closure
+            yield node, closure
+
+        for source, target in exits:
+            readers[target] -= 1
+            if readers[target] == 0:
+                del closures[target]
+        for node in members:
+            if readers[node] == 0:
+                closures.pop(node, None)
+
+
+def build_closure(edges: list[tuple[int, int]], path: str) -> int:
+    """Writes the (ancestor, descendant, min depth) rows of the subgraph to `path`
+    in COPY text format and returns their count."""
+    rows = 0
+    with open(path, "w") as file:
+        for node, closure in iter_closures(edges):
+            file.writelines(
+                f"{node}\t{descendant}\t{depth}\n"
+                for descendant, depth in closure.items()
+            )
+            rows += len(closure)
+    return rows
+
+
+def component_chunks(
+    edges: list[tuple[int, int]], chunk_size: int
+) -> list[list[tuple[int, int]]]:
+    edges_by_root: dict[int, list[tuple[int, int]]] = defaultdict(list)
+    component_of = {
+        node: number
+        for number, members in enumerate(weakly_connected_components(edges))
+        for node in members
+    }
+    for edge in edges:
+        edges_by_root[component_of[edge[0]]].append(edge)
+
+    chunks: list[list[tuple[int, int]]] = [[]]
+    for component_edges in sorted(edges_by_root.values(), key=len, reverse=True):
+        if chunks[-1] and len(chunks[-1]) + len(component_edges) > chunk_size:
+            chunks.append([])
+        chunks[-1].extend(component_edges)
+    return [chunk for chunk in chunks if chunk]
+
+
+def rebuild(processes: int | None = None, dry_run: bool = False) -> dict[str, int]:
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        # Edge writes wait for the rebuild instead of being lost by it, and the
+        # async worker can't apply an older batch on top of it.
+        cursor.execute("LOCK TABLE public.edge IN SHARE MODE")
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext('closure_queue'))")
+        cursor.execute("SELECT DISTINCT source_id, target_id FROM public.edge")
+        edges = cursor.fetchall()
+
+        with tempfile.TemporaryDirectory() as directory:
+            chunks = component_chunks(edges, CHUNK_SIZE)
+            paths = [os.path.join(directory, f"{i}.tsv") for i in range(len(chunks))]
+            # Forked workers would share the socket of the open connection.
+            spawn = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(processes, mp_context=spawn) as pool:
+                rows = sum(pool.map(build_closure, chunks, paths))
+
+            cursor.execute(
+                """
+                CREATE TEMPORARY TABLE node_closure_rebuild (
+                    ancestor_id INTEGER NOT NULL,
+                    descendant_id INTEGER NOT NULL,
+                    min_depth INTEGER NOT NULL
+                ) ON COMMIT DROP
+                """
+            )
+            for path in paths:
+                with open(path) as file:
+                    cursor.copy_expert(
+                        "COPY node_closure_rebuild (ancestor_id, descendant_id, min_depth) FROM STDIN",
+                        file,
+                    )
+
+        cursor.execute(
+            "ALTER TABLE node_closure_rebuild ADD PRIMARY KEY (ancestor_id, descendant_id)"
+        )
+        cursor.execute("ANALYZE node_closure_rebuild")
+        cursor.execute(
+            """
+            DELETE FROM public.node_closure
+            WHERE NOT EXISTS (
+                SELECT 1 FROM node_closure_rebuild
+                WHERE node_closure_rebuild.ancestor_id = node_closure.ancestor_id
+                    AND node_closure_rebuild.descendant_id = node_closure.descendant_id
+            )
+            """
+        )
+        deleted = cursor.rowcount
+        cursor.execute(
+            """
+            INSERT INTO public.node_closure (ancestor_id, descendant_id, min_depth)
+            SELECT ancestor_id, descendant_id, min_depth FROM node_closure_rebuild
+            ON CONFLICT (ancestor_id, descendant_id) DO UPDATE
+            SET min_depth = EXCLUDED.min_depth
+            WHERE node_closure.min_depth <> EXCLUDED.min_depth
+            """
+        )
+        upserted = cursor.rowcount
+        # Nodes reaching each other share the least of their ids as scc_id.
+        cursor.execute(
+            """
+            UPDATE public.node SET scc_id = component.scc_id
+            FROM (
+                SELECT node.id, MIN(forward.descendant_id) AS scc_id
+                FROM public.node
+                LEFT JOIN node_closure_rebuild AS forward
+                    ON forward.ancestor_id = node.id
+                    AND EXISTS (
+                        SELECT 1 FROM node_closure_rebuild AS back
+                        WHERE back.ancestor_id = forward.descendant_id
+                            AND back.descendant_id = node.id
+                    )
+                GROUP BY node.id
+            ) AS component
+            WHERE node.id = component.id
+                AND node.scc_id IS DISTINCT FROM component.scc_id
+            """
+        )
+        scc_ids = cursor.rowcount
+        # Everything queued so far is part of the rebuilt snapshot.
+        cursor.execute("DELETE FROM public.closure_queue")
+
+        if dry_run:
+            connection.rollback()
+        else:
+            connection.commit()
+    finally:
+        connection.close()
+
+    return {
+        "edges": len(edges),
+        "tasks": len(chunks),
+        "rows": rows,
+        "deleted": deleted,
+        "upserted": upserted,
+        "scc_ids": scc_ids,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--processes", type=int, default=None, help="Defaults to the CPU count."
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Compute and diff the closure, then roll back.",
+    )
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    stats = rebuild(args.processes, args.dry_run)
+    print(
+        ", ".join(f"{key}={value}" for key, value in stats.items()),
+        f"in {time.monotonic() - started:.1f}s",
+    )
@@ -1,9 +1,9 @@
-from typing import Iterator
+from typing import AsyncIterator, Iterator
 from common.config import settings
 from fastapi import Depends
 from typing_extensions import Annotated
 from sqlalchemy.orm.session import Session
-from sqlalchemy import create_engine
+from sqlalchemy import TextClause, create_engine, event, text
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -47,26 +47,66 @@ def get_db_session() -> Iterator[Session]:
 DBSession = Annotated[Session, Depends(get_db_session)]
 
 
-async def get_async_db_session():
-    # def get_async_db_session() -> Iterator[Session]:
-    # session: Session = AsyncSessionMaker()
-
-    # try:
-    #     yield session
-    # finally:
-    #     session.close()
+async def get_async_db_session() -> AsyncIterator[AsyncSession]:
+    """Yields one asynchronous session per request and closes it afterwards.
 
+    Transactions are committed explicitly by the caller; anything left
+    uncommitted when the request ends is rolled back on close.
+    """
     async with AsyncSessionMaker() as session:
-        async with session.begin():
-            try:
-                yield session
-            finally:
-                await session.close()
+        yield session
 
 
 AsyncDBSession = Annotated[AsyncSession, Depends(get_async_db_session)]
 
 
+CLOSURE_MODE_IMMEDIATE = "immediate"
+CLOSURE_MODE_DEFERRED = "deferred"
+CLOSURE_MODE_ASYNC = "async"
+
+
+def closure_mode(mode: str) -> TextClause:
+    """Statement switching the unit tree maintenance of the current transaction.
+
+    In deferred mode the edge triggers only stage the touched nodes and the unit
+    trees are recomputed once at COMMIT. In async mode they are queued for
+    graph_db/closure_worker.py instead. Set it before the first edge write.
+    """
+    return text("SELECT set_config('app.closure_mode', :mode, true)").bindparams(
+        mode=mode
+    )
+
+
+def _defer_closure_on_begin(session: Session, transaction, connection) -> None:
+    connection.execute(closure_mode(CLOSURE_MODE_DEFERRED))
+
+
+def defer_closure_maintenance(session: Session | AsyncSession) -> None:
+    """Opts every following transaction of the session into deferred mode."""
+    if isinstance(session, AsyncSession):
+        session = session.sync_session
+    if not event.contains(session, "after_begin", _defer_closure_on_begin):
+        event.listen(session, "after_begin", _defer_closure_on_begin)
+
+
+def _set_current_user_on_begin(session: Session, transaction, connection) -> None:
+    connection.execute(
+        text("SELECT set_config('app.current_user_id', :user_id, true)"),
+        {"user_id": str(session.info["current_user_id"])},
+    )
+
+
+def set_current_user(session: Session | AsyncSession, user_id: int) -> None:
+    """Sets the row level security user for every following transaction of the
+    session. The setting is transaction-local, so it never leaks into pooled
+    connections, and is applied again after each commit."""
+    if isinstance(session, AsyncSession):
+        session = session.sync_session
+    session.info["current_user_id"] = user_id
+    if not event.contains(session, "after_begin", _set_current_user_on_begin):
+        event.listen(session, "after_begin", _set_current_user_on_begin)
+
+
 # AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 # @asynccontextmanager
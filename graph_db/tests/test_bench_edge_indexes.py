@@ -0,0 +1,23 @@
+from graph_db.bench_edge_indexes import QUERIES, generate_edges, run
+
+
+def test_generate_edges_stay_within_the_window():
+    edges = generate_edges(nodes=200, degree=3, relations=3, window=5, seed=2)
+
+    assert len(set(edges)) == len(edges)
+    assert all(source < target <= source + 5 for source, target, _ in edges)
+    assert {relation for *_, relation in edges} == {1, 2, 3}
+
+
+def test_reverse_lookups_use_the_reverse_index():
+    results = run(nodes=2000, probes=5, repeat=1)
+
+    for name in ["ancestors_cte", "incoming_sources"]:
+        assert not any(
+            "Seq Scan" in scan for scan in results["both_directions"][name]["scans"]
+        )
+        assert any(
+            "target_id_relation_id_source_id" in scan
+            for scan in results["both_directions"][name]["scans"]
+        )
+    assert set(results["source_only"]) == set(QUERIES)
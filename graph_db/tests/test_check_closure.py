@@ -0,0 +1,129 @@
+import pytest
+
+from graph_db.check_closure import _diff, check
+from graph_db.session import engine
+
+
+@pytest.fixture
+def chain():
+    """Nodes a -> b -> c, the raw connection and the node ids."""
+    connection = engine.raw_connection()
+    cursor = connection.cursor()
+    # Units like add_unit creates them, the node and unit ids stay aligned.
+    cursor.execute(
+        """
+        INSERT INTO public.node (label_id, properties)
+        SELECT label.id, '{}' FROM public.label, generate_series(1, 4)
+        WHERE label.name = 'Unit'
+        RETURNING id
+        """
+    )
+    nodes = sorted(row[0] for row in cursor.fetchall())
+    cursor.execute(
+        """
+        INSERT INTO public.unit (node_id, name)
+        SELECT node_id, 'closure check' FROM unnest(%s) AS node_id
+        """,
+        (nodes,),
+    )
+    a, b, c, _ = nodes
+    cursor.execute(
+        "INSERT INTO public.edge (source_id, target_id) VALUES (%s, %s), (%s, %s)",
+        (a, b, b, c),
+    )
+    connection.commit()
+    yield connection, nodes
+
+    cursor.execute("DELETE FROM public.node WHERE id = ANY(%s)", (nodes,))
+    cursor.execute(
+        """
+        DELETE FROM public.node_closure
+        WHERE ancestor_id = ANY(%s) OR descendant_id = ANY(%s)
+        """,
+        (nodes, nodes),
+    )
+    connection.commit()
+    connection.close()
+
+
+def _export_snapshot(connection) -> str:
+    cursor = connection.cursor()
+    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+    cursor.execute("SELECT pg_export_snapshot()")
+    return cursor.fetchone()[0]
+
+
+def _pair(item: dict) -> tuple[int, int]:
+    return item["ancestor_id"], item["descendant_id"]
+
+
+def test_diff_classifies_discrepancies(chain):
+    connection, (a, b, c, isolated) = chain
+    cursor = connection.cursor()
+    cursor.execute(
+        "UPDATE public.node_closure SET min_depth = 5 WHERE ancestor_id = %s AND descendant_id = %s",
+        (a, c),
+    )
+    cursor.execute(
+        "DELETE FROM public.node_closure WHERE ancestor_id = %s AND descendant_id = %s",
+        (b, c),
+    )
+    cursor.execute("INSERT INTO public.node_closure VALUES (%s, %s, 1)", (b, isolated))
+    connection.commit()
+
+    reader = engine.raw_connection()
+    try:
+        snapshot = _export_snapshot(reader)
+        expected = [(a, {b: 1, c: 2}), (b, {c: 1}), (c, {})]
+        checked, discrepancies = _diff(snapshot, expected)
+    finally:
+        reader.close()
+
+    assert checked == 3
+    assert sorted(discrepancies, key=_pair) == [
+        {"ancestor_id": a, "descendant_id": c, "expected": 2, "stored": 5},
+        {"ancestor_id": b, "descendant_id": c, "expected": 1, "stored": None},
+        {"ancestor_id": b, "descendant_id": isolated, "expected": None, "stored": 1},
+    ]
+
+
+def test_diff_reads_the_exported_snapshot(chain):
+    connection, (a, b, c, _) = chain
+    reader = engine.raw_connection()
+    try:
+        snapshot = _export_snapshot(reader)
+        # Committed after the snapshot, so not seen by the diff.
+        cursor = connection.cursor()
+        cursor.execute("DELETE FROM public.node_closure WHERE ancestor_id = %s", (a,))
+        connection.commit()
+        checked, discrepancies = _diff(snapshot, [(a, {b: 1, c: 2})])
+    finally:
+        reader.close()
+
+    assert (checked, discrepancies) == (1, [])
+
+
+def test_check_reports_rows_of_ancestors_outside_every_edge(chain):
+    connection, (a, b, c, isolated) = chain
+    cursor = connection.cursor()
+    cursor.execute("INSERT INTO public.node_closure VALUES (%s, %s, 2)", (isolated, a))
+    cursor.execute(
+        "UPDATE public.node_closure SET min_depth = 3 WHERE ancestor_id = %s AND descendant_id = %s",
+        (a, c),
+    )
+    connection.commit()
+
+    report = check(processes=1)
+    ours = [
+        item
+        for item in report["discrepancies"]
+        if item["ancestor_id"] in (a, b, c, isolated)
+    ]
+
+    assert report["mode"] == "full"
+    assert sorted(ours, key=_pair) == [
+        {"ancestor_id": a, "descendant_id": c, "expected": 2, "stored": 3},
+        {"ancestor_id": isolated, "descendant_id": a, "expected": None, "stored": 2},
+    ]
+    assert report["extra"] >= 1
+    assert report["wrong_depth"] >= 1
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from graph_db.footprint import solve_totals, technical_coefficients
+
+
+def _totals(edges: list[tuple[int, int, float]], direct: dict[int, float]) -> dict:
+    node_ids = np.array(sorted(direct))
+    sources, targets, quantities = (np.array(column) for column in zip(*edges))
+    coefficients = technical_coefficients(node_ids, sources, targets, quantities)
+    totals = solve_totals(coefficients, np.array([[direct[n]] for n in node_ids]))
+    return dict(zip(node_ids.tolist(), totals[:, 0].tolist()))
+
+
+def test_totals_of_a_diamond():
+    # 10 uses 2 of 20 and 1 of 30, both use 0.5 of 40.
+    edges = [(10, 20, 2.0), (10, 30, 1.0), (20, 40, 0.5), (30, 40, 0.5)]
+    totals = _totals(edges, {10: 1.0, 20: 2.0, 30: 3.0, 40: 4.0})
+    assert totals == pytest.approx({10: 14.0, 20: 4.0, 30: 5.0, 40: 4.0})
+
+
+def test_parallel_edges_add_up():
+    totals = _totals([(1, 2, 1.0), (1, 2, 0.5)], {1: 0.0, 2: 2.0})
+    assert totals == pytest.approx({1: 3.0, 2: 2.0})
+
+
+def test_converging_cycle():
+    # x1 = 1 + 0.5 x2, x2 = 1 + 0.5 x1.
+    totals = _totals([(1, 2, 0.5), (2, 1, 0.5)], {1: 1.0, 2: 1.0})
+    assert totals == pytest.approx({1: 2.0, 2: 2.0})
+
+
+def test_diverging_cycle():
+    with pytest.raises(ValueError):
+        _totals([(1, 2, 1.0), (2, 1, 1.0)], {1: 1.0, 2: 1.0})
+
+
+def test_no_units():
+    coefficients = technical_coefficients(
+        np.empty(0, np.int64), np.empty(0), np.empty(0), np.empty(0)
+    )
+    assert solve_totals(coefficients, np.zeros((0, 2))).shape == (0, 2)
+
+
+def test_cycle_product_above_one():
+    # x1 = 1 + 2 x2, x2 = 1 + 2 x1 is solved by -1, not by a footprint.
+    with pytest.raises(ValueError):
+        _totals([(1, 2, 2.0), (2, 1, 2.0)], {1: 1.0, 2: 1.0})
+
+
+def test_cycle_above_one_among_converging_ones():
+    # 3 -> 4 -> 5 -> 3 has a product of 1.2, the 1 <-> 2 cycle and the
+    # self-loop of 6 converge.
+    edges = [
+        (1, 2, 0.5),
+        (2, 1, 0.5),
+        (2, 3, 1.0),
+        (3, 4, 1.2),
+        (4, 5, 1.0),
+        (5, 3, 1.0),
+        (6, 6, 0.9),
+    ]
+    with pytest.raises(ValueError):
+        _totals(edges, {node: 1.0 for node in range(1, 7)})
+    totals = _totals(edges[:2] + edges[-1:], {1: 1.0, 2: 1.0, 6: 1.0})
+    assert totals == pytest.approx({1: 2.0, 2: 2.0, 6: 10.0})
@@ -0,0 +1,157 @@
+import random
+from collections import defaultdict, deque
+
+from graph_db.rebuild_closure import (
+    component_chunks,
+    iter_closures,
+    strongly_connected_components,
+    weakly_connected_components,
+)
+
+
+def _breadth_first_closures(
+    edges: list[tuple[int, int]],
+) -> dict[int, dict[int, int]]:
+    successors: dict[int, set[int]] = defaultdict(set)
+    for source, target in edges:
+        successors[source].add(target)
+        successors.setdefault(target, set())
+
+    closures = {}
+    for node in successors:
+        closure: dict[int, int] = {}
+        queue = deque([(node, 0)])
+        while queue:
+            current, depth = queue.popleft()
+            for child in successors[current]:
+                if child not in closure:
+                    closure[child] = depth + 1
+                    queue.append((child, depth + 1))
+        closures[node] = closure
+    return closures
+
+
+def _random_edges(seed: int, nodes: int, edges: int) -> list[tuple[int, int]]:
+    rnd = random.Random(seed)
+    return [(rnd.randrange(nodes), rnd.randrange(nodes)) for _ in range(edges)]
+
+
+def test_strongly_connected_components_reverse_topological_order():
+    # 1 <-> 2 -> 3 -> 4 -> 3, 4 -> 5 with a self-loop on 5 and 6 -> 1.
+    successors = {1: [2], 2: [1, 3], 3: [4], 4: [3, 5], 5: [5], 6: [1]}
+    components = strongly_connected_components(successors)
+
+    assert sorted(sorted(component) for component in components) == [
+        [1, 2],
+        [3, 4],
+        [5],
+        [6],
+    ]
+    position = {
+        node: number for number, members in enumerate(components) for node in members
+    }
+    for source, targets in successors.items():
+        for target in targets:
+            assert position[target] <= position[source]
+
+
+def test_strongly_connected_components_duplicate_edges_and_missing_successors():
+    # Targets without an entry of their own are still visited.
+    successors = {1: [2, 2, 3], 2: [1, 1], 3: [4]}
+    components = strongly_connected_components(successors)
+
+    assert sorted(sorted(component) for component in components) == [
+        [1, 2],
+        [3],
+        [4],
+    ]
+    assert components.index([4]) < components.index([3])
+
+
+def test_strongly_connected_components_long_chain_is_iterative():
+    successors = {node: [node + 1] for node in range(10_000)}
+    components = strongly_connected_components(successors)
+
+    assert components == [[node] for node in range(10_000, -1, -1)]
+
+
+def test_iter_closures_matches_breadth_first():
+    for seed in range(20):
+        edges = _random_edges(seed, nodes=40, edges=seed * 4 + 10)
+        expected = _breadth_first_closures(edges)
+
+        closures = {node: dict(closure) for node, closure in iter_closures(edges)}
+        assert closures == expected
+
+
+def test_iter_closures_cycles_and_self_loops():
+    edges = [(1, 2), (2, 3), (3, 1), (3, 4), (4, 4), (5, 4)]
+    closures = dict(iter_closures(edges))
+
+    # Nodes on a cycle reach themselves, a self-loop is a cycle of length 1.
+    assert closures[1] == {2: 1, 3: 2, 1: 3, 4: 3}
+    assert closures[3] == {1: 1, 2: 2, 3: 3, 4: 1}
+    assert closures[4] == {4: 1}
+    assert closures[5] == {4: 1}
+
+
+def test_iter_closures_duplicate_edges():
+    edges = [(1, 2), (1, 2), (2, 3), (2, 3), (1, 3)]
+    closures = dict(iter_closures(edges))
+
+    assert closures == {1: {2: 1, 3: 1}, 2: {3: 1}, 3: {}}
+
+
+def test_iter_closures_frees_closures_once_read():
+    # Every node of a chain is read once, by its predecessor.
+    closures = iter_closures([(node, node + 1) for node in range(100)])
+    retained = []
+    for _ in closures:
+        retained.append(len(closures.gi_frame.f_locals["closures"]))
+    assert max(retained) <= 2
+
+    # Without cycles each closure is kept from its own component until every
+    # predecessor has read it.
+    for seed in range(10):
+        edges = [
+            (min(edge), max(edge))
+            for edge in _random_edges(seed, nodes=60, edges=120)
+            if edge[0] != edge[1]
+        ]
+        predecessors = defaultdict(set)
+        for source, target in edges:
+            predecessors[target].add(source)
+
+        closures = iter_closures(edges)
+        earlier: set[int] = set()
+        for node, _ in closures:
+            assert set(closures.gi_frame.f_locals["closures"]) == {node} | {
+                done for done in earlier if predecessors[done] - earlier
+            }
+            earlier.add(node)
+
+
+def test_component_chunks_keep_components_together():
+    edges = _random_edges(1, nodes=300, edges=200) + [
+        (node, node + 1) for node in range(1000, 1040)
+    ]
+    chunks = component_chunks(edges, chunk_size=25)
+
+    assert sorted(edge for chunk in chunks for edge in chunk) == sorted(edges)
+    chunk_of = {}
+    for number, chunk in enumerate(chunks):
+        for source, target in chunk:
+            assert chunk_of.setdefault(source, number) == number
+            assert chunk_of.setdefault(target, number) == number
+
+    # A chunk only exceeds the size when it holds a single larger component.
+    assert any(len(chunk) > 25 for chunk in chunks)
+    for chunk in chunks:
+        if len(chunk) > 25:
+            assert len(weakly_connected_components(chunk)) == 1
+
+
+def test_component_chunks_single_chunk():
+    edges = [(1, 2), (3, 4), (4, 5)]
+    assert component_chunks(edges, chunk_size=10) == [[(3, 4), (4, 5), (1, 2)]]
+    assert component_chunks([], chunk_size=10) == []
@@ -0,0 +1,128 @@
+import random
+from collections import defaultdict, deque
+
+import pytest
+
+from graph_db.session import engine
+
+
+@pytest.fixture
+def relation():
+    """A materialized relation over 25 nodes, the raw connection and the ids."""
+    connection = engine.raw_connection()
+    cursor = connection.cursor()
+    cursor.execute(
+        """
+        INSERT INTO public.relation (name, materialized)
+        VALUES ('closure delta', true)
+        RETURNING id
+        """
+    )
+    relation_id = cursor.fetchone()[0]
+    cursor.execute(
+        """
+        INSERT INTO public.node (label_id, properties)
+        SELECT label.id, '{}' FROM public.label, generate_series(1, 25)
+        WHERE label.name = 'Unit'
+        RETURNING id
+        """
+    )
+    nodes = sorted(row[0] for row in cursor.fetchall())
+    cursor.execute(
+        """
+        INSERT INTO public.unit (node_id, name)
+        SELECT node_id, 'relation closure' FROM unnest(%s) AS node_id
+        """,
+        (nodes,),
+    )
+    connection.commit()
+    yield connection, relation_id, nodes
+
+    connection.rollback()
+    cursor.execute("DELETE FROM public.node WHERE id = ANY(%s)", (nodes,))
+    cursor.execute(
+        """
+        DELETE FROM public.node_closure
+        WHERE ancestor_id = ANY(%s) OR descendant_id = ANY(%s)
+        """,
+        (nodes, nodes),
+    )
+    cursor.execute("DELETE FROM public.relation WHERE id = %s", (relation_id,))
+    connection.commit()
+    connection.close()
+
+
+def _expected(cursor, relation_id: int) -> set[tuple[int, int, int]]:
+    cursor.execute(
+        "SELECT source_id, target_id FROM public.edge WHERE relation_id = %s",
+        (relation_id,),
+    )
+    successors = defaultdict(set)
+    for source, target in cursor.fetchall():
+        successors[source].add(target)
+
+    pairs = set()
+    for node in list(successors):
+        depths: dict[int, int] = {}
+        queue = deque([(node, 0)])
+        while queue:
+            current, depth = queue.popleft()
+            for child in successors[current]:
+                if child not in depths:
+                    depths[child] = depth + 1
+                    queue.append((child, depth + 1))
+        pairs |= {(node, child, depth) for child, depth in depths.items()}
+    return pairs
+
+
+def _stored(cursor, relation_id: int) -> set[tuple[int, int, int]]:
+    cursor.execute(
+        """
+        SELECT ancestor_id, descendant_id, min_depth FROM public.relation_closure
+        WHERE relation_id = %s
+        """,
+        (relation_id,),
+    )
+    return set(cursor.fetchall())
+
+
+def test_edge_changes_keep_the_relation_closure(relation):
+    connection, relation_id, nodes = relation
+    cursor = connection.cursor()
+    rnd = random.Random(7)
+    alive = list(nodes)
+
+    for _ in range(120):
+        change = rnd.random()
+        if change < 0.5:
+            # Single and bulk inserts, cycles and self-loops included.
+            edges = [
+                (rnd.choice(alive), rnd.choice(alive))
+                for _ in range(rnd.choice([1, 1, 4]))
+            ]
+            cursor.execute(
+                """
+                INSERT INTO public.edge (source_id, target_id, relation_id)
+                SELECT source_id, target_id, %s
+                FROM unnest(%s::int[], %s::int[]) AS edges(source_id, target_id)
+                ON CONFLICT DO NOTHING
+                """,
+                (relation_id, [edge[0] for edge in edges], [edge[1] for edge in edges]),
+            )
+        elif change < 0.85:
+            cursor.execute(
+                "SELECT id FROM public.edge WHERE relation_id = %s ORDER BY id",
+                (relation_id,),
+            )
+            edges = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                "DELETE FROM public.edge WHERE id = ANY(%s)",
+                (rnd.sample(edges, min(len(edges), rnd.choice([1, 1, 3]))),),
+            )
+        else:
+            # Its edges are cascaded.
+            node = alive.pop(rnd.randrange(len(alive)))
+            cursor.execute("DELETE FROM public.node WHERE id = %s", (node,))
+        connection.commit()
+
+        assert _stored(cursor, relation_id) == _expected(cursor, relation_id)